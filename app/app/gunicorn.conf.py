@@ -0,0 +1,34 @@
+"""
+Gunicorn configuration for app
+
+    gunicorn -c app/gunicorn.conf.py
+
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker serves app.asgi, any
+other worker class serves app.wsgi.
+"""
+import multiprocessing
+import os
+
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+wsgi_app = 'app.asgi:application' if 'uvicorn' in worker_class \
+    else 'app.wsgi:application'
+
+workers = int(os.environ.get(
+    'GUNICORN_WORKERS',
+    multiprocessing.cpu_count() * 2 + 1
+))
+# Each thread keeps its own persistent database connection.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = timeout
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# Recycle workers now and then to bound the effect of memory leaks.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'drf_spectacular',
@@ -46,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
+    'core.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -81,8 +84,12 @@ WSGI_APPLICATION = 'app.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': os.environ.get(
+            'DB_ENGINE',
+            'django.db.backends.postgresql'
+        ),
         'HOST': os.environ.get('DB_HOST'),
+        'PORT': os.environ.get('DB_PORT', ''),
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS')
@@ -90,6 +97,67 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# The local-memory default is per process: use a shared backend (e.g.
+# django.core.cache.backends.redis.RedisCache) when running several workers.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+        'TIMEOUT': 300
+    }
+}
+
+AUTH_TOKEN_CACHE = 'default'
+AUTH_TOKEN_CACHE_TIMEOUT = 300
+
+EXPENSE_CACHE = 'default'
+EXPENSE_CACHE_TIMEOUT = 300
+
+# Period of each Expense partition once the table is partitioned with
+# partition_expenses (PostgreSQL only): month or year.
+EXPENSE_PARTITION_INTERVAL = os.environ.get(
+    'EXPENSE_PARTITION_INTERVAL', 'month'
+)
+
+# archive_expenses moves Expenses older than this many days to the
+# ArchivedExpense table, which the API reads with ?archived=true.
+EXPENSE_ARCHIVE_AFTER_DAYS = int(
+    os.environ.get('EXPENSE_ARCHIVE_AFTER_DAYS', 730)
+)
+
+# Delta sync leaves changes younger than EXPENSE_SYNC_SETTLE_SECONDS, or
+# than the oldest open transaction on PostgreSQL, for the next sync, so
+# transactions still in flight are not skipped. On other databases the
+# settle time must exceed the longest write transaction. Tombstones of
+# deleted Expenses are pruned by prune_tombstones after
+# EXPENSE_SYNC_TOMBSTONE_DAYS; older watermarks must sync from scratch.
+EXPENSE_SYNC_SETTLE_SECONDS = int(
+    os.environ.get('EXPENSE_SYNC_SETTLE_SECONDS', 5)
+)
+EXPENSE_SYNC_TOMBSTONE_DAYS = int(
+    os.environ.get('EXPENSE_SYNC_TOMBSTONE_DAYS', 90)
+)
+
+# Report per-request DB and serializer timings in a Server-Timing header.
+SERVER_TIMING = True
+
+# Response compression: bodies from COMPRESSION_MIN_SIZE bytes are
+# compressed with the codings below, most preferred first, at these
+# levels. Remove a coding to stop offering it.
+COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))
+COMPRESSION_LEVELS = {
+    'zstd': int(os.environ.get('COMPRESSION_ZSTD_LEVEL', 3)),
+    'br': int(os.environ.get('COMPRESSION_BROTLI_LEVEL', 4)),
+    'gzip': int(os.environ.get('COMPRESSION_GZIP_LEVEL', 6)),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
 
@@ -109,6 +177,45 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+# New passwords use the hasher named by PASSWORD_HASHER, the others only
+# verify existing hashes, which are upgraded on the next successful login.
+
+PASSWORD_HASHER_CHOICES = {
+    'scrypt': 'core.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+}
+
+PASSWORD_HASHER = os.environ.get('PASSWORD_HASHER', 'scrypt')
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_CHOICES[PASSWORD_HASHER],
+    *(
+        hasher
+        for name, hasher in PASSWORD_HASHER_CHOICES.items()
+        if name != PASSWORD_HASHER
+    ),
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
+# Scrypt cost: CPU and memory grow with N (work factor) and r (block size),
+# memory is about 128 * N * r bytes.
+PASSWORD_SCRYPT_WORK_FACTOR = int(
+    os.environ.get('PASSWORD_SCRYPT_WORK_FACTOR', 2 ** 14)
+)
+PASSWORD_SCRYPT_BLOCK_SIZE = int(
+    os.environ.get('PASSWORD_SCRYPT_BLOCK_SIZE', 8)
+)
+PASSWORD_SCRYPT_PARALLELISM = int(
+    os.environ.get('PASSWORD_SCRYPT_PARALLELISM', 1)
+)
+
+# Threads async views use for hashing, defaults to one per CPU.
+PASSWORD_HASHING_WORKERS = int(os.environ.get('PASSWORD_HASHING_WORKERS', 0))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
@@ -134,5 +241,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema'
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # JSON through orjson, or MessagePack with Accept: application/msgpack.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.parsers.ORJSONParser',
+        'core.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
@@ -0,0 +1,73 @@
+"""
+Django settings for running app in production
+
+Extends app.settings. Select it with
+DJANGO_SETTINGS_MODULE=app.settings_production.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import CACHES, DATABASES, REST_FRAMEWORK
+
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    host.strip()
+    for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',')
+    if host.strip()
+]
+
+
+# Database
+# Keep connections open between requests instead of paying a fresh connect
+# per request, and check them before reuse so a restarted server or a
+# dropped connection does not fail the next request.
+
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+    },
+}
+
+# PgBouncer in transaction pooling mode can hand each transaction a
+# different server connection, which breaks server-side cursors.
+if os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
+
+# Cache
+# Cached tokens, Users and API responses are invalidated by the worker that
+# handles the change. Every gunicorn worker must see that, so refuse a
+# per-process cache: set CACHE_BACKEND and CACHE_LOCATION to Redis or
+# Memcached.
+
+for alias, cache in CACHES.items():
+    if cache['BACKEND'] == 'django.core.cache.backends.locmem.LocMemCache':
+        raise ImproperlyConfigured(
+            f'CACHES[{alias!r}] is a per-process LocMemCache; set '
+            f'CACHE_BACKEND to a shared backend such as '
+            f'django.core.cache.backends.redis.RedisCache.'
+        )
+
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '').lower() \
+    in ('1', 'true', 'yes')
+
+STATIC_ROOT = os.environ.get('STATIC_ROOT', '/vol/web/static')
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    # No browsable API: skip rendering HTML for browsers.
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'core.renderers.MessagePackRenderer',
+    ],
+}
@@ -17,12 +17,15 @@ from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from django.contrib import admin
 from django.urls import path, include
 
+from core.views import MetricsView
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/schema', SpectacularAPIView.as_view(), name='api-schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(
         url_name='api-schema'),
         name='api-docs'),
+    path('api/metrics/', MetricsView.as_view(), name='api-metrics'),
     path('api/user/', include('user.urls')),
     path('api/expense/', include('expense.urls'))
 ]
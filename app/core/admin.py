@@ -63,3 +63,7 @@ class UserAdmin(BaseUserAdmin):
 
 admin.site.register(models.User, UserAdmin)
 admin.site.register(models.Expense)
+admin.site.register(models.Category)
+admin.site.register(models.RecurringExpense)
+admin.site.register(models.ArchivedExpense)
+admin.site.register(models.DeletedExpense)
@@ -0,0 +1,96 @@
+"""
+Base class for async API views
+
+DRF views are synchronous, so under ASGI every request to them runs in a
+worker thread. AsyncAPIView is a plain Django async view that follows
+DRF's conventions for the few endpoints that need to wait on the database
+without holding a thread: token authentication, JSON bodies and DRF's
+error responses.
+"""
+import orjson
+from django.http import Http404, HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from rest_framework import exceptions, status
+from rest_framework.views import exception_handler
+
+from core.renderers import ORJSONRenderer
+from user.authentication import CachedTokenAuthentication
+
+
+class AsyncAPIView(View):
+    """
+    Async view returning JSON, with DRF-style authentication and errors
+
+    Handlers are `async def get/post/...(self, request, **kwargs)` and
+    return data for `self.respond()`. `request.query_params` and
+    `request.data` are set as on DRF requests.
+    """
+    authentication_class = CachedTokenAuthentication
+    authentication_required = True
+    renderer = ORJSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token authentication is not subject to CSRF, as in DRF.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.query_params = request.GET
+            request.data = self.parse(request)
+            await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except Exception as exc:
+            return self.handle_exception(exc)
+
+    def parse(self, request):
+        if not request.body:
+            return {}
+
+        try:
+            return orjson.loads(request.body)
+        except ValueError as exc:
+            raise exceptions.ParseError(f'JSON parse error - {exc}')
+
+    async def authenticate(self, request):
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+
+        if result is None:
+            if self.authentication_required:
+                raise exceptions.NotAuthenticated()
+            return
+
+        request.user, request.auth = result
+
+    async def http_method_not_allowed(self, request, *args, **kwargs):
+        raise exceptions.MethodNotAllowed(request.method)
+
+    def respond(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(
+            self.renderer.render(data),
+            status=status_code,
+            content_type=self.renderer.media_type
+        )
+
+    def handle_exception(self, exc):
+        if isinstance(exc, Http404):
+            exc = exceptions.NotFound()
+
+        if isinstance(exc, (exceptions.NotAuthenticated,
+                            exceptions.AuthenticationFailed)):
+            exc.auth_header = self.authentication_class.keyword
+            # DRF answers 401 whenever there is a WWW-Authenticate header.
+            exc.status_code = status.HTTP_401_UNAUTHORIZED
+
+        response = exception_handler(exc, {'view': self})
+        if response is None:
+            raise exc
+
+        http_response = self.respond(response.data, response.status_code)
+        for header in ('WWW-Authenticate', 'Retry-After'):
+            if header in response:
+                http_response[header] = response[header]
+        return http_response
@@ -0,0 +1,154 @@
+"""
+Helpers for benchmarking the API
+"""
+import math
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework.authtoken.models import Token
+
+from core.models import Expense, ExpenseRollup
+
+
+EXPENSE_NAMES = [
+    'Groceries', 'Rent', 'Gas', 'Electricity', 'Water', 'Internet',
+    'Coffee', 'Lunch', 'Dinner', 'Transport', 'Insurance', 'Gym'
+]
+BENCH_PASSWORD = 'bench1234'
+
+
+def _write(expenses):
+    """
+    Insert seeded Expenses and add them to their rollups, leaving other
+    Users' rollups alone as the database may be serving traffic
+    """
+    with transaction.atomic():
+        Expense.objects.bulk_create(expenses)
+        ExpenseRollup.objects.record_bulk(added=expenses)
+
+
+def seed(users, expenses_per_user, prefix='bench', seed=0, batch_size=5000):
+    """
+    Create users with tokens and expenses using bulk inserts only
+    :param users:
+    :param expenses_per_user:
+    :param prefix:
+    :param seed:
+    :param batch_size:
+    :return users: [(user, token key)]
+    """
+    rng = random.Random(seed)
+    # Hash once: every seeded user shares the same password.
+    password = make_password(BENCH_PASSWORD)
+
+    created = get_user_model().objects.bulk_create(
+        [
+            get_user_model()(
+                email=f'{prefix}-{index}@example.com',
+                name=f'{prefix} {index}',
+                password=password
+            )
+            for index in range(users)
+        ],
+        batch_size=batch_size
+    )
+    tokens = Token.objects.bulk_create(
+        [Token(key=Token.generate_key(), user=user) for user in created],
+        batch_size=batch_size
+    )
+
+    start = date.today() - timedelta(days=3 * 365)
+    expenses = []
+    for user in created:
+        for _ in range(expenses_per_user):
+            expenses.append(Expense(
+                user=user,
+                expense_name=rng.choice(EXPENSE_NAMES),
+                price=Decimal(rng.randrange(100, 100000)) / 100,
+                date_created=start + timedelta(days=rng.randrange(3 * 365))
+            ))
+            if len(expenses) >= batch_size:
+                _write(expenses)
+                expenses = []
+    _write(expenses)
+
+    return [(user, token.key) for user, token in zip(created, tokens)]
+
+
+def percentile(samples, percent):
+    """
+    Nearest-rank percentile of samples
+    :param samples:
+    :param percent:
+    :return value:
+    """
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies):
+    """
+    Latency statistics in milliseconds
+    :param latencies: seconds
+    :return stats:
+    """
+    milliseconds = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(milliseconds),
+        'mean_ms': round(statistics.fmean(milliseconds), 3),
+        'p50_ms': round(percentile(milliseconds, 50), 3),
+        'p95_ms': round(percentile(milliseconds, 95), 3),
+        'p99_ms': round(percentile(milliseconds, 99), 3),
+    }
+
+
+def measure(request, iterations, memory_iterations=5):
+    """
+    Time a request callable and count its queries and peak memory
+
+    Memory is traced in a separate, shorter pass because tracemalloc
+    slows everything it watches.
+    :param request: callable(iteration) returning a response
+    :param iterations:
+    :param memory_iterations:
+    :return stats:
+    """
+    latencies = []
+    queries = []
+    statuses = set()
+
+    for iteration in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = request(iteration)
+            latencies.append(time.perf_counter() - start)
+        queries.append(len(captured))
+        statuses.add(response.status_code)
+
+    peaks = []
+    for iteration in range(min(memory_iterations, iterations)):
+        tracemalloc.start()
+        try:
+            request(iterations + iteration)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    stats = summarize(latencies)
+    stats.update({
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+        'peak_memory_kb': round(max(peaks) / 1024, 1) if peaks else None,
+        'status_codes': sorted(statuses),
+    })
+    return stats
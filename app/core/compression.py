@@ -0,0 +1,137 @@
+"""
+Response compression codecs and Accept-Encoding negotiation
+
+Each codec compresses a whole body in one call, or a stream chunk by
+chunk, flushing after every chunk so streamed responses still reach the
+client as they are produced.
+"""
+import zlib
+
+import brotli
+import zstandard
+
+
+class Codec:
+    """
+    Base class for a content coding at a given compression level
+    """
+    encoding = None
+
+    def __init__(self, level):
+        self.level = level
+
+    def compress(self, data):
+        """
+        Compress a whole body
+        :param data:
+        :return compressed:
+        """
+        raise NotImplementedError('compress() must be implemented.')
+
+    def stream(self, chunks):
+        """
+        Compress an iterable of chunks, yielding a chunk per input chunk
+        :param chunks:
+        :return compressed: iterator of chunks
+        """
+        raise NotImplementedError('stream() must be implemented.')
+
+
+class GzipCodec(Codec):
+    encoding = 'gzip'
+
+    def compress(self, data):
+        return zlib.compress(data, self.level, wbits=31)
+
+    def stream(self, chunks):
+        compressor = zlib.compressobj(self.level, wbits=31)
+        for chunk in chunks:
+            # Flushing an empty chunk would still send a sync marker.
+            if chunk:
+                yield compressor.compress(chunk) \
+                    + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+
+
+class BrotliCodec(Codec):
+    encoding = 'br'
+
+    def compress(self, data):
+        return brotli.compress(data, quality=self.level)
+
+    def stream(self, chunks):
+        compressor = brotli.Compressor(quality=self.level)
+        for chunk in chunks:
+            if chunk:
+                yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+
+
+class ZstdCodec(Codec):
+    encoding = 'zstd'
+
+    def compress(self, data):
+        return zstandard.ZstdCompressor(level=self.level).compress(data)
+
+    def stream(self, chunks):
+        compressor = zstandard.ZstdCompressor(level=self.level) \
+            .compressobj()
+        for chunk in chunks:
+            if chunk:
+                yield compressor.compress(chunk) \
+                    + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        yield compressor.flush()
+
+
+CODECS = {
+    codec.encoding: codec
+    for codec in (ZstdCodec, BrotliCodec, GzipCodec)
+}
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header
+    :param header:
+    :return qualities: {coding: q}
+    """
+    qualities = {}
+    for item in header.split(','):
+        coding, *params = (part.strip() for part in item.split(';'))
+        if not coding:
+            continue
+
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+
+        qualities[coding.lower()] = quality
+
+    if 'x-gzip' in qualities:
+        qualities.setdefault('gzip', qualities['x-gzip'])
+    return qualities
+
+
+def negotiate(header, encodings):
+    """
+    Choose the content coding for a response
+    :param header: the request's Accept-Encoding
+    :param encodings: codings the server offers, most preferred first
+    :return encoding: the client's highest rated coding, ties going to the
+        server's preference, or None to send the body as is
+    """
+    qualities = parse_accept_encoding(header)
+    default = qualities.get('*', 0.0)
+
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, default)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
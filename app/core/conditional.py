@@ -0,0 +1,78 @@
+"""
+Conditional GET helpers
+
+Views answer a request whose validators still match with 304 Not Modified
+before reading or serializing anything they can avoid. If-None-Match takes
+precedence over If-Modified-Since, as RFC 9110 requires.
+"""
+import hashlib
+
+from django.utils.http import (
+    http_date,
+    parse_etags,
+    parse_http_date_safe,
+    quote_etag
+)
+
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def make_etag(*parts):
+    """
+    Build a strong ETag from the values that determine a response
+    :param parts:
+    :return etag:
+    """
+    digest = hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+def is_not_modified(request, etag=None, last_modified=None):
+    """
+    Whether the client's cached copy is still current
+    :param request:
+    :param etag: quoted ETag of the current response
+    :param last_modified: Unix time the resource last changed
+    :return not_modified:
+    """
+    if request.method not in ('GET', 'HEAD'):
+        return False
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match:
+        tags = parse_etags(if_none_match)
+        return '*' in tags or (
+            etag is not None
+            and etag in (tag.removeprefix('W/') for tag in tags)
+        )
+
+    if_modified_since = parse_http_date_safe(
+        request.headers.get('If-Modified-Since', '')
+    )
+    return if_modified_since is not None and last_modified is not None \
+        and int(last_modified) <= if_modified_since
+
+
+def validator_headers(etag=None, last_modified=None):
+    """
+    Response headers for the validators given
+    :param etag:
+    :param last_modified: Unix time
+    :return headers:
+    """
+    headers = {}
+    if etag is not None:
+        headers['ETag'] = etag
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified)
+    return headers
+
+
+def not_modified_response(headers):
+    """
+    Empty 304 response carrying the validators
+    :param headers:
+    :return response:
+    """
+    return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
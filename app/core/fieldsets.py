@@ -0,0 +1,61 @@
+"""
+Sparse fieldsets
+
+Clients choose the fields of a response with `?fields=name,price`. Views
+read the choice with `requested_fields()`, pass it to serializers built on
+SparseFieldsetMixin and limit the columns they query to match, so fields
+nobody asked for are neither read nor serialized.
+"""
+from django.utils.translation import gettext as _
+
+from rest_framework import serializers
+
+
+FIELDS_PARAM = 'fields'
+
+
+def requested_fields(request, available):
+    """
+    Parse the fields query parameter
+    :param request:
+    :param available: names that may be requested, in response order
+    :return fields: requested names in response order, or None for all
+    """
+    value = request.query_params.get(FIELDS_PARAM, '')
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    if not names:
+        return None
+
+    unknown = names.difference(available)
+    if unknown:
+        raise serializers.ValidationError({FIELDS_PARAM: [
+            _('Unknown fields: {fields}.').format(
+                fields=', '.join(sorted(unknown))
+            )
+        ]})
+
+    return [name for name in available if name in names]
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer taking a `fields` argument that lists the fields to keep
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+
+        if fields is not None:
+            for name in set(self.fields).difference(fields):
+                self.fields.pop(name)
+
+    @classmethod
+    def readable_fields(cls):
+        """
+        Names of the fields a response can include
+        :return names:
+        """
+        return [
+            name for name, field in cls().fields.items()
+            if not field.write_only
+        ]
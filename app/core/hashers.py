@@ -0,0 +1,79 @@
+"""
+Password hashing
+
+ScryptPasswordHasher takes its cost parameters from settings, so they can
+be tuned per deployment. Hashes made with other parameters or with an
+older hasher in PASSWORD_HASHERS are upgraded on the next successful
+login by Django's check_password.
+
+Hashing is CPU bound and hashlib releases the GIL while it runs, so async
+views hand it to a dedicated thread pool with `offload()` instead of
+running it on the event loop or in the single thread that sync_to_async
+uses by default.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.db import close_old_connections
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    Scrypt with PASSWORD_SCRYPT_* settings as cost parameters
+    """
+
+    @property
+    def work_factor(self):
+        return settings.PASSWORD_SCRYPT_WORK_FACTOR
+
+    @property
+    def block_size(self):
+        return settings.PASSWORD_SCRYPT_BLOCK_SIZE
+
+    @property
+    def parallelism(self):
+        return settings.PASSWORD_SCRYPT_PARALLELISM
+
+
+_executor = None
+
+
+def executor():
+    """
+    Return the thread pool for password hashing, creating it on first use
+    :return executor:
+    """
+    global _executor
+
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASHING_WORKERS or os.cpu_count(),
+            thread_name_prefix='password-hashing'
+        )
+    return _executor
+
+
+async def offload(func, *args, **kwargs):
+    """
+    Run func, which hashes or checks passwords, in the hashing thread pool
+    :param func:
+    :return result:
+    """
+    @wraps(func)
+    def call():
+        try:
+            return func(*args, **kwargs)
+        finally:
+            # Pool threads outlive requests, so apply CONN_MAX_AGE to
+            # connections func opened as request_finished would.
+            close_old_connections()
+
+    return await sync_to_async(
+        call,
+        thread_sensitive=False,
+        executor=executor()
+    )()
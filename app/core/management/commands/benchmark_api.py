@@ -0,0 +1,306 @@
+"""
+Django command to benchmark the API
+"""
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment
+)
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import benchmark
+
+
+SCENARIOS = [
+    'list',
+    'list_cached',
+    'filter_by_name',
+    'create',
+    'token',
+    'user_update'
+]
+
+
+def build_requests(users):
+    """
+    Map scenario names to (method, path, payload, token) factories
+
+    Each factory takes the iteration number, so requests rotate over the
+    seeded users. 'list' adds a unique query parameter so every request
+    misses the response cache, 'list_cached' repeats one URL.
+    :param users: [(user, token key)]
+    :return requests:
+    """
+    expense_url = reverse('expense:expense-list')
+    me_url = reverse('user:me')
+    token_url = reverse('user:token')
+
+    def pick(iteration):
+        return users[iteration % len(users)]
+
+    return {
+        'list': lambda i: (
+            'get', f'{expense_url}?bench={i}', None, pick(i)[1]
+        ),
+        'list_cached': lambda i: (
+            'get', expense_url, None, users[0][1]
+        ),
+        'filter_by_name': lambda i: (
+            'get', f'{expense_url}?expense_name=Groceries&bench={i}',
+            None, pick(i)[1]
+        ),
+        'create': lambda i: (
+            'post', expense_url,
+            {
+                'expense_name': 'Benchmark',
+                'price': '12.34',
+                'date_created': date.today().isoformat()
+            },
+            pick(i)[1]
+        ),
+        'token': lambda i: (
+            'post', token_url,
+            {'email': pick(i)[0].email, 'password': benchmark.BENCH_PASSWORD},
+            None
+        ),
+        'user_update': lambda i: (
+            'patch', me_url, {'name': f'Benchmark {i}'}, pick(i)[1]
+        ),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Seed users and expenses, then measure latency percentiles, queries per
+    request and peak memory per scenario and optionally compare against a
+    previous run.
+
+    By default requests run in process against a throwaway test database
+    created from DATABASES (SQLite or PostgreSQL). With --url they are sent
+    over HTTP to a running server, seeding the configured database.
+    """
+    help = 'Benchmark the API and write the results as JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--expenses',
+            type=int,
+            default=1000,
+            help='Expenses per user.'
+        )
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument(
+            '--scenarios',
+            nargs='+',
+            choices=SCENARIOS,
+            default=SCENARIOS
+        )
+        parser.add_argument('--output', help='Write results to this file.')
+        parser.add_argument(
+            '--label',
+            default='',
+            help='Free-form label stored with the results, e.g. a commit.'
+        )
+        parser.add_argument(
+            '--compare',
+            help='Results file of a previous run to compare against.'
+        )
+        parser.add_argument(
+            '--max-regression',
+            type=float,
+            default=20.0,
+            help='Allowed p95 latency increase in percent for --compare.'
+        )
+        parser.add_argument(
+            '--url',
+            help='Base URL of a running server to load over HTTP.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=8,
+            help='Concurrent HTTP requests with --url.'
+        )
+
+    def handle(self, *args, **options):
+        if options['url']:
+            results = self.run_http(options)
+        else:
+            results = self.run_local(options)
+
+        report = {
+            'label': options['label'],
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'mode': 'http' if options['url'] else 'local',
+            'users': options['users'],
+            'expenses_per_user': options['expenses'],
+            'iterations': options['iterations'],
+            'results': results,
+        }
+
+        for name, stats in results.items():
+            self.stdout.write(f'{name:>15}: {json.dumps(stats)}')
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                self.compare(
+                    json.load(baseline)['results'],
+                    results,
+                    options['max_regression']
+                )
+
+    def run_local(self, options):
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            aliases={'default'}
+        )
+        try:
+            users = benchmark.seed(options['users'], options['expenses'])
+            requests = build_requests(users)
+            client = APIClient()
+
+            def send(factory):
+                def request(iteration):
+                    method, path, payload, token = factory(iteration)
+                    extra = {}
+                    if token:
+                        extra['HTTP_AUTHORIZATION'] = f'Token {token}'
+                    if payload is None:
+                        return getattr(client, method)(path, **extra)
+                    return getattr(client, method)(
+                        path, payload, format='json', **extra
+                    )
+                return request
+
+            results = {}
+            for name in options['scenarios']:
+                for cache in caches.all():
+                    cache.clear()
+                results[name] = benchmark.measure(
+                    send(requests[name]),
+                    options['iterations']
+                )
+            return results
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+    def run_http(self, options):
+        prefix = f'bench-{int(time.time())}'
+        users = benchmark.seed(
+            options['users'],
+            options['expenses'],
+            prefix=prefix
+        )
+        requests = build_requests(users)
+        base_url = options['url'].rstrip('/')
+
+        def send(factory, iteration):
+            method, path, payload, token = factory(iteration)
+            request = urllib.request.Request(
+                base_url + path,
+                method=method.upper(),
+                data=json.dumps(payload).encode() if payload else None,
+                headers={'Content-Type': 'application/json'}
+            )
+            if token:
+                request.add_header('Authorization', f'Token {token}')
+
+            start = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request) as response:
+                    response.read()
+                    status = response.status
+            except urllib.error.HTTPError as error:
+                status = error.code
+            return time.perf_counter() - start, status
+
+        try:
+            results = {}
+            with ThreadPoolExecutor(options['concurrency']) as pool:
+                for name in options['scenarios']:
+                    factory = requests[name]
+                    start = time.perf_counter()
+                    samples = list(pool.map(
+                        lambda i: send(factory, i),
+                        range(options['iterations'])
+                    ))
+                    elapsed = time.perf_counter() - start
+
+                    stats = benchmark.summarize(
+                        [latency for latency, _ in samples]
+                    )
+                    stats['requests_per_sec'] = round(
+                        len(samples) / elapsed, 1
+                    )
+                    stats['status_codes'] = sorted(
+                        {status for _, status in samples}
+                    )
+                    results[name] = stats
+            return results
+        finally:
+            get_user_model().objects.filter(
+                email__startswith=f'{prefix}-'
+            ).delete()
+
+    def compare(self, baseline, results, max_regression):
+        regressions = []
+
+        for name, stats in results.items():
+            previous = baseline.get(name)
+            if not previous:
+                continue
+
+            change = (stats['p95_ms'] / previous['p95_ms'] - 1) * 100
+            line = (
+                f'{name:>15}: p95 {previous["p95_ms"]} -> '
+                f'{stats["p95_ms"]} ms ({change:+.1f}%)'
+            )
+            if change > max_regression:
+                regressions.append(name)
+
+            if 'requests_per_sec' in stats \
+                    and 'requests_per_sec' in previous:
+                line += (
+                    f', {previous["requests_per_sec"]} -> '
+                    f'{stats["requests_per_sec"]} req/s'
+                )
+
+            if 'queries_per_request' in stats \
+                    and 'queries_per_request' in previous:
+                line += (
+                    f', queries {previous["queries_per_request"]} -> '
+                    f'{stats["queries_per_request"]}'
+                )
+                if stats['queries_per_request'] \
+                        > previous['queries_per_request']:
+                    regressions.append(name)
+
+            self.stdout.write(line)
+
+        if regressions:
+            raise CommandError(
+                f'Regressions in: {", ".join(sorted(set(regressions)))}'
+            )
@@ -0,0 +1,210 @@
+"""
+Django command to compare WSGI and ASGI serving under concurrency
+"""
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import (
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment
+)
+from django.urls import reverse
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    """
+    Serve the expense list at increasing concurrency, through the sync
+    views on a fixed pool of WSGI workers and through the async views on
+    Django's ASGI handler, with every query delayed by --db-latency.
+
+    Runs in process against a throwaway test database, so it measures the
+    serving model rather than a particular server.
+    """
+    help = 'Compare WSGI and ASGI throughput when the database is slow.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument(
+            '--expenses',
+            type=int,
+            default=100,
+            help='Expenses per user.'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            nargs='+',
+            default=[1, 8, 32, 64]
+        )
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=200,
+            help='Requests per concurrency level and mode.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='WSGI worker threads, like gunicorn --workers.'
+        )
+        parser.add_argument(
+            '--db-latency',
+            type=float,
+            default=50.0,
+            help='Milliseconds added to every query.'
+        )
+        parser.add_argument('--output', help='Write results to this file.')
+
+    def handle(self, *args, **options):
+        delay = options['db_latency'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        setup_test_environment()
+        old_config = setup_databases(
+            verbosity=0,
+            interactive=False,
+            aliases={'default'}
+        )
+        try:
+            users = benchmark.seed(options['users'], options['expenses'])
+            tokens = [token for _, token in users]
+
+            connection_created.connect(add_latency)
+            for connection in connections.all():
+                connection.execute_wrappers.append(slow_query)
+
+            results = []
+            for concurrency in options['concurrency']:
+                for mode, run in (('wsgi', self.run_wsgi),
+                                  ('asgi', self.run_asgi)):
+                    for cache in caches.all():
+                        cache.clear()
+
+                    start = time.perf_counter()
+                    samples = run(tokens, concurrency, options)
+                    elapsed = time.perf_counter() - start
+
+                    stats = benchmark.summarize(
+                        [latency for latency, _ in samples]
+                    )
+                    stats.update({
+                        'mode': mode,
+                        'concurrency': concurrency,
+                        'requests_per_sec': round(len(samples) / elapsed, 1),
+                        'status_codes': sorted(
+                            {code for _, code in samples}
+                        ),
+                    })
+                    results.append(stats)
+                    self.stdout.write(
+                        f'{mode} c={concurrency:<4} '
+                        f'{stats["requests_per_sec"]:>8} req/s  '
+                        f'p50 {stats["p50_ms"]:>8} ms  '
+                        f'p95 {stats["p95_ms"]:>8} ms'
+                    )
+        finally:
+            connection_created.disconnect(add_latency)
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'db_latency_ms': options['db_latency'],
+                    'workers': options['workers'],
+                    'results': results,
+                }, output, indent=2)
+
+    def run_wsgi(self, tokens, concurrency, options):
+        """
+        Send requests from `concurrency` clients to a fixed number of
+        workers; requests beyond the worker count wait, as on a WSGI server
+        """
+        url = reverse('expense:expense-list')
+        workers = threading.Semaphore(options['workers'])
+        local = threading.local()
+
+        def send(iteration):
+            if not hasattr(local, 'client'):
+                local.client = Client()
+
+            token = tokens[iteration % len(tokens)]
+            start = time.perf_counter()
+            with workers:
+                response = local.client.get(
+                    f'{url}?bench={iteration}',
+                    HTTP_AUTHORIZATION=f'Token {token}'
+                )
+            return time.perf_counter() - start, response.status_code
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(send, range(options['requests'])))
+
+    def run_asgi(self, tokens, concurrency, options):
+        """
+        Send requests from `concurrency` clients to the ASGI application
+        """
+        application = get_asgi_application()
+        url = reverse('expense:async-expense-list')
+
+        async def send(iteration, semaphore):
+            path, _, query = urlsplit(f'{url}?bench={iteration}')[2:5]
+            token = tokens[iteration % len(tokens)]
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'query_string': query.encode(),
+                'headers': [
+                    (b'host', b'testserver'),
+                    (b'authorization', f'Token {token}'.encode()),
+                ],
+                'server': ('testserver', 80),
+                'client': ('127.0.0.1', 0),
+            }
+            status = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b''}
+
+            async def reply(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, reply)
+                return time.perf_counter() - start, status[0]
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(
+                send(iteration, semaphore)
+                for iteration in range(options['requests'])
+            ))
+
+        return asyncio.run(main())
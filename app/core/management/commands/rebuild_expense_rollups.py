@@ -0,0 +1,54 @@
+"""
+Django command to rebuild the monthly Expense rollups and Category totals
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Category, ExpenseRollup
+
+
+class Command(BaseCommand):
+    """
+    Recompute ExpenseRollup and the Category totals from Expense, or only
+    report drift with --check
+    """
+    help = (
+        'Rebuild the monthly expense rollups and category totals from the '
+        'expenses.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report totals that differ from the expenses.'
+        )
+
+    def handle(self, *args, **options):
+        drift = ExpenseRollup.objects.drift()
+        category_drift = Category.objects.drift()
+
+        for (user_id, month), stored, expected in drift:
+            self.stdout.write(
+                f'user {user_id} {month:%Y-%m}: '
+                f'stored {stored}, expected {expected}'
+            )
+        for category_id, stored, expected in category_drift:
+            self.stdout.write(
+                f'category {category_id}: '
+                f'stored {stored}, expected {expected}'
+            )
+
+        if options['check']:
+            if drift or category_drift:
+                raise CommandError(
+                    f'{len(drift)} rollups and {len(category_drift)} '
+                    f'category totals have drifted.'
+                )
+            self.stdout.write(self.style.SUCCESS('Rollups are up to date.'))
+            return
+
+        count = ExpenseRollup.objects.rebuild()
+        categories = Category.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {count} rollups and {categories} category totals.'
+        ))
@@ -0,0 +1,188 @@
+"""
+Per-request performance metrics
+
+RequestMetricsMiddleware collects one RequestMetrics per request. Every
+database connection reports its queries to the RequestMetrics of the
+current context, which also covers queries that async views run in worker
+threads. Code that wants its own phase reported wraps it in `timer(name)`;
+serializers get this from TimedSerializerMixin.
+"""
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+
+_current = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    """
+    Query count, DB time and named timers of one request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.timers = defaultdict(float)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - start
+
+    @contextmanager
+    def activate(self):
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper reporting to the current RequestMetrics
+    """
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    return metrics(execute, sql, params, many, context)
+
+
+def install(sender, connection, **kwargs):
+    """
+    Add record_query to a new database connection
+    :param sender:
+    :param connection:
+    :return:
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def timer(name):
+    """
+    Add the time spent in the block to the current request's timer name
+    :param name:
+    :return:
+    """
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.timers[name] += time.perf_counter() - start
+
+
+class TimedSerializerMixin:
+    """
+    Report the time spent building serializer.data as 'serializer'
+    """
+
+    @property
+    def data(self):
+        with timer('serializer'):
+            return super().data
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram with count, sum and max
+    """
+    BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, math.inf)
+
+    def __init__(self):
+        self.counts = [0] * len(self.BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'max': round(self.max, 3),
+            'buckets': {
+                'inf' if bound == math.inf else str(bound): count
+                for bound, count in zip(self.BUCKETS, self.counts)
+            },
+        }
+
+
+class Registry:
+    """
+    In-process histograms per view and metric, response status counts
+    per view, plus sample listeners
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = defaultdict(lambda: defaultdict(Histogram))
+        self._statuses = defaultdict(Counter)
+        self._listeners = []
+
+    def record(self, view, sample):
+        """
+        Add one request's sample and pass it on to the listeners
+        :param view:
+        :param sample: {metric: value}, plus 'method' and 'status'
+        :return:
+        """
+        with self._lock:
+            for metric, value in sample.items():
+                if metric not in ('method', 'status'):
+                    self._histograms[view][metric].observe(value)
+            self._statuses[view][str(sample['status'])] += 1
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(view, sample)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    'status': dict(self._statuses[view]),
+                    **{
+                        metric: histogram.snapshot()
+                        for metric, histogram in metrics.items()
+                    }
+                }
+                for view, metrics in self._histograms.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._statuses.clear()
+
+    def add_listener(self, listener):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+
+registry = Registry()
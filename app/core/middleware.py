@@ -0,0 +1,155 @@
+"""
+Middleware for request instrumentation and response compression
+"""
+import asyncio
+import re
+import time
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+from core.compression import CODECS, negotiate
+from core.metrics import RequestMetrics, registry, timer
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, serializer time and total latency of
+    every request per view, and report them in a Server-Timing header
+
+    Works in both sync and async chains, so async views are not pushed
+    into a thread. Streaming responses are measured up to the first byte.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            # Mark the instance as a coroutine function, like Django's
+            # MiddlewareMixin does.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+
+        with metrics.activate():
+            response = self.get_response(request)
+
+        return self.process_response(request, response, metrics, start)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        start = time.perf_counter()
+
+        with metrics.activate():
+            response = await self.get_response(request)
+
+        return self.process_response(request, response, metrics, start)
+
+    def process_response(self, request, response, metrics, start):
+        total = time.perf_counter() - start
+        match = request.resolver_match
+        view = match.view_name if match else None
+
+        sample = {
+            'method': request.method,
+            'status': response.status_code,
+            'latency_ms': total * 1000,
+            'queries': metrics.queries,
+            'db_ms': metrics.db_time * 1000,
+        }
+        for name, elapsed in metrics.timers.items():
+            sample[f'{name}_ms'] = elapsed * 1000
+
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = self.server_timing(metrics, total)
+
+        registry.record(view, sample)
+
+        return response
+
+    def server_timing(self, metrics, total):
+        entries = [
+            f'db;dur={metrics.db_time * 1000:.2f};'
+            f'desc="{metrics.queries} queries"'
+        ]
+        entries.extend(
+            f'{name};dur={elapsed * 1000:.2f}'
+            for name, elapsed in metrics.timers.items()
+        )
+        entries.append(f'total;dur={total * 1000:.2f}')
+        return ', '.join(entries)
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with zstd, brotli or gzip, whichever the client
+    rates highest in Accept-Encoding, ties going to the order of
+    COMPRESSION_LEVELS
+
+    Bodies under COMPRESSION_MIN_SIZE bytes are sent as is, as are bodies
+    that do not get smaller. Streaming responses are compressed chunk by
+    chunk as they are sent. Like Django's GZipMiddleware, ETags become
+    weak, and responses echoing secrets next to user input are exposed to
+    BREACH.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(self.get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        return self.process_response(request, response)
+
+    def process_response(self, request, response):
+        if not response.streaming \
+                and len(response.content) < settings.COMPRESSION_MIN_SIZE:
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+
+        patch_vary_headers(response, ['Accept-Encoding'])
+
+        encoding = negotiate(
+            request.headers.get('Accept-Encoding', ''),
+            settings.COMPRESSION_LEVELS
+        )
+        if encoding is None:
+            return response
+        codec = CODECS[encoding](settings.COMPRESSION_LEVELS[encoding])
+
+        if response.streaming:
+            response.streaming_content = codec.stream(
+                response.streaming_content
+            )
+            del response.headers['Content-Length']
+        else:
+            with timer('compression'):
+                compressed = codec.compress(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        if response.has_header('ETag'):
+            response.headers['ETag'] = re.sub(
+                r'^"', 'W/"', response.headers['ETag']
+            )
+        response.headers['Content-Encoding'] = encoding
+
+        return response
@@ -0,0 +1,26 @@
+# Generated by Django 4.1.13 on 2026-10-18 19:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_expense'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='date_created',
+            field=models.DateField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', '-date_created', '-id'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'expense_name'], name='expense_user_name_idx'),
+        ),
+    ]
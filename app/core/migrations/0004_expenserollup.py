@@ -0,0 +1,48 @@
+# Generated by Django 4.1.13 on 2026-10-18 19:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    Expense = apps.get_model('core', 'Expense')
+    ExpenseRollup = apps.get_model('core', 'ExpenseRollup')
+
+    rows = Expense.objects \
+        .annotate(month=TruncMonth('date_created')) \
+        .values('user_id', 'month') \
+        .annotate(total=Sum('price'), count=Count('id')) \
+        .order_by()
+
+    ExpenseRollup.objects.bulk_create(
+        [ExpenseRollup(**row) for row in rows],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_expense_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('count', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='expenserollup',
+            constraint=models.UniqueConstraint(fields=('user', 'month'), name='expense_rollup_user_month_unique'),
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
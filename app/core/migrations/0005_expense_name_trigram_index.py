@@ -0,0 +1,41 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.operations import (
+    BtreeGinExtension,
+    TrigramExtension
+)
+from django.db import migrations
+
+
+# PostgreSQL only, so it is created here rather than in Expense.Meta.
+TRIGRAM_INDEX = GinIndex(
+    fields=['user', 'expense_name'],
+    opclasses=['int8_ops', 'gin_trgm_ops'],
+    name='expense_user_name_trgm_idx'
+)
+
+
+def add_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(
+            apps.get_model('core', 'Expense'), TRIGRAM_INDEX
+        )
+
+
+def remove_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(
+            apps.get_model('core', 'Expense'), TRIGRAM_INDEX
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_expenserollup'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        BtreeGinExtension(),
+        migrations.RunPython(add_trigram_index, remove_trigram_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.13 on 2026-10-18 20:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletedExpense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('deleted_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='expense_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='deletedexpense',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='deletedexpense',
+            index=models.Index(fields=['user', 'deleted_at', 'id'], name='deleted_user_deleted_idx'),
+        ),
+    ]
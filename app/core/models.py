@@ -1,8 +1,14 @@
 """
 Database models
 """
+import calendar
+from datetime import timedelta
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -39,12 +45,173 @@ class User(AbstractBaseUser, PermissionsMixin):
     name = models.CharField(max_length=255)
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    # Not changed by saves limited to other fields, such as last_login.
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = UserManager()
 
     USERNAME_FIELD = 'email'
 
 
+def _lock_for_rebuild(manager):
+    """
+    Lock the table of manager's totals and the archive until the
+    transaction ends, on PostgreSQL
+
+    Writers update the totals after writing their Expenses, so each
+    Expense is then either committed and counted by the rebuild or added
+    to the rebuilt totals afterwards, and no archive batch moves Expenses
+    between the two reads of expected(). Other databases let one writer
+    in at a time.
+    :param manager:
+    :return:
+    """
+    connection = connections[manager.db]
+    if connection.vendor != 'postgresql':
+        return
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'LOCK TABLE {quote(manager.model._meta.db_table)}, '
+            f'{quote(ArchivedExpense._meta.db_table)} '
+            f'IN SHARE ROW EXCLUSIVE MODE'
+        )
+
+
+class CategoryManager(models.Manager):
+
+    def _deltas(self, added, removed):
+        deltas = {}
+        for expenses, sign in ((added, 1), (removed, -1)):
+            for expense in expenses:
+                if expense.category_id is None:
+                    continue
+                total, count = deltas.get(expense.category_id, (0, 0))
+                deltas[expense.category_id] = (
+                    total + sign * expense.price,
+                    count + sign
+                )
+        return deltas
+
+    def record(self, added=(), removed=()):
+        """
+        Apply added and removed Expenses to their Categories' totals
+        :param added:
+        :param removed:
+        :return:
+        """
+        for category_id, (total, count) in \
+                self._deltas(added, removed).items():
+            if total or count:
+                self.filter(pk=category_id).update(
+                    total=F('total') + total,
+                    count=F('count') + count
+                )
+
+    def record_bulk(self, added=(), removed=()):
+        """
+        Apply many added and removed Expenses to their Categories' totals
+        in a fixed number of queries, locking the Categories until the
+        transaction ends
+        :param added:
+        :param removed:
+        :return:
+        """
+        deltas = self._deltas(added, removed)
+        categories = list(
+            self.select_for_update().filter(pk__in=deltas).order_by('pk')
+        )
+        for category in categories:
+            total, count = deltas[category.pk]
+            category.total += total
+            category.count += count
+
+        self.bulk_update(categories, ['total', 'count'], batch_size=1000)
+
+    def expected(self):
+        """
+        Compute the Category totals from the Expenses, archived ones
+        included
+        :return totals: {category_id: (total, count)}
+        """
+        totals = {pk: (0, 0) for pk in self.values_list('pk', flat=True)}
+        for model in (Expense, ArchivedExpense):
+            rows = model.objects \
+                .filter(category__isnull=False) \
+                .values('category_id') \
+                .annotate(total=Sum('price'), count=Count('id')) \
+                .order_by() \
+                .values_list('category_id', 'total', 'count')
+
+            for category_id, total, count in rows:
+                stored_total, stored_count = totals[category_id]
+                totals[category_id] = (stored_total + total,
+                                       stored_count + count)
+
+        return totals
+
+    def drift(self):
+        """
+        List the Categories whose totals differ from the Expenses
+        :return drift: [(category_id, stored, expected)]
+        """
+        current = {
+            pk: (total, count)
+            for pk, total, count in self.values_list('pk', 'total', 'count')
+        }
+
+        return [
+            (pk, current.get(pk), totals)
+            for pk, totals in sorted(self.expected().items())
+            if current.get(pk) != totals
+        ]
+
+    def rebuild(self):
+        """
+        Recompute the totals of all Categories from the Expenses
+        :return count:
+        """
+        with transaction.atomic(using=self.db):
+            _lock_for_rebuild(self)
+            categories = list(self.all())
+            expected = self.expected()
+            for category in categories:
+                category.total, category.count = expected[category.pk]
+
+            self.bulk_update(categories, ['total', 'count'], batch_size=1000)
+
+        return len(categories)
+
+
+class Category(models.Model):
+    """
+    A User's Expense category with the running total and count of its
+    Expenses
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    name = models.CharField(max_length=255)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    objects = CategoryManager()
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='category_user_name_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
 class Expense(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -52,8 +219,584 @@ class Expense(models.Model):
     )
     expense_name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=8, decimal_places=2)
-    # category = models.ManyToOneRel('Category')
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='expenses'
+    )
     date_created = models.DateField(blank=True)
+    # The RecurringExpense and occurrence this Expense was created for.
+    # The unique constraint below indexes recurrence first, so the foreign
+    # key needs no index of its own.
+    recurrence = models.ForeignKey(
+        'RecurringExpense',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='expenses',
+        db_index=False
+    )
+    recurrence_date = models.DateField(null=True, blank=True)
+    # Set on every save, bulk_create and bulk write of the API; drives
+    # Last-Modified and delta sync.
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recurrence', 'recurrence_date'],
+                name='expense_recurrence_date_unique'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-date_created', '-id'],
+                name='expense_user_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'expense_name', 'id'],
+                name='expense_user_name_idx'
+            ),
+            models.Index(
+                fields=['user', 'price', 'id'],
+                name='expense_user_price_idx'
+            ),
+            models.Index(
+                fields=['user', 'updated_at', 'id'],
+                name='expense_user_updated_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.expense_name
+
+
+class ArchivedExpenseManager(models.Manager):
+
+    def archive(self, before, batch_size=5000):
+        """
+        Move the Expenses dated before `before` to the archive, in batches
+
+        Each batch copies its Expenses and deletes them from the Expense
+        table in one transaction, so an interrupted run loses nothing and
+        the next run carries on. Rollups and Category totals count
+        archived Expenses too and are left unchanged.
+        :param before: first date to keep in the Expense table
+        :param batch_size: Expenses per batch
+        :return batches: iterator of the archived Expenses per committed
+            batch
+        """
+        fields = ['id', 'user_id', 'expense_name', 'price', 'category_id',
+                  'date_created', 'updated_at']
+        old = Expense.objects.filter(date_created__lt=before).order_by('id')
+
+        while True:
+            with transaction.atomic(using=self.db):
+                rows = old.select_for_update().values(*fields)[:batch_size]
+                archived = self.bulk_create(
+                    [self.model(**row) for row in rows],
+                    batch_size=1000
+                )
+                if not archived:
+                    return
+
+                # One statement, without loading the rows again: post_delete
+                # is deliberately not sent, as archived Expenses are not
+                # deleted. Rollups and Category totals keep them, and
+                # callers invalidate cached responses per User.
+                quote = connections[self.db].ops.quote_name
+                with connections[self.db].cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {quote(Expense._meta.db_table)} '
+                        f'WHERE id BETWEEN %s AND %s AND id IN ('
+                        f'SELECT id FROM {quote(self.model._meta.db_table)} '
+                        f'WHERE id BETWEEN %s AND %s)',
+                        [archived[0].id, archived[-1].id] * 2
+                    )
+                DeletedExpense.objects.record(archived)
+
+            yield archived
+
+
+class ArchivedExpense(models.Model):
+    """
+    An Expense moved out of the Expense table by archive_expenses
+
+    Keeps the Expense's id and the fields the API returns, with a single
+    index for listing a User's archive by date, so the Expense table and
+    its indexes only hold recent Expenses. Archived Expenses are read-only.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Indexed first by the date index below.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    expense_name = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='archived_expenses'
+    )
+    date_created = models.DateField()
+    updated_at = models.DateTimeField()
+
+    objects = ArchivedExpenseManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-date_created', '-id'],
+                name='archived_user_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.expense_name
+
+
+class DeletedExpenseManager(models.Manager):
+
+    def record(self, expenses):
+        """
+        Leave tombstones for Expenses deleted or archived
+        :param expenses: Expenses or ArchivedExpenses
+        :return:
+        """
+        now = timezone.now()
+        self.bulk_create(
+            [
+                self.model(id=expense.id, user_id=expense.user_id,
+                           deleted_at=now)
+                for expense in expenses
+            ],
+            batch_size=1000
+        )
+
+    def prune(self, before):
+        """
+        Delete tombstones older than before
+        :param before:
+        :return count:
+        """
+        count, _ = self.filter(deleted_at__lt=before).delete()
+        return count
+
+
+class DeletedExpense(models.Model):
+    """
+    Tombstone of an Expense deleted, archived or detached from the Expense
+    table, so delta sync can tell clients to drop it
+
+    Keeps the Expense's id. Tombstones are pruned after
+    EXPENSE_SYNC_TOMBSTONE_DAYS.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    # Indexed first by the sync index below.
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False
+    )
+    deleted_at = models.DateTimeField()
+
+    objects = DeletedExpenseManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', 'deleted_at', 'id'],
+                name='deleted_user_deleted_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+
+class ExpenseRollupManager(models.Manager):
+
+    def _deltas(self, added, removed):
+        deltas = {}
+        for expenses, sign in ((added, 1), (removed, -1)):
+            for expense in expenses:
+                key = (expense.user_id, expense.date_created.replace(day=1))
+                total, count = deltas.get(key, (0, 0))
+                deltas[key] = (total + sign * expense.price, count + sign)
+        return deltas
+
+    def record(self, added=(), removed=()):
+        """
+        Apply added and removed Expenses to the monthly rollups
+        :param added:
+        :param removed:
+        :return:
+        """
+        for (user_id, month), (total, count) in \
+                self._deltas(added, removed).items():
+            if total or count:
+                self._apply(user_id, month, total, count)
+
+    def record_bulk(self, added=(), removed=()):
+        """
+        Apply many added and removed Expenses to the monthly rollups in a
+        fixed number of queries, locking the rollups until the transaction
+        ends
+        :param added:
+        :param removed:
+        :return:
+        """
+        deltas = self._deltas(added, removed)
+        if not deltas:
+            return
+
+        # Create the missing rollups empty before locking, so a rollup
+        # created concurrently is skipped here and updated below instead
+        # of failing the unique constraint.
+        self.bulk_create(
+            [
+                self.model(user_id=user_id, month=month, total=0, count=0)
+                for user_id, month in sorted(deltas)
+            ],
+            batch_size=1000,
+            ignore_conflicts=True
+        )
+        rollups = self.select_for_update() \
+            .filter(
+                user_id__in={user_id for user_id, _ in deltas},
+                month__in={month for _, month in deltas}
+            ) \
+            .order_by('user_id', 'month')
+
+        changed = []
+        for rollup in rollups:
+            key = (rollup.user_id, rollup.month)
+            if key in deltas:
+                total, count = deltas[key]
+                rollup.total += total
+                rollup.count += count
+                changed.append(rollup)
+
+        self.bulk_update(changed, ['total', 'count'], batch_size=1000)
+
+    def _apply(self, user_id, month, total, count):
+        rollup = self.filter(user_id=user_id, month=month)
+        changes = {'total': F('total') + total, 'count': F('count') + count}
+
+        if rollup.update(**changes):
+            return
+
+        try:
+            with transaction.atomic(using=self.db):
+                self.create(
+                    user_id=user_id,
+                    month=month,
+                    total=total,
+                    count=count
+                )
+        except IntegrityError:
+            # Created concurrently since the update above.
+            rollup.update(**changes)
+
+    def expected(self):
+        """
+        Compute the rollups from the Expenses, archived ones included
+        :return rollups: {(user_id, month): (total, count)}
+        """
+        rollups = {}
+        for model in (Expense, ArchivedExpense):
+            rows = model.objects \
+                .annotate(month=TruncMonth('date_created')) \
+                .values('user_id', 'month') \
+                .annotate(total=Sum('price'), count=Count('id')) \
+                .order_by() \
+                .values_list('user_id', 'month', 'total', 'count')
+
+            for user_id, month, total, count in rows:
+                stored_total, stored_count = rollups.get(
+                    (user_id, month), (0, 0)
+                )
+                rollups[user_id, month] = (stored_total + total,
+                                           stored_count + count)
+
+        return rollups
+
+    def current(self):
+        """
+        Return the stored rollups, ignoring ones that net to nothing
+        :return rollups: {(user_id, month): (total, count)}
+        """
+        rows = self.exclude(total=0, count=0) \
+            .values_list('user_id', 'month', 'total', 'count')
+
+        return {
+            (user_id, month): (total, count)
+            for user_id, month, total, count in rows
+        }
+
+    def drift(self):
+        """
+        List the rollups that differ from the Expenses
+        :return drift: [((user_id, month), stored, expected)]
+        """
+        expected = self.expected()
+        current = self.current()
+
+        return [
+            (key, current.get(key), expected.get(key))
+            for key in sorted(expected.keys() | current.keys())
+            if current.get(key) != expected.get(key)
+        ]
+
+    def rebuild(self):
+        """
+        Replace all rollups with ones computed from the Expenses
+        :return count:
+        """
+        with transaction.atomic(using=self.db):
+            _lock_for_rebuild(self)
+            rollups = [
+                self.model(user_id=user_id, month=month, total=total,
+                           count=count)
+                for (user_id, month), (total, count)
+                in self.expected().items()
+            ]
+
+            self.all().delete()
+            self.bulk_create(rollups, batch_size=1000)
+
+        return len(rollups)
+
+
+class ExpenseRollup(models.Model):
+    """
+    Running total and count of a User's Expenses in one month
+    """
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    month = models.DateField()
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    objects = ExpenseRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month'],
+                name='expense_rollup_user_month_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.month:%Y-%m}: {self.total}'
+
+
+def add_months(day, months):
+    """
+    Move a date by whole months, clamping the day to the month's length
+    :param day:
+    :param months:
+    :return date:
+    """
+    month = day.month - 1 + months
+    year = day.year + month // 12
+    month = month % 12 + 1
+    return day.replace(
+        year=year,
+        month=month,
+        day=min(day.day, calendar.monthrange(year, month)[1])
+    )
+
+
+class RecurringExpenseManager(models.Manager):
+
+    def materialize(self, as_of, user_ids=None, batch_size=10000):
+        """
+        Create the Expenses of all occurrences due by as_of, in batches
+
+        Each batch creates its Expenses, updates the rollups and Category
+        totals and advances the templates' next_date in one transaction,
+        so next_date is the checkpoint: an interrupted run resumes where it
+        stopped and a repeated run creates nothing. Templates locked by a
+        concurrent run are skipped.
+        :param as_of: last date to create occurrences for
+        :param user_ids: optional (first, last) range of User ids
+        :param batch_size: Expenses per batch
+        :return batches: iterator of (templates, expenses) per committed
+            batch
+        """
+        due = self.filter(next_date__lte=as_of).order_by('id')
+        if user_ids is not None:
+            first, last = user_ids
+            due = due.filter(user_id__gte=first, user_id__lte=last)
+
+        last_id = 0
+        while True:
+            with transaction.atomic(using=self.db):
+                candidates = due.select_for_update(skip_locked=True) \
+                    .filter(id__gt=last_id)[:batch_size]
+
+                templates = []
+                expenses = []
+                for template in candidates:
+                    templates.append(template)
+                    expenses.extend(template.occurrences(as_of))
+                    if len(expenses) >= batch_size:
+                        break
+
+                if not templates:
+                    return
+
+                expenses = self._exclude_existing(expenses)
+                Expense.objects.bulk_create(expenses, batch_size=1000)
+                ExpenseRollup.objects.record_bulk(expenses)
+                Category.objects.record_bulk(expenses)
+                self.bulk_update(templates, ['next_date'], batch_size=1000)
+
+            last_id = templates[-1].id
+            yield templates, expenses
+
+    def _exclude_existing(self, expenses):
+        """
+        Drop occurrences that already have an Expense, e.g. after a
+        template's next_date was moved back
+        """
+        if not expenses:
+            return expenses
+
+        existing = set(
+            Expense.objects
+            .filter(
+                recurrence_id__in={e.recurrence_id for e in expenses},
+                recurrence_date__gte=min(e.recurrence_date for e in expenses)
+            )
+            .values_list('recurrence_id', 'recurrence_date')
+        )
+        return [
+            expense for expense in expenses
+            if (expense.recurrence_id, expense.recurrence_date)
+            not in existing
+        ]
+
+
+class RecurringExpense(models.Model):
+    """
+    Template for an Expense repeating every `interval` days, weeks or
+    months from start_date, until end_date if set
+
+    next_date is the first occurrence without an Expense yet, or None
+    once the template has ended.
+    """
+    DAILY = 'daily'
+    WEEKLY = 'weekly'
+    MONTHLY = 'monthly'
+    FREQUENCY_CHOICES = [
+        (DAILY, 'Daily'),
+        (WEEKLY, 'Weekly'),
+        (MONTHLY, 'Monthly'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE
+    )
+    expense_name = models.CharField(max_length=255)
+    price = models.DecimalField(max_digits=8, decimal_places=2)
+    category = models.ForeignKey(
+        Category,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='recurring_expenses'
+    )
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES)
+    interval = models.PositiveSmallIntegerField(default=1)
+    start_date = models.DateField()
+    end_date = models.DateField(null=True, blank=True)
+    next_date = models.DateField(null=True, blank=True)
+
+    objects = RecurringExpenseManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_date', 'id'],
+                name='recurring_next_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return self.expense_name
+
+    def following(self, day):
+        """
+        Return the occurrence after day
+        :param day: an occurrence
+        :return date:
+        """
+        if self.frequency == self.DAILY:
+            return day + timedelta(days=self.interval)
+        if self.frequency == self.WEEKLY:
+            return day + timedelta(weeks=self.interval)
+
+        # Count months from start_date so a template starting on the 31st
+        # comes back to the 31st after a shorter month.
+        months = (day.year - self.start_date.year) * 12 \
+            + day.month - self.start_date.month
+        return add_months(self.start_date, months + self.interval)
+
+    def set_end_date(self, end_date):
+        """
+        Change end_date, ending the template or resuming an ended one after
+        the occurrences it already had
+        :param end_date:
+        :return:
+        """
+        if self.next_date is None and self.end_date is not None:
+            day = self.start_date
+            while day <= self.end_date:
+                day = self.following(day)
+            self.next_date = day
+
+        self.end_date = end_date
+        if end_date is not None and self.next_date is not None \
+                and self.next_date > end_date:
+            self.next_date = None
+
+    def occurrences(self, until):
+        """
+        Build unsaved Expenses for the occurrences from next_date up to
+        until and advance next_date past them
+        :param until:
+        :return expenses:
+        """
+        if self.end_date is not None:
+            until = min(until, self.end_date)
+
+        expenses = []
+        while self.next_date is not None and self.next_date <= until:
+            expenses.append(Expense(
+                user_id=self.user_id,
+                expense_name=self.expense_name,
+                price=self.price,
+                category_id=self.category_id,
+                date_created=self.next_date,
+                recurrence=self,
+                recurrence_date=self.next_date
+            ))
+            self.next_date = self.following(self.next_date)
+
+        if self.end_date is not None and self.next_date is not None \
+                and self.next_date > self.end_date:
+            self.next_date = None
+
+        return expenses
@@ -0,0 +1,423 @@
+"""
+PostgreSQL range partitioning of the Expense table by date_created
+
+Partitioning is optional and PostgreSQL only. `convert()` turns the
+existing table into a partitioned one with a partition per month or year
+and a default partition for dates outside them. Past partitions are only
+created for recent periods that hold Expenses, so an outlying
+date_created lands in the default partition instead of adding a
+partition for every period up to it. Queries filtering on
+date_created then only scan the partitions in range, and old partitions
+are archived by detaching them instead of a mass DELETE.
+
+A partitioned table needs the partition key in every unique constraint,
+so the primary key becomes (id, date_created) and unique constraints gain
+date_created. Django keeps treating id as the primary key; ids stay
+unique because they all come from one sequence.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from core.models import (
+    Category,
+    DeletedExpense,
+    Expense,
+    ExpenseRollup,
+    add_months
+)
+
+
+INTERVALS = {'month': 1, 'year': 12}
+
+TABLE = Expense._meta.db_table
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+
+def period_start(day, interval):
+    """
+    Return the first day of the month or year containing day
+    :param day:
+    :param interval: 'month' or 'year'
+    :return date:
+    """
+    if interval == 'year':
+        return date(day.year, 1, 1)
+    return date(day.year, day.month, 1)
+
+
+def partition_name(start, interval):
+    """
+    Name the partition starting at start, e.g. core_expense_p2023_01
+    :param start:
+    :param interval:
+    :return name:
+    """
+    if interval == 'year':
+        return f'{TABLE}_p{start:%Y}'
+    return f'{TABLE}_p{start:%Y_%m}'
+
+
+def periods(first, last, interval):
+    """
+    List the (start, end) bounds of the periods from first to last
+    :param first:
+    :param last:
+    :param interval:
+    :return bounds: [(start, end)], end exclusive
+    """
+    start = period_start(first, interval)
+    bounds = []
+    while start <= last:
+        end = add_months(start, INTERVALS[interval])
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+def horizon(interval, ahead, today=None):
+    """
+    Return the start of the period ahead periods after the current one
+    :param interval:
+    :param ahead:
+    :param today:
+    :return date:
+    """
+    today = today or date.today()
+    return add_months(period_start(today, interval),
+                      INTERVALS[interval] * ahead)
+
+
+def is_partitioned(connection):
+    """
+    Whether the Expense table is partitioned
+    :param connection:
+    :return partitioned:
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table '
+            'WHERE partrelid = %s::regclass',
+            [TABLE]
+        )
+        return cursor.fetchone() is not None
+
+
+def partitions(connection):
+    """
+    List the range partitions of the Expense table
+    :param connection:
+    :return partitions: [(name, start, end)] ordered by start
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT child.relname, pg_get_expr(child.relpartbound, '
+            'child.oid) '
+            'FROM pg_inherits '
+            'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+            'WHERE pg_inherits.inhparent = %s::regclass',
+            [TABLE]
+        )
+        rows = cursor.fetchall()
+
+    result = []
+    for name, bound in rows:
+        # FOR VALUES FROM ('2023-01-01') TO ('2023-02-01')
+        if not bound.startswith('FOR VALUES FROM'):
+            continue
+        start, end = (
+            date.fromisoformat(value.split("'")[1])
+            for value in bound.split(' TO ')
+        )
+        result.append((name, start, end))
+
+    return sorted(result, key=lambda partition: partition[1])
+
+
+def create_partition(connection, start, end, name):
+    """
+    Create the partition for [start, end), moving any rows for that range
+    out of the default partition
+    :param connection:
+    :param start:
+    :param end:
+    :param name:
+    :return:
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} '
+            f'(LIKE {quote(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        # The default partition may hold rows dated in the new range, and
+        # the partition cannot be attached while it does.
+        cursor.execute(
+            f'WITH moved AS ('
+            f'DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE date_created >= %s AND date_created < %s RETURNING *'
+            f') INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ATTACH PARTITION {quote(name)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [start.isoformat(), end.isoformat()]
+        )
+
+
+def create_partitions(connection, interval, until):
+    """
+    Create the missing partitions from the last one up to until
+    :param connection:
+    :param interval:
+    :param until:
+    :return created: names of the new partitions
+    """
+    existing = partitions(connection)
+    first = existing[-1][2] if existing else date.today()
+
+    created = []
+    for start, end in periods(first, until, interval):
+        name = partition_name(start, interval)
+        create_partition(connection, start, end, name)
+        created.append(name)
+
+    return created
+
+
+def _table_definition(cursor):
+    """
+    Read the indexes and constraints of the unpartitioned Expense table
+    """
+    cursor.execute(
+        'SELECT pg_get_indexdef(index.indexrelid) FROM pg_index index '
+        'WHERE index.indrelid = %s::regclass AND NOT EXISTS ('
+        'SELECT 1 FROM pg_constraint '
+        'WHERE pg_constraint.conindid = index.indexrelid)',
+        [TABLE]
+    )
+    indexes = [definition for definition, in cursor.fetchall()]
+
+    cursor.execute(
+        "SELECT conname, contype, pg_get_constraintdef(oid), "
+        "ARRAY(SELECT attname::text "
+        "FROM unnest(conkey) WITH ORDINALITY AS key(attnum, position) "
+        "JOIN pg_attribute ON attrelid = conrelid "
+        "AND pg_attribute.attnum = key.attnum ORDER BY position) "
+        "FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('f', 'u')",
+        [TABLE]
+    )
+    constraints = cursor.fetchall()
+
+    cursor.execute(
+        'SELECT conrelid::regclass::text FROM pg_constraint '
+        'WHERE confrelid = %s::regclass',
+        [TABLE]
+    )
+    referencing = [table for table, in cursor.fetchall()]
+
+    return indexes, constraints, referencing
+
+
+def convert(connection, interval, ahead=3, behind=24):
+    """
+    Replace the Expense table with a partitioned copy of it
+
+    Runs in one transaction holding an exclusive lock on the table, and
+    copies every row, so plan for downtime on large tables.
+    :param connection:
+    :param interval: 'month' or 'year'
+    :param ahead: periods to create after the current one
+    :param behind: periods before the current one to create partitions
+        for, if they hold Expenses; older rows go to the default partition
+    :return created: names of the partitions
+    """
+    quote = connection.ops.quote_name
+    new_table = f'{TABLE}_partitioned'
+
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {quote(TABLE)} IN ACCESS EXCLUSIVE MODE')
+        indexes, constraints, referencing = _table_definition(cursor)
+        if referencing:
+            raise ValueError(
+                f'{", ".join(referencing)} reference {TABLE} with a foreign '
+                f'key, which a partitioned table cannot serve.'
+            )
+
+        today = date.today()
+        current = period_start(today, interval)
+        cursor.execute(
+            f'SELECT DISTINCT date_trunc(%s, date_created)::date '
+            f'FROM {quote(TABLE)} '
+            f'WHERE date_created >= %s AND date_created < %s',
+            [interval, add_months(current, -INTERVALS[interval] * behind),
+             current]
+        )
+        bounds = [
+            (start, add_months(start, INTERVALS[interval]))
+            for start in sorted(start for start, in cursor.fetchall())
+        ]
+        bounds += periods(current, horizon(interval, ahead, today), interval)
+
+        # Identity columns on partitioned tables need PostgreSQL 17, so
+        # ids come from a sequence owned by the new table, whether the old
+        # one used serial or identity.
+        sequence = f'{new_table}_id_seq'
+        cursor.execute(
+            f'CREATE TABLE {quote(new_table)} '
+            f'(LIKE {quote(TABLE)} INCLUDING DEFAULTS) '
+            f'PARTITION BY RANGE (date_created)'
+        )
+        cursor.execute(
+            f'CREATE SEQUENCE {quote(sequence)} AS bigint '
+            f'OWNED BY {quote(new_table)}.id'
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(new_table)} ALTER COLUMN id '
+            f"SET DEFAULT nextval('{sequence}')"
+        )
+        cursor.execute(
+            f'CREATE TABLE {quote(DEFAULT_PARTITION)} '
+            f'PARTITION OF {quote(new_table)} DEFAULT'
+        )
+        created = []
+        for start, end in bounds:
+            name = partition_name(start, interval)
+            cursor.execute(
+                f'CREATE TABLE {quote(name)} PARTITION OF {quote(new_table)} '
+                f'FOR VALUES FROM (%s) TO (%s)',
+                [start.isoformat(), end.isoformat()]
+            )
+            created.append(name)
+
+        # Load before building indexes, which is faster than maintaining
+        # them row by row.
+        cursor.execute(
+            f'INSERT INTO {quote(new_table)} SELECT * FROM {quote(TABLE)}'
+        )
+
+        cursor.execute(f'DROP TABLE {quote(TABLE)}')
+        cursor.execute(
+            f'ALTER TABLE {quote(new_table)} RENAME TO {quote(TABLE)}'
+        )
+        # Takes the name of the old sequence, dropped with its table.
+        cursor.execute(
+            f'ALTER SEQUENCE {quote(sequence)} '
+            f'RENAME TO {quote(TABLE + "_id_seq")}'
+        )
+        cursor.execute(
+            f"SELECT setval(pg_get_serial_sequence(%s, 'id'), "
+            f'coalesce(max(id), 0) + 1, false) FROM {quote(TABLE)}',
+            [TABLE]
+        )
+
+        cursor.execute(
+            f'ALTER TABLE {quote(TABLE)} ADD CONSTRAINT '
+            f'{quote(TABLE + "_pkey")} PRIMARY KEY (id, date_created)'
+        )
+        for name, kind, definition, columns in constraints:
+            if kind == 'u':
+                if 'date_created' not in columns:
+                    columns = [*columns, 'date_created']
+                definition = \
+                    f'UNIQUE ({", ".join(quote(c) for c in columns)})'
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} '
+                f'ADD CONSTRAINT {quote(name)} {definition}'
+            )
+        for definition in indexes:
+            cursor.execute(definition)
+
+    return created
+
+
+def detach_partition(connection, name):
+    """
+    Detach a partition, keeping it as a standalone table, take its
+    Expenses out of the rollups and Category totals and leave tombstones
+    for delta sync
+    :param connection:
+    :param name:
+    :return (count, user_ids): Expenses in the detached partition and
+        the Users they belong to
+    """
+    quote = connection.ops.quote_name
+    bounds = {partition: (start, end)
+              for partition, start, end in partitions(connection)}
+    start, end = bounds[name]
+
+    expenses = Expense.objects.filter(
+        date_created__gte=start,
+        date_created__lt=end
+    )
+    category_expenses = expenses \
+        .filter(category=OuterRef('pk')) \
+        .order_by() \
+        .values('category')
+
+    with transaction.atomic(using=connection.alias):
+        count = expenses.count()
+        user_ids = set(
+            expenses.order_by().values_list('user_id', flat=True).distinct()
+        )
+
+        # Archived Expenses of these months stay in their rollups, so take
+        # out only the partition's share.
+        removed = {
+            (user_id, month): (total, count)
+            for user_id, month, total, count in expenses
+            .annotate(month=TruncMonth('date_created'))
+            .values('user_id', 'month')
+            .annotate(total=Sum('price'), count=Count('id'))
+            .order_by()
+            .values_list('user_id', 'month', 'total', 'count')
+        }
+        rollups = ExpenseRollup.objects \
+            .select_for_update() \
+            .filter(month__gte=start, month__lt=end, user_id__in=user_ids) \
+            .order_by('user_id', 'month')
+        changed, emptied = [], []
+        for rollup in rollups:
+            removed_total, removed_count = removed.get(
+                (rollup.user_id, rollup.month), (0, 0)
+            )
+            rollup.total -= removed_total
+            rollup.count -= removed_count
+            (changed if rollup.count else emptied).append(rollup)
+        ExpenseRollup.objects.bulk_update(changed, ['total', 'count'],
+                                          batch_size=1000)
+        ExpenseRollup.objects \
+            .filter(pk__in=[rollup.pk for rollup in emptied]) \
+            .delete()
+        Category.objects \
+            .filter(pk__in=expenses.values('category_id')) \
+            .update(
+                total=F('total') - Subquery(
+                    category_expenses.annotate(total=Sum('price'))
+                    .values('total')
+                ),
+                count=F('count') - Subquery(
+                    category_expenses.annotate(count=Count('id'))
+                    .values('count')
+                )
+            )
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(DeletedExpense._meta.db_table)} '
+                f'(id, user_id, deleted_at) '
+                f'SELECT id, user_id, %s FROM {quote(name)}',
+                [timezone.now()]
+            )
+            cursor.execute(
+                f'ALTER TABLE {quote(TABLE)} DETACH PARTITION {quote(name)}'
+            )
+
+    return count, user_ids
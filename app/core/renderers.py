@@ -0,0 +1,116 @@
+"""
+Fast JSON and MessagePack renderers
+
+ORJSONRenderer writes the same JSON as DRF's JSONRenderer with the
+compact and unicode defaults, using orjson instead of the json module,
+except for NaN and Infinity. Dates and times go through the same
+conversion as DRF's JSONEncoder rather than orjson's own, which differs
+for offsets with seconds and timezone-aware times, and U+2028 and U+2029
+are escaped for JavaScript as JSONRenderer does. NaN and Infinity are
+written as null where JSONRenderer's strict mode rejects them: finding
+them would mean walking the data in Python, which costs more than
+encoding it, and no model here stores a float.
+MessagePackRenderer serves the same data as MessagePack to clients that
+ask for it with `Accept: application/msgpack`.
+
+Serializers already turn Decimals into strings, so prices are exact in
+both formats. Any Decimal that reaches a renderer directly is also written
+as a string, never as a lossy float.
+"""
+import datetime
+import decimal
+import uuid
+
+import msgpack
+import orjson
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from django.utils.functional import Promise
+
+from rest_framework import renderers
+
+
+# Lead byte of U+2028 and U+2029 in UTF-8, shared by U+2000 to U+2FFF.
+LINE_SEPARATOR_LEAD = '\u2028'.encode()[:1]
+
+
+def default(obj):
+    """
+    Convert what orjson and msgpack cannot encode, as DRF's JSONEncoder
+    does except for Decimal
+    :param obj:
+    :return value:
+    """
+    if isinstance(obj, Promise):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return str(obj)
+    if isinstance(obj, datetime.datetime):
+        representation = obj.isoformat()
+        if representation.endswith('+00:00'):
+            representation = representation[:-6] + 'Z'
+        return representation
+    if isinstance(obj, datetime.date):
+        return obj.isoformat()
+    if isinstance(obj, datetime.time):
+        if timezone.is_aware(obj):
+            raise ValueError("JSON can't represent timezone-aware times.")
+        return obj.isoformat()
+    if isinstance(obj, datetime.timedelta):
+        return str(obj.total_seconds())
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, QuerySet):
+        return tuple(obj)
+    if isinstance(obj, bytes):
+        return obj.decode()
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    if hasattr(obj, '__getitem__'):
+        try:
+            return dict(obj)
+        except (TypeError, ValueError):
+            pass
+    if hasattr(obj, '__iter__'):
+        return tuple(obj)
+    raise TypeError(f'Type is not serializable: {type(obj).__name__}')
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+    """
+    JSONRenderer encoding with orjson
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+
+        rendered = orjson.dumps(data, default=default, option=option)
+        # Valid JSON but not valid JavaScript, escaped as JSONRenderer does.
+        # Scanning for one byte is far cheaper than copying the output.
+        if LINE_SEPARATOR_LEAD in rendered:
+            rendered = rendered \
+                .replace('\u2028'.encode(), b'\\u2028') \
+                .replace('\u2029'.encode(), b'\\u2029')
+        return rendered
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    """
+    Renderer for MessagePack, with values JSON cannot hold written as they
+    would be in JSON
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        return msgpack.packb(data, default=default, use_bin_type=True)
@@ -0,0 +1,34 @@
+"""
+Test helpers
+"""
+from core.metrics import registry
+
+
+class QueryBudgetMixin:
+    """
+    Fail any request in the test case that runs more queries than its
+    view's budget
+
+    query_budgets maps a view name, optionally prefixed by the HTTP
+    method ('POST expense:expense-list'), to the allowed query count.
+    """
+    query_budgets = {}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        registry.add_listener(cls.check_query_budget)
+        cls.addClassCleanup(registry.remove_listener, cls.check_query_budget)
+
+    @classmethod
+    def check_query_budget(cls, view, sample):
+        budget = cls.query_budgets.get(
+            f'{sample["method"]} {view}',
+            cls.query_budgets.get(view)
+        )
+
+        if budget is not None and sample['queries'] > budget:
+            raise cls.failureException(
+                f'{sample["method"]} {view} ran {sample["queries"]} '
+                f'queries, over its budget of {budget}'
+            )
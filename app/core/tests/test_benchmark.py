@@ -0,0 +1,54 @@
+"""
+Tests for benchmark helpers
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core import benchmark
+from core.models import Expense, ExpenseRollup
+
+
+class BenchmarkTests(TestCase):
+
+    def test_seed(self):
+        users = benchmark.seed(3, 20, batch_size=7)
+
+        self.assertEqual(len(users), 3)
+        self.assertEqual(Expense.objects.count(), 60)
+        user, key = users[0]
+        self.assertEqual(user.auth_token.key, key)
+        self.assertTrue(
+            get_user_model().objects.get(id=user.id)
+            .check_password(benchmark.BENCH_PASSWORD)
+        )
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+
+    def test_seed_leaves_other_rollups_alone(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        # Inserted without its rollup, which only a rebuild would add.
+        Expense.objects.bulk_create([
+            Expense(user=user, expense_name='Gas', price=Decimal('10.00'),
+                    date_created=date(2023, 1, 5))
+        ])
+
+        benchmark.seed(2, 5)
+
+        self.assertFalse(ExpenseRollup.objects.filter(user=user).exists())
+        self.assertEqual(
+            [key for key, _, _ in ExpenseRollup.objects.drift()],
+            [(user.id, date(2023, 1, 1))]
+        )
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+
+        self.assertEqual(benchmark.percentile(samples, 50), 50)
+        self.assertEqual(benchmark.percentile(samples, 95), 95)
+        self.assertEqual(benchmark.percentile(samples, 99), 99)
+        self.assertEqual(benchmark.percentile([7], 99), 7)
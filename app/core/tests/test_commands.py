@@ -0,0 +1,55 @@
+"""
+Tests for Django management commands
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from core import models
+
+
+class RebuildExpenseRollupsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        self.category = models.Category.objects.create(
+            user=self.user,
+            name='Bills'
+        )
+        models.Expense.objects.create(
+            user=self.user,
+            expense_name='Expense',
+            price=Decimal('10.00'),
+            category=self.category,
+            date_created=date(2023, 1, 15)
+        )
+
+    def test_check_reports_drift(self):
+        out = StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_expense_rollups', check=True, stdout=out)
+
+        self.assertIn('2023-01', out.getvalue())
+        self.assertIn(f'category {self.category.id}', out.getvalue())
+        self.assertFalse(models.ExpenseRollup.objects.exists())
+
+    def test_rebuild_fixes_drift(self):
+        call_command('rebuild_expense_rollups', stdout=StringIO())
+
+        call_command(
+            'rebuild_expense_rollups',
+            check=True,
+            stdout=StringIO()
+        )
+        self.assertEqual(models.ExpenseRollup.objects.get().count, 1)
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.count, 1)
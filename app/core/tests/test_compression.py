@@ -0,0 +1,188 @@
+"""
+Tests for response compression
+"""
+import gzip
+import zlib
+
+import brotli
+import zstandard
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.compression import (
+    CODECS,
+    BrotliCodec,
+    GzipCodec,
+    ZstdCodec,
+    negotiate,
+    parse_accept_encoding
+)
+from core.middleware import CompressionMiddleware
+
+
+LEVELS = {'zstd': 3, 'br': 4, 'gzip': 6}
+BODY = b'{"id":1,"expense_name":"Gas","price":"10.00"},' * 100
+
+DECOMPRESS = {
+    'gzip': gzip.decompress,
+    'br': brotli.decompress,
+    'zstd': lambda data: zstandard.ZstdDecompressor().decompressobj()
+    .decompress(data),
+}
+
+
+class NegotiationTests(SimpleTestCase):
+
+    def test_parse_accept_encoding(self):
+        self.assertEqual(
+            parse_accept_encoding('gzip;q=0.5, BR, zstd;q=bad, , x-gzip'),
+            {'gzip': 0.5, 'br': 1.0, 'zstd': 0.0, 'x-gzip': 1.0}
+        )
+
+    def test_highest_quality_wins(self):
+        self.assertEqual(negotiate('gzip, br;q=0.8', LEVELS), 'gzip')
+
+    def test_ties_go_to_server_preference(self):
+        self.assertEqual(negotiate('gzip, br, zstd', LEVELS), 'zstd')
+        self.assertEqual(negotiate('gzip, br', LEVELS), 'br')
+
+    def test_wildcard(self):
+        self.assertEqual(negotiate('*', LEVELS), 'zstd')
+        self.assertEqual(negotiate('zstd;q=0, *', LEVELS), 'br')
+
+    def test_x_gzip(self):
+        self.assertEqual(negotiate('x-gzip', LEVELS), 'gzip')
+
+    def test_nothing_acceptable(self):
+        self.assertIsNone(negotiate('', LEVELS))
+        self.assertIsNone(negotiate('identity, deflate', LEVELS))
+        self.assertIsNone(negotiate('gzip;q=0', LEVELS))
+        self.assertIsNone(negotiate('br', {'gzip': 6}))
+
+
+class CodecTests(SimpleTestCase):
+
+    def test_compress_round_trip(self):
+        for encoding, codec in CODECS.items():
+            with self.subTest(encoding=encoding):
+                compressed = codec(LEVELS[encoding]).compress(BODY)
+
+                self.assertLess(len(compressed), len(BODY))
+                self.assertEqual(DECOMPRESS[encoding](compressed), BODY)
+
+    def test_stream_flushes_every_chunk(self):
+        chunks = [BODY[:500], b'', BODY[500:]]
+        decompressors = {
+            'gzip': lambda: zlib.decompressobj(wbits=31).decompress,
+            'br': lambda: brotli.Decompressor().process,
+            'zstd': lambda: zstandard.ZstdDecompressor().decompressobj()
+            .decompress,
+        }
+
+        for encoding, codec in CODECS.items():
+            with self.subTest(encoding=encoding):
+                decompress = decompressors[encoding]()
+                stream = codec(LEVELS[encoding]).stream(iter(chunks))
+
+                # Each chunk decodes in full as soon as it is yielded.
+                output = decompress(next(stream))
+                self.assertEqual(output, BODY[:500])
+                output = b''.join(
+                    decompress(chunk) for chunk in stream
+                )
+                self.assertEqual(output, BODY[500:])
+
+    def test_stream_output_is_valid_body(self):
+        for codec, decompress in ((GzipCodec, gzip.decompress),
+                                  (BrotliCodec, brotli.decompress),
+                                  (ZstdCodec, DECOMPRESS['zstd'])):
+            with self.subTest(encoding=codec.encoding):
+                stream = codec(1).stream([b'a' * 10, b'b' * 10])
+
+                self.assertEqual(
+                    decompress(b''.join(stream)),
+                    b'a' * 10 + b'b' * 10
+                )
+
+
+@override_settings(COMPRESSION_MIN_SIZE=1024, COMPRESSION_LEVELS=LEVELS)
+class CompressionMiddlewareTests(SimpleTestCase):
+
+    def setUp(self):
+        self.factory = RequestFactory()
+
+    def process(self, response, accept_encoding='gzip, br, zstd'):
+        request = self.factory.get(
+            '/', HTTP_ACCEPT_ENCODING=accept_encoding
+        )
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_compresses_negotiated_encoding(self):
+        response = HttpResponse(BODY)
+        response['ETag'] = '"abc"'
+
+        response = self.process(response, 'gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response['ETag'], 'W/"abc"')
+        self.assertEqual(
+            response['Content-Length'],
+            str(len(response.content))
+        )
+        self.assertEqual(gzip.decompress(response.content), BODY)
+
+    def test_server_preference(self):
+        response = self.process(HttpResponse(BODY))
+
+        self.assertEqual(response['Content-Encoding'], 'zstd')
+        self.assertEqual(DECOMPRESS['zstd'](response.content), BODY)
+
+    def test_small_body_not_compressed(self):
+        response = self.process(HttpResponse(b'{"id":1}'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertFalse(response.has_header('Vary'))
+        self.assertEqual(response.content, b'{"id":1}')
+
+    @override_settings(COMPRESSION_MIN_SIZE=0)
+    def test_body_that_grows_not_compressed(self):
+        response = self.process(HttpResponse(b'x'))
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, b'x')
+
+    def test_not_acceptable(self):
+        response = self.process(HttpResponse(BODY), 'identity')
+
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, BODY)
+
+    def test_already_encoded(self):
+        response = HttpResponse(BODY)
+        response['Content-Encoding'] = 'identity'
+
+        response = self.process(response)
+
+        self.assertEqual(response['Content-Encoding'], 'identity')
+        self.assertEqual(response.content, BODY)
+
+    @override_settings(COMPRESSION_LEVELS={'gzip': 1})
+    def test_configured_encodings_only(self):
+        response = self.process(HttpResponse(BODY), 'br, zstd, gzip;q=0.1')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_streaming(self):
+        response = StreamingHttpResponse(iter([b'a' * 10, b'b' * 10]))
+        response['Content-Length'] = '20'
+
+        response = self.process(response, 'br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertEqual(
+            brotli.decompress(b''.join(response.streaming_content)),
+            b'a' * 10 + b'b' * 10
+        )
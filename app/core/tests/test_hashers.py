@@ -0,0 +1,95 @@
+"""
+Tests for password hashing
+"""
+import threading
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import (
+    check_password,
+    identify_hasher,
+    make_password
+)
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.hashers import offload
+
+
+class HasherChoicesTests(SimpleTestCase):
+
+    def test_every_choice_hashes(self):
+        """Test each PASSWORD_HASHER choice has its library installed"""
+        for name, hasher in settings.PASSWORD_HASHER_CHOICES.items():
+            with self.subTest(hasher=name), \
+                    override_settings(PASSWORD_HASHERS=[hasher],
+                                      PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10):
+                encoded = make_password('test1234')
+
+                self.assertTrue(check_password('test1234', encoded))
+
+
+class ScryptPasswordHasherTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+
+    def test_new_passwords_use_scrypt(self):
+        """Test passwords are hashed with the configured scrypt cost"""
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10):
+            self.user.set_password('test1234')
+
+        algorithm, work_factor, *_ = self.user.password.split('$')
+        self.assertEqual(algorithm, 'scrypt')
+        self.assertEqual(work_factor, str(2 ** 10))
+
+    def test_old_hasher_upgraded_on_login(self):
+        """Test a PBKDF2 hash is replaced by scrypt on a good password"""
+        self.user.password = make_password('test1234', hasher='pbkdf2_sha256')
+        self.user.save()
+
+        self.assertTrue(self.user.check_password('test1234'))
+
+        self.user.refresh_from_db()
+        self.assertEqual(identify_hasher(self.user.password).algorithm,
+                         'scrypt')
+
+    def test_old_hash_kept_on_bad_password(self):
+        """Test a failed login leaves the stored hash alone"""
+        encoded = make_password('test1234', hasher='pbkdf2_sha256')
+        self.user.password = encoded
+        self.user.save()
+
+        self.assertFalse(self.user.check_password('wrong'))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password, encoded)
+
+    def test_changed_cost_upgraded_on_login(self):
+        """Test hashes made with other scrypt parameters are redone"""
+        with override_settings(PASSWORD_SCRYPT_WORK_FACTOR=2 ** 10):
+            self.user.set_password('test1234')
+            self.user.save()
+
+        self.assertTrue(self.user.check_password('test1234'))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.password.split('$')[1], str(2 ** 14))
+
+
+class OffloadTests(SimpleTestCase):
+
+    async def test_runs_in_hashing_pool(self):
+        """Test offloaded calls run in the hashing threads"""
+        name = await offload(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith('password-hashing'))
+
+    async def test_exceptions_propagate(self):
+        def fail():
+            raise ValueError('bad')
+
+        with self.assertRaises(ValueError):
+            await offload(fail)
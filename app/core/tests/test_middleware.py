@@ -0,0 +1,112 @@
+"""
+Tests for request instrumentation
+"""
+import gzip
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.metrics import registry
+from core.testing import QueryBudgetMixin
+
+
+ME_URL = reverse('user:me')
+METRICS_URL = reverse('api-metrics')
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234',
+            name='Test'
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_server_timing_header(self):
+        res = self.client.get(ME_URL)
+
+        timing = res['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serializer;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_recorded_per_view(self):
+        self.client.get(ME_URL)
+        self.client.get(ME_URL)
+
+        metrics = registry.snapshot()['user:me']
+
+        self.assertEqual(metrics['status'], {'200': 2})
+        self.assertEqual(metrics['latency_ms']['count'], 2)
+        self.assertEqual(metrics['queries']['count'], 2)
+        self.assertIn('serializer_ms', metrics)
+
+    def test_metrics_endpoint_admin_only(self):
+        self.client.get(ME_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('user:me', res.data)
+
+
+@override_settings(COMPRESSION_MIN_SIZE=0)
+class CompressionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234',
+            name='Test' * 20
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_api_response_compressed(self):
+        res = self.client.get(ME_URL, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertTrue(res['ETag'].startswith('W/"'))
+        self.assertEqual(
+            gzip.decompress(res.content).decode(),
+            '{"email":"test@example.com","name":"%s"}' % ('Test' * 20)
+        )
+
+    def test_weak_etag_revalidates(self):
+        etag = self.client.get(ME_URL, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+
+        res = self.client.get(
+            ME_URL,
+            HTTP_ACCEPT_ENCODING='gzip',
+            HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.has_header('Content-Encoding'))
+
+
+class QueryBudgetMixinTests(QueryBudgetMixin, TestCase):
+    query_budgets = {'PATCH user:me': 0}
+
+    def test_over_budget_fails(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+
+        with self.assertRaises(self.failureException):
+            client.patch(ME_URL, {'name': 'Over budget'})
@@ -1,9 +1,12 @@
 """
 Tests for models
 """
+import unittest
 from datetime import date
 from decimal import Decimal
+from unittest import mock
 
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
@@ -60,8 +63,283 @@ class ModelTests(TestCase):
             user=user,
             expense_name='Expense',
             price=Decimal('10.00'),
-            # category='Bills',
             date_created=date.today()
         )
 
         self.assertEqual(str(expense), expense.expense_name)
+
+    def test_create_category_success(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        category = models.Category.objects.create(user=user, name='Bills')
+
+        self.assertEqual(str(category), category.name)
+        self.assertEqual(category.total, 0)
+        self.assertEqual(category.count, 0)
+
+    def test_record_expense_rollups(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        january = models.Expense(
+            user=user,
+            price=Decimal('10.00'),
+            date_created=date(2023, 1, 15)
+        )
+        february = models.Expense(
+            user=user,
+            price=Decimal('2.50'),
+            date_created=date(2023, 2, 1)
+        )
+
+        models.ExpenseRollup.objects.record(added=[january, january])
+        models.ExpenseRollup.objects.record(
+            added=[february],
+            removed=[january]
+        )
+
+        rollups = models.ExpenseRollup.objects.order_by('month')
+        self.assertEqual(
+            [(r.month, r.total, r.count) for r in rollups],
+            [
+                (date(2023, 1, 1), Decimal('10.00'), 1),
+                (date(2023, 2, 1), Decimal('2.50'), 1),
+            ]
+        )
+
+    def test_record_bulk_onto_rollup_created_concurrently(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        expense = models.Expense(
+            user=user,
+            price=Decimal('10.00'),
+            date_created=date(2023, 1, 15)
+        )
+        manager = models.ExpenseRollup.objects
+        bulk_create = manager.bulk_create
+
+        def create_first(*args, **kwargs):
+            # Another request records the same new month first.
+            manager.record(added=[expense])
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(manager, 'bulk_create',
+                               side_effect=create_first):
+            manager.record_bulk(added=[expense, expense])
+
+        rollup = manager.get(user=user)
+        self.assertEqual((rollup.total, rollup.count),
+                         (Decimal('30.00'), 3))
+
+    def test_rebuild_expense_rollups(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        models.Expense.objects.create(
+            user=user,
+            expense_name='Expense',
+            price=Decimal('10.00'),
+            date_created=date(2023, 1, 15)
+        )
+
+        self.assertEqual(len(models.ExpenseRollup.objects.drift()), 1)
+
+        models.ExpenseRollup.objects.rebuild()
+
+        self.assertEqual(models.ExpenseRollup.objects.drift(), [])
+        rollup = models.ExpenseRollup.objects.get(user=user)
+        self.assertEqual(rollup.month, date(2023, 1, 1))
+        self.assertEqual(rollup.total, Decimal('10.00'))
+        self.assertEqual(rollup.count, 1)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'Table locks are taken on PostgreSQL only')
+    def test_rebuild_locks_out_writers(self):
+        locked = []
+
+        def expected(manager):
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT relation::regclass::text FROM pg_locks "
+                    "WHERE pid = pg_backend_pid() "
+                    "AND mode = 'ShareRowExclusiveLock'"
+                )
+                locked.append({table for table, in cursor.fetchall()})
+            return {}
+
+        for manager in (models.ExpenseRollup.objects,
+                        models.Category.objects):
+            with mock.patch.object(type(manager), 'expected', expected):
+                manager.rebuild()
+
+        self.assertEqual(locked, [
+            {'core_expenserollup', 'core_archivedexpense'},
+            {'core_category', 'core_archivedexpense'},
+        ])
+
+    def test_record_and_rebuild_category_totals(self):
+        user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        bills = models.Category.objects.create(user=user, name='Bills')
+        food = models.Category.objects.create(user=user, name='Food')
+        expense = models.Expense.objects.create(
+            user=user,
+            expense_name='Expense',
+            price=Decimal('10.00'),
+            category=bills,
+            date_created=date(2023, 1, 15)
+        )
+
+        self.assertEqual(
+            models.Category.objects.drift(),
+            [(bills.id, (Decimal('0.00'), 0), (Decimal('10.00'), 1))]
+        )
+
+        models.Category.objects.record(added=[expense])
+        moved = models.Expense(
+            user=user,
+            price=Decimal('10.00'),
+            category=food,
+            date_created=date(2023, 1, 15)
+        )
+        models.Category.objects.record(added=[moved], removed=[expense])
+
+        bills.refresh_from_db()
+        food.refresh_from_db()
+        self.assertEqual((bills.total, bills.count), (Decimal('0.00'), 0))
+        self.assertEqual((food.total, food.count), (Decimal('10.00'), 1))
+
+        models.Category.objects.rebuild()
+
+        self.assertEqual(models.Category.objects.drift(), [])
+        bills.refresh_from_db()
+        self.assertEqual((bills.total, bills.count), (Decimal('10.00'), 1))
+
+
+class RecurringExpenseTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+
+    def create_recurring(self, **params):
+        defaults = {
+            'user': self.user,
+            'expense_name': 'Rent',
+            'price': Decimal('100.00'),
+            'frequency': models.RecurringExpense.MONTHLY,
+            'start_date': date(2023, 1, 31),
+        }
+        defaults.update(params)
+        defaults.setdefault('next_date', defaults['start_date'])
+        return models.RecurringExpense.objects.create(**defaults)
+
+    def test_monthly_occurrences_keep_day_of_month(self):
+        recurring = self.create_recurring()
+
+        expenses = recurring.occurrences(date(2023, 4, 30))
+
+        self.assertEqual(
+            [expense.date_created for expense in expenses],
+            [date(2023, 1, 31), date(2023, 2, 28), date(2023, 3, 31),
+             date(2023, 4, 30)]
+        )
+        self.assertEqual(recurring.next_date, date(2023, 5, 31))
+
+    def test_weekly_occurrences_with_interval_and_end(self):
+        recurring = self.create_recurring(
+            frequency=models.RecurringExpense.WEEKLY,
+            interval=2,
+            start_date=date(2023, 1, 2),
+            end_date=date(2023, 1, 31)
+        )
+
+        expenses = recurring.occurrences(date(2023, 12, 31))
+
+        self.assertEqual(
+            [expense.date_created for expense in expenses],
+            [date(2023, 1, 2), date(2023, 1, 16), date(2023, 1, 30)]
+        )
+        self.assertIsNone(recurring.next_date)
+
+    def test_extending_end_date_resumes(self):
+        recurring = self.create_recurring(
+            frequency=models.RecurringExpense.DAILY,
+            start_date=date(2023, 1, 1),
+            end_date=date(2023, 1, 3)
+        )
+        recurring.occurrences(date(2023, 1, 10))
+
+        recurring.set_end_date(None)
+
+        self.assertEqual(recurring.next_date, date(2023, 1, 4))
+
+    def test_materialize_updates_totals_once(self):
+        category = models.Category.objects.create(user=self.user, name='Home')
+        self.create_recurring(category=category)
+        self.create_recurring(
+            frequency=models.RecurringExpense.DAILY,
+            price=Decimal('1.50'),
+            start_date=date(2023, 2, 27)
+        )
+
+        batches = list(models.RecurringExpense.objects.materialize(
+            date(2023, 3, 1),
+            batch_size=2
+        ))
+
+        self.assertEqual(sum(len(expenses) for _, expenses in batches), 5)
+        self.assertGreater(len(batches), 1)
+        self.assertEqual(models.ExpenseRollup.objects.drift(), [])
+        self.assertEqual(models.Category.objects.drift(), [])
+        category.refresh_from_db()
+        self.assertEqual(category.count, 2)
+
+        again = list(models.RecurringExpense.objects.materialize(
+            date(2023, 3, 1)
+        ))
+
+        self.assertEqual(again, [])
+        self.assertEqual(models.Expense.objects.count(), 5)
+
+    def test_materialize_skips_existing_occurrences(self):
+        recurring = self.create_recurring()
+        list(models.RecurringExpense.objects.materialize(date(2023, 2, 28)))
+        recurring.next_date = recurring.start_date
+        recurring.save()
+
+        batches = list(models.RecurringExpense.objects.materialize(
+            date(2023, 3, 31)
+        ))
+
+        self.assertEqual([len(expenses) for _, expenses in batches], [1])
+        self.assertEqual(models.Expense.objects.count(), 3)
+        self.assertEqual(models.ExpenseRollup.objects.drift(), [])
+
+    def test_materialize_user_range(self):
+        other = get_user_model().objects.create_user(
+            'other@example.com',
+            'root1234'
+        )
+        self.create_recurring()
+        self.create_recurring(user=other)
+
+        list(models.RecurringExpense.objects.materialize(
+            date(2023, 1, 31),
+            user_ids=(other.id, other.id)
+        ))
+
+        self.assertEqual(
+            list(models.Expense.objects.values_list('user_id', flat=True)),
+            [other.id]
+        )
@@ -0,0 +1,222 @@
+"""
+Tests for partitioning the Expense table
+"""
+import unittest
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+
+from core import partitioning
+from core.models import (
+    ArchivedExpense,
+    Category,
+    DeletedExpense,
+    Expense,
+    ExpenseRollup
+)
+
+
+# Reaches back to the 2023 Expenses of PartitioningTests.
+BEHIND = 12 * 100
+
+
+class PeriodTests(TestCase):
+
+    def test_periods_cover_first_to_last(self):
+        bounds = partitioning.periods(date(2023, 11, 20), date(2024, 1, 1),
+                                      'month')
+
+        self.assertEqual(bounds, [
+            (date(2023, 11, 1), date(2023, 12, 1)),
+            (date(2023, 12, 1), date(2024, 1, 1)),
+            (date(2024, 1, 1), date(2024, 2, 1)),
+        ])
+
+    def test_yearly_periods(self):
+        bounds = partitioning.periods(date(2022, 6, 1), date(2023, 2, 1),
+                                      'year')
+
+        self.assertEqual(bounds, [
+            (date(2022, 1, 1), date(2023, 1, 1)),
+            (date(2023, 1, 1), date(2024, 1, 1)),
+        ])
+
+    def test_partition_name(self):
+        self.assertEqual(
+            partitioning.partition_name(date(2023, 1, 1), 'month'),
+            'core_expense_p2023_01'
+        )
+        self.assertEqual(
+            partitioning.partition_name(date(2023, 1, 1), 'year'),
+            'core_expense_p2023'
+        )
+
+    def test_horizon(self):
+        self.assertEqual(
+            partitioning.horizon('month', 3, today=date(2023, 11, 15)),
+            date(2024, 2, 1)
+        )
+
+    @unittest.skipIf(connection.vendor == 'postgresql',
+                     'Checks the error on other databases')
+    def test_command_requires_postgresql(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_expenses', stdout=StringIO())
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'Partitioning is PostgreSQL only')
+class PartitioningTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'test@example.com',
+            'root1234'
+        )
+        self.category = Category.objects.create(user=self.user, name='Food')
+        for day in (date(2023, 1, 10), date(2023, 2, 10), date(2023, 2, 20)):
+            Expense.objects.create(
+                user=self.user,
+                expense_name='Expense',
+                price=Decimal('10.00'),
+                category=self.category,
+                date_created=day
+            )
+
+    def test_convert_keeps_rows_and_ids(self):
+        ids = set(Expense.objects.values_list('id', flat=True))
+
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     stdout=StringIO())
+
+        self.assertTrue(partitioning.is_partitioned(connection))
+        self.assertEqual(set(Expense.objects.values_list('id', flat=True)),
+                         ids)
+        expense = Expense.objects.create(
+            user=self.user,
+            expense_name='New',
+            price=Decimal('1.00'),
+            date_created=date(2023, 2, 1)
+        )
+        self.assertGreater(expense.id, max(ids))
+
+    def test_outlying_dates_go_to_default_partition(self):
+        for day in (date(1900, 1, 1), date(2999, 12, 31)):
+            Expense.objects.create(
+                user=self.user,
+                expense_name='Outlier',
+                price=Decimal('1.00'),
+                date_created=day
+            )
+
+        call_command('partition_expenses', convert=True, ahead=1,
+                     stdout=StringIO())
+
+        # Only the current period and the one ahead: the 2023 Expenses
+        # are older than --behind too.
+        self.assertEqual(
+            [start for _, start, _ in partitioning.partitions(connection)],
+            [partitioning.horizon('month', 0),
+             partitioning.horizon('month', 1)]
+        )
+        self.assertEqual(Expense.objects.count(), 5)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {partitioning.DEFAULT_PARTITION}'
+            )
+            self.assertEqual(cursor.fetchone()[0], 5)
+
+    def test_date_filter_prunes_partitions(self):
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     stdout=StringIO())
+
+        plan = Expense.objects \
+            .filter(date_created__gte=date(2023, 2, 1),
+                    date_created__lt=date(2023, 3, 1)) \
+            .explain()
+
+        self.assertIn('core_expense_p2023_02', plan)
+        self.assertNotIn('core_expense_p2023_01', plan)
+
+    def test_creates_partitions_ahead(self):
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     ahead=0, stdout=StringIO())
+
+        call_command('partition_expenses', ahead=2, stdout=StringIO())
+
+        last = partitioning.partitions(connection)[-1]
+        self.assertEqual(last[1], partitioning.horizon('month', 2))
+
+    def test_detach_removes_expenses_from_totals(self):
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     stdout=StringIO())
+
+        call_command('partition_expenses', detach_before=date(2023, 2, 1),
+                     drop=True, stdout=StringIO())
+
+        self.assertEqual(Expense.objects.count(), 2)
+        self.assertFalse(
+            ExpenseRollup.objects.filter(month=date(2023, 1, 1)).exists()
+        )
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total, Decimal('20.00'))
+        self.assertEqual(self.category.count, 2)
+        self.assertEqual(DeletedExpense.objects.count(), 1)
+
+    def test_detach_returns_expenses_moved(self):
+        other_user = get_user_model().objects.create_user(
+            'other@example.com',
+            'root1234'
+        )
+        Expense.objects.create(
+            user=other_user,
+            expense_name='Expense',
+            price=Decimal('10.00'),
+            date_created=date(2023, 1, 15)
+        )
+        ExpenseRollup.objects.rebuild()
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     stdout=StringIO())
+
+        count, user_ids = partitioning.detach_partition(
+            connection,
+            'core_expense_p2023_01'
+        )
+
+        self.assertEqual(count, 2)
+        self.assertEqual(user_ids, {self.user.id, other_user.id})
+
+    def test_detach_keeps_archived_expenses_in_rollups(self):
+        ArchivedExpense.objects.create(
+            id=10 ** 6,
+            user=self.user,
+            expense_name='Archived',
+            price=Decimal('5.00'),
+            date_created=date(2023, 1, 20),
+            updated_at=timezone.now()
+        )
+        ExpenseRollup.objects.rebuild()
+        call_command('partition_expenses', convert=True, behind=BEHIND,
+                     stdout=StringIO())
+
+        call_command('partition_expenses', detach_before=date(2023, 2, 1),
+                     stdout=StringIO())
+
+        rollup = ExpenseRollup.objects.get(month=date(2023, 1, 1))
+        self.assertEqual((rollup.total, rollup.count), (Decimal('5.00'), 1))
+        self.assertEqual(
+            ExpenseRollup.objects.get(month=date(2023, 2, 1)).count,
+            2
+        )
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+
+    def test_requires_convert(self):
+        with self.assertRaises(CommandError):
+            call_command('partition_expenses', stdout=StringIO())
@@ -0,0 +1,164 @@
+"""
+Tests for the orjson and MessagePack renderers and parsers
+"""
+import io
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+
+import msgpack
+import orjson
+from django.test import SimpleTestCase
+from django.utils.translation import gettext_lazy
+
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.serializer_helpers import ReturnDict
+
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class ORJSONRendererTests(SimpleTestCase):
+
+    def test_matches_json_renderer(self):
+        data = ReturnDict({
+            'next': None,
+            'results': [
+                {'id': 1, 'expense_name': 'Café ☕', 'price': '10.50',
+                 'date_created': '2023-01-05', 'category': None},
+            ],
+            'detail': ErrorDetail('Not found.', code='not_found'),
+            'ratio': 0.1,
+        }, serializer=None)
+
+        self.assertEqual(
+            ORJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_decimal_rendered_as_exact_string(self):
+        rendered = ORJSONRenderer().render(
+            {'price': Decimal('12345678.91')}
+        )
+
+        self.assertEqual(rendered, b'{"price":"12345678.91"}')
+
+    def test_other_types(self):
+        rendered = ORJSONRenderer().render({
+            'updated_at': datetime(2023, 1, 5, 12, 30, tzinfo=timezone.utc),
+            'date': date(2023, 1, 5),
+            'message': gettext_lazy('Not found.'),
+            1: 'integer key',
+        })
+
+        self.assertEqual(
+            rendered,
+            b'{"updated_at":"2023-01-05T12:30:00Z","date":"2023-01-05",'
+            b'"message":"Not found.","1":"integer key"}'
+        )
+
+    def test_dates_and_times_match_json_renderer(self):
+        data = {
+            'updated_at': [
+                datetime(2023, 1, 5, 12, 30, 0, 123456, tzinfo=timezone.utc),
+                datetime(2023, 1, 5, 12, 30, 0, 5,
+                         tzinfo=timezone(timedelta(hours=5, minutes=30))),
+                datetime(2023, 1, 5, 12, 30,
+                         tzinfo=timezone(timedelta(seconds=-3661))),
+                datetime(2023, 1, 5, 12, 30, 0, 500),
+            ],
+            'date_created': date(2023, 1, 5),
+            'time': time(12, 30, 0, 123456),
+        }
+
+        rendered = ORJSONRenderer().render(data)
+
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        parsed = ORJSONParser().parse(io.BytesIO(rendered))
+        self.assertEqual(
+            [datetime.fromisoformat(value.replace('Z', '+00:00'))
+             for value in parsed['updated_at']],
+            data['updated_at']
+        )
+        self.assertEqual(date.fromisoformat(parsed['date_created']),
+                         data['date_created'])
+        self.assertEqual(time.fromisoformat(parsed['time']), data['time'])
+
+    def test_line_separators_escaped(self):
+        data = {'expense_name': 'a\u2028b\u2029c'}
+
+        rendered = ORJSONRenderer().render(data)
+
+        self.assertEqual(rendered, JSONRenderer().render(data))
+        self.assertEqual(ORJSONParser().parse(io.BytesIO(rendered)), data)
+
+    def test_non_finite_floats_rendered_as_null(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            data = {'results': [{'ratio': value}]}
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render(data)
+                self.assertEqual(ORJSONRenderer().render(data),
+                                 b'{"results":[{"ratio":null}]}')
+
+    def test_aware_time_rejected(self):
+        with self.assertRaises(orjson.JSONEncodeError):
+            ORJSONRenderer().render({'time': time(12, tzinfo=timezone.utc)})
+
+    def test_indent(self):
+        rendered = ORJSONRenderer().render(
+            {'id': 1},
+            'application/json; indent=4'
+        )
+
+        self.assertEqual(rendered, b'{\n  "id": 1\n}')
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+
+class MessagePackRendererTests(SimpleTestCase):
+
+    def test_round_trip(self):
+        data = {'results': [{'id': 1, 'price': Decimal('10.50'),
+                             'date_created': date(2023, 1, 5)}]}
+
+        rendered = MessagePackRenderer().render(data)
+
+        self.assertEqual(msgpack.unpackb(rendered), {'results': [
+            {'id': 1, 'price': '10.50', 'date_created': '2023-01-05'}
+        ]})
+
+
+class ParserTests(SimpleTestCase):
+
+    def test_orjson_parser(self):
+        data = ORJSONParser().parse(
+            io.BytesIO('{"expense_name": "Café", "price": 10.5}'.encode())
+        )
+
+        self.assertEqual(data, {'expense_name': 'Café', 'price': 10.5})
+
+    def test_orjson_parser_other_encoding(self):
+        data = ORJSONParser().parse(
+            io.BytesIO('{"expense_name": "Café"}'.encode('latin-1')),
+            parser_context={'encoding': 'latin-1'}
+        )
+
+        self.assertEqual(data, {'expense_name': 'Café'})
+
+    def test_orjson_parser_rejects_invalid_json(self):
+        for body in (b'{"price": ', b'{"price": NaN}'):
+            with self.assertRaises(ParseError):
+                ORJSONParser().parse(io.BytesIO(body))
+
+    def test_msgpack_parser(self):
+        body = msgpack.packb({'expense_name': 'Gas', 'price': '10.00'})
+
+        data = MessagePackParser().parse(io.BytesIO(body))
+
+        self.assertEqual(data, {'expense_name': 'Gas', 'price': '10.00'})
+
+    def test_msgpack_parser_rejects_invalid_body(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
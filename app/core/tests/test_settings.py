@@ -0,0 +1,102 @@
+"""
+Tests for the production settings profile
+"""
+import importlib
+import os
+import sys
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase
+
+
+def load_production_settings(**environ):
+    """
+    Import app.settings_production afresh with extra environment variables
+    """
+    environ.setdefault('DJANGO_SECRET_KEY', 'secret')
+    environ.setdefault(
+        'CACHE_BACKEND',
+        'django.core.cache.backends.redis.RedisCache'
+    )
+    environ.setdefault('CACHE_LOCATION', 'redis://redis:6379/0')
+    base = sys.modules.get('app.settings')
+    with mock.patch.dict(os.environ, environ):
+        # The profile reads CACHES from app.settings, which reads the
+        # environment once on import.
+        sys.modules.pop('app.settings', None)
+        sys.modules.pop('app.settings_production', None)
+        try:
+            return importlib.import_module('app.settings_production')
+        finally:
+            sys.modules.pop('app.settings_production', None)
+            if base is not None:
+                sys.modules['app.settings'] = base
+
+
+class ProductionSettingsTests(SimpleTestCase):
+
+    def test_production_defaults(self):
+        """Test DEBUG is off and database connections are reused"""
+        settings = load_production_settings(
+            DJANGO_ALLOWED_HOSTS='api.example.com, 10.0.0.1'
+        )
+
+        self.assertFalse(settings.DEBUG)
+        self.assertEqual(settings.SECRET_KEY, 'secret')
+        self.assertEqual(
+            settings.ALLOWED_HOSTS,
+            ['api.example.com', '10.0.0.1']
+        )
+        database = settings.DATABASES['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 600)
+        self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', database)
+        self.assertFalse(settings.SERVER_TIMING)
+        self.assertEqual(
+            settings.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'],
+            ['core.renderers.ORJSONRenderer',
+             'core.renderers.MessagePackRenderer']
+        )
+
+    def test_pgbouncer_disables_server_side_cursors(self):
+        """Test DB_PGBOUNCER turns off server-side cursors"""
+        settings = load_production_settings(
+            DB_PGBOUNCER='true',
+            DB_CONN_MAX_AGE='60'
+        )
+
+        database = settings.DATABASES['default']
+        self.assertEqual(database['CONN_MAX_AGE'], 60)
+        self.assertTrue(database['DISABLE_SERVER_SIDE_CURSORS'])
+
+    def test_requires_shared_cache(self):
+        """Test a per-process cache is refused"""
+        with self.assertRaises(ImproperlyConfigured):
+            load_production_settings(
+                CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache'
+            )
+
+    def test_shared_cache(self):
+        """Test the cache comes from CACHE_BACKEND and CACHE_LOCATION"""
+        settings = load_production_settings()
+
+        self.assertEqual(
+            settings.CACHES['default']['BACKEND'],
+            'django.core.cache.backends.redis.RedisCache'
+        )
+        self.assertEqual(
+            settings.CACHES['default']['LOCATION'],
+            'redis://redis:6379/0'
+        )
+
+    def test_base_settings_unchanged(self):
+        """Test loading the profile does not modify app.settings"""
+        load_production_settings(DB_PGBOUNCER='true')
+
+        # Django fills in defaults such as CONN_HEALTH_CHECKS on the base
+        # dict itself, so check values only the profile sets.
+        base = importlib.import_module('app.settings')
+        database = base.DATABASES['default']
+        self.assertNotIn('DISABLE_SERVER_SIDE_CURSORS', database)
+        self.assertNotEqual(database.get('CONN_MAX_AGE'), 600)
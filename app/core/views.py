@@ -0,0 +1,20 @@
+"""
+Views for operational endpoints
+"""
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework import permissions, views
+from rest_framework.response import Response
+
+from core.metrics import registry
+
+
+class MetricsView(views.APIView):
+    """
+    Per-view request histograms of this process
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response(registry.snapshot())
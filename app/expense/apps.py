@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ExpenseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'expense'
+
+    def ready(self):
+        from expense import signals  # noqa: F401
@@ -0,0 +1,114 @@
+"""
+Async views for Expense API
+
+The same list, retrieve and create behaviour as ExpenseViewSet, for ASGI
+deployments. Reads use the async ORM, so the server's event loop keeps
+accepting requests while others wait on the database.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404
+
+from rest_framework import status
+
+from core.async_views import AsyncAPIView
+from core.models import Expense
+from expense.filters import ExpenseFilter, ExpenseSearchFilter
+from expense.pagination import KeysetPagination
+from expense.serializers import ExpenseReadSerializer, ExpenseSerializer
+
+
+class AsyncExpenseView(AsyncAPIView):
+    """
+    Base view for the authenticated User's Expenses
+    """
+    filter_backends = [ExpenseSearchFilter, ExpenseFilter]
+
+    def get_queryset(self, request):
+        """
+        Retrieve Expenses for authenticated User
+        :param request:
+        :return:
+        """
+        queryset = Expense.objects.filter(user=request.user)
+        expense_name = request.query_params.get('expense_name')
+
+        if expense_name:
+            queryset = queryset.filter(expense_name=expense_name)
+
+        return queryset.order_by('-date_created', '-id')
+
+    def filter_queryset(self, request, queryset):
+        for backend in self.filter_backends:
+            queryset = backend().filter_queryset(request, queryset, self)
+        return queryset
+
+
+class AsyncExpenseListView(AsyncExpenseView):
+    """
+    List and create Expenses
+    """
+
+    async def get(self, request):
+        """
+        List Expenses, paginated like ExpenseViewSet.list
+        :param request:
+        :return:
+        """
+        reader = ExpenseReadSerializer()
+        queryset = self.filter_queryset(request, self.get_queryset(request))
+        queryset = queryset.values(
+            *reader.sources, *queryset.query.annotations
+        )
+
+        paginator = KeysetPagination()
+        page = await paginator.apaginate_queryset(queryset, request, self)
+        if page is None:
+            rows = [row async for row in queryset.aiterator()]
+            return self.respond(reader.to_representation(rows))
+
+        return self.respond(
+            paginator.get_paginated_data(reader.to_representation(page))
+        )
+
+    async def post(self, request):
+        """
+        Create new Expense
+        :param request:
+        :return:
+        """
+        data = await sync_to_async(self.create)(request)
+        return self.respond(data, status.HTTP_201_CREATED)
+
+    def create(self, request):
+        # Validation may look up Categories and the write also updates the
+        # rollups in one transaction, which the async ORM cannot do yet.
+        serializer = ExpenseSerializer(
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return serializer.data
+
+
+class AsyncExpenseDetailView(AsyncExpenseView):
+    """
+    Retrieve an Expense
+    """
+
+    async def get(self, request, pk):
+        """
+        Retrieve Expense
+        :param request:
+        :param pk:
+        :return:
+        """
+        reader = ExpenseReadSerializer()
+        queryset = self.get_queryset(request).values(*reader.sources)
+
+        try:
+            row = await queryset.aget(pk=pk)
+        except Expense.DoesNotExist:
+            raise Http404
+
+        return self.respond(reader.to_representation([row])[0])
@@ -0,0 +1,127 @@
+"""
+Per-user response cache for Expense API
+
+Every User has a generation number that is part of all their cache keys.
+Any write to one of their Expenses bumps it, which orphans every response
+cached for them at once; orphaned entries simply expire.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe
+
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    validator_headers
+)
+
+
+def get_response_cache():
+    return caches[settings.EXPENSE_CACHE]
+
+
+def _generation_key(user_id):
+    return f'expense:generation:{user_id}'
+
+
+def get_generation(user_id):
+    """
+    Return the current cache generation of a User
+    :param user_id:
+    :return generation:
+    """
+    cache = get_response_cache()
+    key = _generation_key(user_id)
+    generation = cache.get(key)
+
+    if generation is None:
+        # Start from the clock so an evicted counter never comes back with
+        # a value that older cached responses were stored under.
+        cache.add(key, time.time_ns(), timeout=None)
+        generation = cache.get(key)
+
+    return generation
+
+
+def bump_generation(user_id):
+    """
+    Orphan every response cached for a User
+    :param user_id:
+    :return:
+    """
+    cache = get_response_cache()
+    key = _generation_key(user_id)
+
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def invalidate_user(user_id):
+    """
+    Invalidate a User's cached responses now and again after commit
+
+    The second bump discards anything a concurrent request cached from
+    data read before the write was committed.
+    :param user_id:
+    :return:
+    """
+    bump_generation(user_id)
+    transaction.on_commit(lambda: bump_generation(user_id))
+
+
+class CachedResponseMixin:
+    """
+    Serve view actions from the per-user cache, with ETag support and
+    Last-Modified when the handler sets it
+    """
+
+    def get_cache_key(self, request):
+        generation = get_generation(request.user.id)
+        # Paginated responses embed absolute links, so key on the full URI.
+        digest = hashlib.md5(
+            f'{request.accepted_renderer.format}:'
+            f'{request.build_absolute_uri()}'.encode()
+        ).hexdigest()
+        return (f'expense:response:v2:{request.user.id}:{generation}:'
+                f'{digest}')
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        cache = get_response_cache()
+        key = self.get_cache_key(request)
+        etag = make_etag(key)
+        headers = validator_headers(etag)
+
+        if is_not_modified(request, etag):
+            return not_modified_response(headers)
+
+        cached = cache.get(key)
+        if cached is not None:
+            data, last_modified = cached
+            headers.update(validator_headers(last_modified=last_modified))
+            if is_not_modified(request, etag, last_modified):
+                return not_modified_response(headers)
+            return Response(data, headers=headers)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            # Handlers may set Last-Modified; keep it with the data.
+            last_modified = parse_http_date_safe(
+                response.get('Last-Modified', '')
+            )
+            cache.set(key, (response.data, last_modified),
+                      settings.EXPENSE_CACHE_TIMEOUT)
+        if response.status_code in (status.HTTP_200_OK,
+                                    status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+
+        return response
@@ -0,0 +1,136 @@
+"""
+Filter backends for Expense API
+"""
+from django.contrib.postgres.search import (
+    TrigramSimilarity,
+    TrigramWordSimilarity
+)
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Cast
+from django.utils.translation import gettext_lazy as _
+
+from rest_framework.filters import BaseFilterBackend
+
+from expense.serializers import ExpenseFilterQuerySerializer
+
+
+class ExpenseFilter(BaseFilterBackend):
+    """
+    Date and price ranges, category and an ordering chosen from an
+    allowlist
+
+    Filters become WHERE conditions and the ordering an ORDER BY matching
+    one of the Expense indexes, so the database only reads matching rows.
+    Without an ordering the queryset keeps its own, e.g. search relevance.
+    """
+    lookups = {
+        'date_from': 'date_created__gte',
+        'date_to': 'date_created__lte',
+        'price_min': 'price__gte',
+        'price_max': 'price__lte',
+        'category': 'category_id',
+    }
+
+    def filter_queryset(self, request, queryset, view):
+        params = ExpenseFilterQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+
+        queryset = queryset.filter(**{
+            lookup: params.validated_data[param]
+            for param, lookup in self.lookups.items()
+            if param in params.validated_data
+        })
+
+        ordering = params.validated_data.get('ordering')
+        if ordering:
+            queryset = queryset.order_by(*params.ORDERINGS[ordering])
+
+        return queryset
+
+    def get_schema_operation_parameters(self, view):
+        descriptions = {
+            'date_from': ('string', 'Only Expenses on or after this date.'),
+            'date_to': ('string', 'Only Expenses on or before this date.'),
+            'price_min': ('string', 'Only Expenses costing at least this.'),
+            'price_max': ('string', 'Only Expenses costing at most this.'),
+            'category': ('integer', 'Only Expenses in this Category.'),
+        }
+        parameters = [
+            {
+                'name': name,
+                'required': False,
+                'in': 'query',
+                'description': description,
+                'schema': {'type': type_},
+            }
+            for name, (type_, description) in descriptions.items()
+        ]
+        parameters.append({
+            'name': 'ordering',
+            'required': False,
+            'in': 'query',
+            'description': 'Sort order, defaults to -date_created.',
+            'schema': {
+                'type': 'string',
+                'enum': list(ExpenseFilterQuerySerializer.ORDERINGS),
+            },
+        })
+        return parameters
+
+
+class ExpenseSearchFilter(BaseFilterBackend):
+    """
+    Fuzzy search over expense names, ordered by relevance
+
+    On PostgreSQL names are matched by trigram word similarity, which
+    tolerates misspellings and matches prefixes, through the trigram GIN
+    index on (user, expense_name). Other databases fall back to a case
+    insensitive substring match.
+
+    Whole-name similarity breaks ties between names that contain the term
+    equally well. Matches are annotated with an integer `rank` (1000 for
+    an exact match) and ordered by ('-rank', '-date_created', '-id'),
+    which KeysetPagination seeks on.
+    """
+    search_param = 'search'
+    search_description = _(
+        'Fuzzy match on expense name, most relevant first.'
+    )
+
+    def get_search_term(self, request):
+        return request.query_params.get(self.search_param, '').strip()
+
+    def filter_queryset(self, request, queryset, view):
+        term = self.get_search_term(request)
+        if not term:
+            return queryset
+
+        if connection.vendor == 'postgresql':
+            queryset = queryset \
+                .filter(expense_name__trigram_word_similar=term) \
+                .annotate(rank=Cast(
+                    (TrigramWordSimilarity(term, 'expense_name')
+                     + TrigramSimilarity('expense_name', term)) * 500,
+                    output_field=IntegerField()
+                ))
+        else:
+            queryset = queryset \
+                .filter(expense_name__icontains=term) \
+                .annotate(rank=Case(
+                    When(expense_name__iexact=term, then=Value(1000)),
+                    When(expense_name__istartswith=term, then=Value(500)),
+                    default=Value(0),
+                    output_field=IntegerField()
+                ))
+
+        return queryset.order_by('-rank', '-date_created', '-id')
+
+    def get_schema_operation_parameters(self, view):
+        return [{
+            'name': self.search_param,
+            'required': False,
+            'in': 'query',
+            'description': str(self.search_description),
+            'schema': {'type': 'string'},
+        }]
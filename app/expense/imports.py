@@ -0,0 +1,282 @@
+"""
+CSV import of Expenses
+
+ExpenseImporter reads an upload one row at a time, validates each row with
+ExpenseSerializer's fields and writes valid rows in chunks, so memory use
+depends on the chunk size rather than the file size. Rows that fail
+validation are skipped and reported by line number. A line that cannot be
+read at all, such as bytes that are not UTF-8, ends the import: the rows
+before it are kept, as earlier chunks are already committed, and the line
+is reported under `file`.
+"""
+import csv
+import io
+from datetime import date
+
+from django.db import connection, transaction
+from django.utils.translation import gettext as _
+
+from rest_framework import serializers
+
+from core.models import Category, Expense, ExpenseRollup
+from expense.cache import invalidate_user
+from expense.serializers import ExpenseSerializer
+
+
+def _messages(detail):
+    """
+    Flatten ValidationError details to a list of strings
+    """
+    if isinstance(detail, dict):
+        return [str(message) for messages in detail.values()
+                for message in _messages(messages)]
+    if isinstance(detail, list):
+        return [str(message) for message in detail]
+    return [str(detail)]
+
+
+class ExpenseImporter:
+    """
+    Import a User's Expenses from CSV
+
+    Columns are matched by header name: expense_name and price are
+    required, date_created (YYYY-MM-DD, defaults to today) and category
+    (an id) or category_name are optional, and other columns such as the
+    id of an export are ignored. Empty cells count as missing.
+    """
+    required_columns = ['expense_name', 'price']
+    fields = ['expense_name', 'price', 'date_created', 'category']
+
+    def __init__(self, user, chunk_size=5000, max_errors=1000):
+        self.user = user
+        self.chunk_size = chunk_size
+        self.max_errors = max_errors
+
+        serializer = ExpenseSerializer()
+        self.serializer_fields = {
+            name: serializer.fields[name] for name in self.fields
+        }
+        self.serializer_fields['category'].queryset = \
+            Category.objects.filter(user=user)
+        self.category_names = None
+
+        self.imported = 0
+        self.error_count = 0
+        self.errors = []
+
+    def import_file(self, file, encoding='utf-8-sig'):
+        """
+        Import Expenses from a binary file object
+        :param file:
+        :param encoding: utf-8-sig also accepts UTF-8 with a BOM, as saved
+            by spreadsheets
+        :return report:
+        """
+        text = io.TextIOWrapper(file, encoding=encoding, newline='')
+        reader = csv.DictReader(text)
+        try:
+            return self.import_rows(reader)
+        except UnicodeDecodeError:
+            # Only the header gets here; import_rows reports later lines.
+            raise serializers.ValidationError(
+                {'file': [_('The file is not valid UTF-8.')]}
+            )
+        except csv.Error as exc:
+            raise serializers.ValidationError({'file': [
+                _('Line 1: {error}.').format(error=exc)
+            ]})
+        finally:
+            # Leave the underlying file open for its owner.
+            text.detach()
+
+    def import_rows(self, reader):
+        """
+        Import Expenses from a csv.DictReader
+        :param reader:
+        :return report:
+        """
+        missing = [
+            column for column in self.required_columns
+            if column not in (reader.fieldnames or [])
+        ]
+        if missing:
+            raise serializers.ValidationError({'file': [
+                _('Missing columns: {columns}.').format(
+                    columns=', '.join(missing)
+                )
+            ]})
+
+        self.today = date.today()
+        chunk = []
+        try:
+            try:
+                for row in reader:
+                    expense = self.validate(reader.line_num, row)
+                    if expense is None:
+                        continue
+
+                    chunk.append(expense)
+                    if len(chunk) >= self.chunk_size:
+                        self.write(chunk)
+                        chunk = []
+            except (UnicodeDecodeError, csv.Error) as exc:
+                # The reader cannot go past a broken line, so stop there
+                # and keep the rows before it.
+                self.add_error(reader.line_num + 1, {
+                    'file': [self.file_error(reader, exc)]
+                })
+
+            self.write(chunk)
+        finally:
+            # Chunks commit on their own, so invalidate even when a later
+            # one fails.
+            if self.imported:
+                invalidate_user(self.user.id)
+
+        return self.report()
+
+    def file_error(self, reader, exc):
+        """
+        Describe why the reader stopped
+        :param reader:
+        :param exc: UnicodeDecodeError or csv.Error
+        :return message:
+        """
+        if isinstance(exc, UnicodeDecodeError):
+            # Text is decoded in blocks, so the bad bytes may be a few lines
+            # further on.
+            return _('The file is not valid UTF-8 after line {line}; '
+                     'the rest was not read.').format(line=reader.line_num)
+
+        # Malformed CSV, e.g. a cell over the field size limit. line_num
+        # counts the lines read before the one that failed.
+        return _('Line {line}: {error}; the rest was not read.').format(
+            line=reader.line_num + 1,
+            error=exc
+        )
+
+    def validate(self, line, row):
+        """
+        Build an unsaved Expense from a row, or record its errors
+        :param line: line number of the row, for the report
+        :param row:
+        :return expense:
+        """
+        if None in row:
+            self.add_error(line, {'non_field_errors': [
+                _('Row has more cells than the header.')
+            ]})
+            return None
+
+        values = {
+            name: row[name] for name in self.fields if row.get(name)
+        }
+        if 'category' not in values and row.get('category_name'):
+            category = self.get_category_names().get(row['category_name'])
+            if category is None:
+                self.add_error(line, {'category_name': [
+                    _('No category named "{name}".').format(
+                        name=row['category_name']
+                    )
+                ]})
+                return None
+            values['category'] = category
+
+        attrs = {}
+        errors = {}
+        for name, field in self.serializer_fields.items():
+            if name not in values:
+                if field.required:
+                    errors[name] = [str(field.error_messages['required'])]
+                continue
+            try:
+                attrs[field.source] = field.run_validation(values[name])
+            except serializers.ValidationError as exc:
+                errors[name] = _messages(exc.detail)
+
+        if errors:
+            self.add_error(line, errors)
+            return None
+
+        attrs.setdefault('date_created', self.today)
+        return Expense(user=self.user, **attrs)
+
+    def get_category_names(self):
+        if self.category_names is None:
+            # Shares the Categories CategoryField reads for id lookups.
+            field = self.serializer_fields['category']
+            if 'categories' not in field.context:
+                field.context['categories'] = field.get_queryset().in_bulk()
+            self.category_names = {
+                category.name: category.pk
+                for category in field.context['categories'].values()
+            }
+        return self.category_names
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def write(self, expenses):
+        """
+        Insert a chunk of Expenses and add them to the totals, in one
+        transaction
+        :param expenses:
+        :return:
+        """
+        if not expenses:
+            return
+
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                self.copy(expenses)
+            else:
+                Expense.objects.bulk_create(expenses, batch_size=1000)
+            ExpenseRollup.objects.record_bulk(expenses)
+            Category.objects.record_bulk(expenses)
+
+        self.imported += len(expenses)
+
+    def copy(self, expenses):
+        """
+        Insert Expenses with PostgreSQL's COPY, which skips parsing and
+        planning an INSERT per batch
+        :param expenses:
+        :return:
+        """
+        columns = ['user', 'expense_name', 'price', 'category',
+                   'date_created', 'updated_at']
+        fields = [Expense._meta.get_field(name) for name in columns]
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for expense in expenses:
+            # COPY's CSV format reads an unquoted empty cell as NULL.
+            # pre_save() fills in auto_now values as an INSERT would.
+            writer.writerow([
+                '' if value is None else value
+                for value in (field.pre_save(expense, True)
+                              for field in fields)
+            ])
+        buffer.seek(0)
+
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(Expense._meta.db_table)} '
+                f'({", ".join(quote(field.column) for field in fields)}) '
+                f'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+
+    def report(self):
+        """
+        Summarize the import
+        :return report:
+        """
+        return {
+            'imported': self.imported,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
@@ -0,0 +1,61 @@
+"""
+Django command to move old Expenses to the archive
+"""
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import ArchivedExpense
+from expense.cache import bump_generation
+
+
+class Command(BaseCommand):
+    """
+    Move Expenses dated before --before, by default older than
+    EXPENSE_ARCHIVE_AFTER_DAYS, to the ArchivedExpense table in batched
+    transactions. Interrupted runs can simply be run again.
+    """
+    help = 'Move old expenses to the archive.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before',
+            type=date.fromisoformat,
+            help='Archive Expenses dated before this date (YYYY-MM-DD), '
+                 'defaults to EXPENSE_ARCHIVE_AFTER_DAYS days ago.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Expenses moved per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        before = options['before'] or date.today() - timedelta(
+            days=settings.EXPENSE_ARCHIVE_AFTER_DAYS
+        )
+
+        count = 0
+        start = time.perf_counter()
+        batches = ArchivedExpense.objects.archive(
+            before,
+            batch_size=options['batch_size']
+        )
+        for archived in batches:
+            count += len(archived)
+            # The raw delete sends no signals, so invalidate after each
+            # commit.
+            for user_id in {expense.user_id for expense in archived}:
+                bump_generation(user_id)
+        elapsed = time.perf_counter() - start
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {count} expenses dated before {before} in '
+            f'{elapsed:.1f}s ({count / max(elapsed, 1e-9):.0f} expenses/s).'
+        ))
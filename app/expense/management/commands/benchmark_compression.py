@@ -0,0 +1,102 @@
+"""
+Django command to benchmark response compression on Expense lists
+"""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.compression import CODECS
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from expense.management.commands.benchmark_renderers import build_page
+from expense.management.commands.benchmark_serializers import _best_of
+
+
+RENDERERS = [
+    ('json', ORJSONRenderer()),
+    ('msgpack', MessagePackRenderer()),
+]
+
+
+class Command(BaseCommand):
+    """
+    Compress rendered pages of Expenses with every codec at a range of
+    levels and report the CPU time spent against the bytes saved. The
+    configured level of each codec is marked with an asterisk. Rows are
+    built in memory, so no database is needed.
+    """
+    help = 'Benchmark gzip, brotli and zstd on Expense list payloads.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[50, 500],
+            help='Row counts to benchmark.'
+        )
+        parser.add_argument(
+            '--levels',
+            nargs='+',
+            default=['zstd:1,3,9', 'br:1,4,11', 'gzip:1,6,9'],
+            help='Levels per codec, as codec:level,level.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement, the fastest is kept.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results as JSON to this file.'
+        )
+
+    def handle(self, *args, **options):
+        levels = {}
+        for item in options['levels']:
+            encoding, _, values = item.partition(':')
+            levels[encoding] = [int(value) for value in values.split(',')]
+
+        results = []
+        for count in options['rows']:
+            data = build_page(count)
+
+            for name, renderer in RENDERERS:
+                payload = renderer.render(data)
+                self.stdout.write(
+                    f'{count:>6} rows {name:>8}: {len(payload)} bytes'
+                )
+
+                for encoding, encoding_levels in levels.items():
+                    for level in encoding_levels:
+                        codec = CODECS[encoding](level)
+                        elapsed, compressed = _best_of(
+                            options['repeat'],
+                            lambda: codec.compress(payload)
+                        )
+
+                        result = {
+                            'rows': count,
+                            'renderer': name,
+                            'encoding': encoding,
+                            'level': level,
+                            'compress_ms': round(elapsed * 1000, 3),
+                            'bytes': len(compressed),
+                            'saved': len(payload) - len(compressed),
+                        }
+                        results.append(result)
+                        configured = settings.COMPRESSION_LEVELS.get(encoding)
+                        self.stdout.write(
+                            f"{encoding:>20} {level:>2}"
+                            f"{'*' if level == configured else ' '}: "
+                            f"{result['compress_ms']:>7.3f} ms, "
+                            f"{result['bytes']:>7} bytes "
+                            f"({result['bytes'] / len(payload):.0%}), "
+                            f"{result['saved'] / elapsed / 1e6:>7.1f} MB "
+                            f"saved per CPU second"
+                        )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
@@ -0,0 +1,119 @@
+"""
+Django command to benchmark response renderers on Expense lists
+"""
+import io
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from core.parsers import MessagePackParser, ORJSONParser
+from core.renderers import MessagePackRenderer, ORJSONRenderer
+from expense.management.commands.benchmark_serializers import _best_of
+from expense.serializers import ExpenseReadSerializer
+
+
+RENDERERS = [
+    ('json', JSONRenderer(), JSONParser()),
+    ('orjson', ORJSONRenderer(), ORJSONParser()),
+    ('msgpack', MessagePackRenderer(), MessagePackParser()),
+]
+
+
+def build_page(count):
+    """
+    A page of Expense list results as ExpenseViewSet renders it
+    :param count: rows on the page
+    :return data:
+    """
+    start_date = date(2020, 1, 1)
+    rows = [
+        {
+            'id': index,
+            'expense_name': f'Expense {index}',
+            'price': Decimal(index % 100000) / 100,
+            'date_created': start_date + timedelta(days=index % 1500),
+            'category': index % 7 or None,
+            'category__name': f'Category {index % 7}' if index % 7 else None,
+        }
+        for index in range(1, count + 1)
+    ]
+    return {
+        'next': 'http://testserver/api/expense/?cursor=abc',
+        'previous': None,
+        'results': ExpenseReadSerializer().to_representation(rows),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Render the same page of Expenses with DRF's JSONRenderer, orjson and
+    MessagePack, check each parses back to the same data and report
+    encode and decode time and payload size. Rows are built in memory, so
+    no database is needed.
+    """
+    help = 'Benchmark the JSON, orjson and MessagePack renderers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[50, 500, 10000],
+            help='Row counts to benchmark.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Runs per measurement, the fastest is kept.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results as JSON to this file.'
+        )
+
+    def handle(self, *args, **options):
+        results = []
+
+        for count in options['rows']:
+            data = build_page(count)
+
+            baseline = None
+            for name, renderer, parser in RENDERERS:
+                encode, payload = _best_of(
+                    options['repeat'],
+                    lambda: renderer.render(data)
+                )
+                decode, parsed = _best_of(
+                    options['repeat'],
+                    lambda: parser.parse(io.BytesIO(payload))
+                )
+                if parsed != data:
+                    raise CommandError(f'{name} does not round-trip.')
+
+                result = {
+                    'rows': count,
+                    'renderer': name,
+                    'encode_ms': round(encode * 1000, 3),
+                    'decode_ms': round(decode * 1000, 3),
+                    'bytes': len(payload),
+                }
+                baseline = baseline or result
+                results.append(result)
+                self.stdout.write(
+                    f"{count:>6} rows {name:>8}: "
+                    f"encode {result['encode_ms']:>8.3f} ms "
+                    f"({baseline['encode_ms'] / result['encode_ms']:.1f}x), "
+                    f"decode {result['decode_ms']:>8.3f} ms, "
+                    f"{result['bytes']:>9} bytes "
+                    f"({result['bytes'] / baseline['bytes']:.0%})"
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
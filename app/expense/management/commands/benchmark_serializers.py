@@ -0,0 +1,120 @@
+"""
+Django command to benchmark Expense list serialization
+"""
+import json
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models import Expense
+from expense.serializers import ExpenseReadSerializer, ExpenseSerializer
+
+
+def _best_of(repeat, func):
+    """
+    Return the fastest of repeat runs of func and its last result
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _lookup(instance, source):
+    """
+    Follow a values() lookup such as 'category__name' on an instance
+    """
+    for name in source.split('__'):
+        if instance is None:
+            return None
+        instance = getattr(instance, name)
+    return instance
+
+
+class Command(BaseCommand):
+    """
+    Serialize and render the same rows through ExpenseSerializer (before)
+    and ExpenseReadSerializer (after), check the bytes match and report
+    rows per second. Rows are built in memory, so no database is needed.
+    """
+    help = 'Benchmark ExpenseSerializer against ExpenseReadSerializer.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[1000, 10000, 100000],
+            help='Row counts to benchmark.'
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=3,
+            help='Runs per measurement, the fastest is kept.'
+        )
+        parser.add_argument(
+            '--output',
+            help='Also write the results as JSON to this file.'
+        )
+
+    def handle(self, *args, **options):
+        renderer = JSONRenderer()
+        reader = ExpenseReadSerializer()
+        results = []
+
+        start_date = date(2020, 1, 1)
+
+        for count in options['rows']:
+            expenses = [
+                Expense(
+                    id=index,
+                    user_id=1,
+                    expense_name=f'Expense {index}',
+                    price=Decimal(index % 100000) / 100,
+                    date_created=start_date + timedelta(days=index % 1500)
+                )
+                for index in range(1, count + 1)
+            ]
+            rows = [
+                {source: _lookup(expense, source) for source in reader.sources}
+                for expense in expenses
+            ]
+
+            before, expected = _best_of(
+                options['repeat'],
+                lambda: renderer.render(
+                    ExpenseSerializer(expenses, many=True).data
+                )
+            )
+            after, actual = _best_of(
+                options['repeat'],
+                lambda: renderer.render(reader.to_representation(rows))
+            )
+
+            if actual != expected:
+                raise CommandError(f'Output differs at {count} rows.')
+
+            result = {
+                'rows': count,
+                'before_rows_per_sec': round(count / before),
+                'after_rows_per_sec': round(count / after),
+                'speedup': round(before / after, 2),
+            }
+            results.append(result)
+            self.stdout.write(
+                f"{count:>8} rows: "
+                f"{result['before_rows_per_sec']:>9} -> "
+                f"{result['after_rows_per_sec']:>9} rows/sec "
+                f"({result['speedup']}x)"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2)
@@ -0,0 +1,60 @@
+"""
+Django command to import Expenses from a CSV file
+"""
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from rest_framework.exceptions import ValidationError
+
+from expense.imports import ExpenseImporter
+
+
+class Command(BaseCommand):
+    """
+    Import a CSV file of Expenses for one User, in the format the export
+    endpoint writes, and report the rows that were rejected
+    """
+    help = 'Import expenses for a user from a CSV file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file to import.')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help='Email of the User who owns the Expenses.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=5000,
+            help='Rows written per transaction.'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'No user with email {options["user"]}.')
+
+        importer = ExpenseImporter(user, chunk_size=options['chunk_size'])
+        start = time.perf_counter()
+        try:
+            with open(options['path'], 'rb') as file:
+                report = importer.import_file(file)
+        except ValidationError as exc:
+            raise CommandError(' '.join(exc.detail['file']))
+        elapsed = time.perf_counter() - start
+
+        for error in report['errors']:
+            for field, messages in error['errors'].items():
+                self.stdout.write(
+                    f'line {error["line"]}: {field}: {" ".join(messages)}'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {report["imported"]} expenses in {elapsed:.1f}s '
+            f'({report["imported"] / max(elapsed, 1e-9):.0f} rows/s), '
+            f'rejected {report["error_count"]} rows.'
+        ))
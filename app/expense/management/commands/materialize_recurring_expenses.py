@@ -0,0 +1,133 @@
+"""
+Django command to create the Expenses of due RecurringExpenses
+"""
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Max, Min
+
+from core.models import RecurringExpense
+from expense.cache import bump_generation
+
+
+def materialize(as_of, user_ids, batch_size):
+    """
+    Materialize the due occurrences of one range of User ids
+    :param as_of:
+    :param user_ids: (first, last) User id
+    :param batch_size:
+    :return totals: (templates, expenses)
+    """
+    templates = expenses = 0
+    batches = RecurringExpense.objects.materialize(
+        as_of,
+        user_ids=user_ids,
+        batch_size=batch_size
+    )
+    for batch_templates, batch_expenses in batches:
+        templates += len(batch_templates)
+        expenses += len(batch_expenses)
+        # bulk_create sends no signals, so invalidate after each commit.
+        for user_id in {expense.user_id for expense in batch_expenses}:
+            bump_generation(user_id)
+
+    return templates, expenses
+
+
+def split(first, last, parts):
+    """
+    Split the id range first..last into up to parts contiguous ranges
+    :param first:
+    :param last:
+    :param parts:
+    :return ranges: [(first, last)]
+    """
+    size = -(-(last - first + 1) // parts)
+    return [
+        (start, min(start + size - 1, last))
+        for start in range(first, last + 1, size)
+    ]
+
+
+class Command(BaseCommand):
+    """
+    Create the Expenses of every RecurringExpense occurrence due by
+    --as-of in batched bulk inserts, optionally in several processes that
+    each take a range of User ids.
+
+    Each batch commits its Expenses together with the templates' next
+    occurrence, so the command can be stopped and run again at any time:
+    it resumes where it stopped and never creates an occurrence twice.
+    """
+    help = 'Create the expenses of due recurring expenses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--as-of',
+            type=date.fromisoformat,
+            default=date.today(),
+            help='Create occurrences up to this date (YYYY-MM-DD), '
+                 'defaults to today.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Expenses created per transaction.'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=1,
+            help='Processes to split the User id range across.'
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--workers and --batch-size must be positive.')
+        if options['workers'] > 1 and connection.vendor == 'sqlite':
+            raise CommandError('SQLite allows one writer at a time, '
+                               'use --workers 1.')
+
+        as_of = options['as_of']
+        bounds = RecurringExpense.objects \
+            .filter(next_date__lte=as_of) \
+            .aggregate(first=Min('user_id'), last=Max('user_id'))
+        if bounds['first'] is None:
+            self.stdout.write(self.style.SUCCESS('Nothing is due.'))
+            return
+
+        ranges = split(bounds['first'], bounds['last'], options['workers'])
+        jobs = [(as_of, user_ids, options['batch_size'])
+                for user_ids in ranges]
+
+        start = time.perf_counter()
+        if len(jobs) == 1:
+            results = [materialize(*jobs[0])]
+        else:
+            # Forked workers must open their own database connections.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                len(jobs),
+                mp_context=multiprocessing.get_context('fork')
+            ) as pool:
+                results = list(pool.map(materialize, *zip(*jobs)))
+        elapsed = time.perf_counter() - start
+
+        for (first, last), (templates, expenses) in zip(ranges, results):
+            self.stdout.write(
+                f'users {first}-{last}: {expenses} expenses from '
+                f'{templates} recurring expenses'
+            )
+
+        templates = sum(templates for templates, _ in results)
+        expenses = sum(expenses for _, expenses in results)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {expenses} expenses from {templates} recurring '
+            f'expenses in {elapsed:.1f}s '
+            f'({expenses / max(elapsed, 1e-9):.0f} expenses/s).'
+        ))
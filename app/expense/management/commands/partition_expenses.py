@@ -0,0 +1,112 @@
+"""
+Django command to manage the PostgreSQL partitions of the Expense table
+"""
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core import partitioning
+from expense.cache import bump_generation
+
+
+class Command(BaseCommand):
+    """
+    Partition the Expense table by date_created with --convert, then keep
+    --ahead future partitions created and detach the ones that end on or
+    before --detach-before.
+
+    Run it periodically, e.g. daily, so rows never land in the default
+    partition for want of a partition for their period.
+    """
+    help = 'Create and detach the PostgreSQL partitions of expenses.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Convert the unpartitioned table first. Locks and copies '
+                 'the whole table.'
+        )
+        parser.add_argument(
+            '--interval',
+            choices=sorted(partitioning.INTERVALS),
+            default=settings.EXPENSE_PARTITION_INTERVAL,
+            help='Period of each partition, defaults to '
+                 'EXPENSE_PARTITION_INTERVAL.'
+        )
+        parser.add_argument(
+            '--ahead',
+            type=int,
+            default=3,
+            help='Partitions to keep created after the current period.'
+        )
+        parser.add_argument(
+            '--behind',
+            type=int,
+            default=24,
+            help='With --convert, periods before the current one to create '
+                 'partitions for. Older expenses go to the default '
+                 'partition.'
+        )
+        parser.add_argument(
+            '--detach-before',
+            type=date.fromisoformat,
+            help='Detach the partitions ending on or before this date '
+                 '(YYYY-MM-DD), removing their expenses from the totals.'
+        )
+        parser.add_argument(
+            '--drop',
+            action='store_true',
+            help='Drop detached partitions instead of keeping them as '
+                 'tables.'
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Partitioning requires PostgreSQL.')
+        if options['ahead'] < 0 or options['behind'] < 0:
+            raise CommandError('--ahead and --behind must not be negative.')
+
+        interval = options['interval']
+        if not partitioning.is_partitioned(connection):
+            if not options['convert']:
+                raise CommandError('The expense table is not partitioned, '
+                                   'run with --convert.')
+            try:
+                created = partitioning.convert(
+                    connection,
+                    interval,
+                    ahead=options['ahead'],
+                    behind=options['behind']
+                )
+            except ValueError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(
+                f'Converted the expense table with {len(created)} partitions.'
+            )
+
+        until = partitioning.horizon(interval, options['ahead'])
+        for name in partitioning.create_partitions(connection, interval,
+                                                   until):
+            self.stdout.write(f'Created {name}.')
+
+        if options['detach_before']:
+            quote = connection.ops.quote_name
+            for name, _, end in partitioning.partitions(connection):
+                if end > options['detach_before']:
+                    continue
+                count, user_ids = partitioning.detach_partition(connection,
+                                                                name)
+                for user_id in user_ids:
+                    bump_generation(user_id)
+                if options['drop']:
+                    with connection.cursor() as cursor:
+                        cursor.execute(f'DROP TABLE {quote(name)}')
+                self.stdout.write(
+                    f'{"Dropped" if options["drop"] else "Detached"} {name} '
+                    f'with {count} expenses.'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Partitions are up to date.'))
@@ -0,0 +1,42 @@
+"""
+Django command to delete old delta sync tombstones
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.models import DeletedExpense
+
+
+class Command(BaseCommand):
+    """
+    Delete the tombstones of Expenses deleted more than --days ago, by
+    default EXPENSE_SYNC_TOMBSTONE_DAYS. Sync rejects watermarks older
+    than EXPENSE_SYNC_TOMBSTONE_DAYS, so run it with the default.
+    """
+    help = 'Delete tombstones of expenses deleted long ago.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Keep tombstones this many days, defaults to '
+                 'EXPENSE_SYNC_TOMBSTONE_DAYS.'
+        )
+
+    def handle(self, *args, **options):
+        days = options['days']
+        if days is None:
+            days = settings.EXPENSE_SYNC_TOMBSTONE_DAYS
+        if days < 0:
+            raise CommandError('--days must not be negative.')
+
+        count = DeletedExpense.objects.prune(
+            timezone.now() - timedelta(days=days)
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {count} tombstones older than {days} days.'
+        ))
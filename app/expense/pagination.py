@@ -0,0 +1,216 @@
+"""
+Pagination for Expense API
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import (
+    remove_query_param,
+    replace_query_param
+)
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on the full ordering key
+
+    DRF's CursorPagination seeks on the first ordering field only and falls
+    back to an OFFSET for ties, which degrades on dates shared by many rows.
+    Here the cursor carries the value of every ordering field, so each page
+    is a single index range scan of at most `page_size + 1` rows no matter
+    how deep the client has paged. The last ordering field must be unique.
+
+    A queryset that is already ordered, e.g. by search relevance, is paged
+    on its own ordering instead of `ordering`.
+    """
+    ordering = ('-date_created', '-id')
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Async version of paginate_queryset
+        """
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+
+        return self.set_page([row async for row in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Return the unevaluated queryset of the requested page plus one row
+        """
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.model = queryset.model
+
+        self.position, self.reverse = self.decode_cursor(request)
+        ordering = _reverse_ordering(self.ordering) if self.reverse \
+            else self.ordering
+
+        if self.position is not None:
+            queryset = queryset.filter(self._seek(ordering, self.position))
+
+        return queryset.order_by(*ordering)[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        ordering = queryset.query.order_by
+        if ordering and all(isinstance(field, str) for field in ordering):
+            return tuple(ordering)
+
+        return self.ordering
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[-1], self.ordering
+            )
+            return self.encode_cursor((position, False))
+
+        # Paged backwards past the start: restart from the first page.
+        return remove_query_param(self.base_url, self.cursor_query_param)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        if self.page:
+            position = self._get_position_from_instance(
+                self.page[0], self.ordering
+            )
+            return self.encode_cursor((position, True))
+
+        return remove_query_param(self.base_url, self.cursor_query_param)
+
+    def decode_cursor(self, request):
+        """
+        Return the `(position, reverse)` pair carried by the request cursor
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            tokens = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            reverse = bool(tokens.get('r', 0))
+            position = [
+                self._to_python(field, value) for field, value
+                in zip(self.ordering, tokens['p'], strict=True)
+            ]
+        except (TypeError, ValueError, KeyError, AttributeError,
+                ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return position, reverse
+
+    def encode_cursor(self, cursor):
+        position, reverse = cursor
+        tokens = {'p': position}
+        if reverse:
+            tokens['r'] = 1
+
+        encoded = urlsafe_b64encode(
+            json.dumps(tokens, separators=(',', ':')).encode('ascii')
+        ).decode('ascii')
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded
+        )
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            name = field.lstrip('-')
+            value = instance[name] if isinstance(instance, dict) \
+                else getattr(instance, name)
+
+            if isinstance(value, Decimal):
+                value = str(value)
+            elif hasattr(value, 'isoformat'):
+                value = value.isoformat()
+
+            position.append(value)
+        return position
+
+    def _to_python(self, field, value):
+        try:
+            model_field = self.model._meta.get_field(field.lstrip('-'))
+        except FieldDoesNotExist:
+            # Annotations are kept as their JSON value.
+            return value
+        return model_field.to_python(value)
+
+    def _seek(self, ordering, position):
+        """
+        Build `(f1, f2, ...) > (v1, v2, ...)` in the direction of `ordering`
+
+        The leading field is also bounded on its own so the database can
+        turn it into an index range condition.
+        """
+        lookups = [
+            (field.lstrip('-'), 'lt' if field.startswith('-') else 'gt')
+            for field in ordering
+        ]
+
+        seek = Q()
+        for index, (name, lookup) in enumerate(lookups):
+            term = Q(**{f'{name}__{lookup}': position[index]})
+            for (prior, _), value in zip(lookups[:index], position):
+                term &= Q(**{prior: value})
+            seek |= term
+
+        name, lookup = lookups[0]
+        return Q(**{f'{name}__{lookup}e': position[0]}) & seek
+
+
+def _reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
@@ -0,0 +1,89 @@
+"""
+Renderers for Expense export
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from rest_framework import renderers
+
+
+class _Echo:
+    """
+    File-like object that hands back what csv.writer writes to it
+    """
+
+    def write(self, value):
+        return value
+
+
+def _buffered(lines, buffer_size=64 * 1024):
+    """
+    Join small encoded lines into chunks of roughly buffer_size bytes
+    """
+    chunk = []
+    size = 0
+    for line in lines:
+        chunk.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield b''.join(chunk)
+            chunk = []
+            size = 0
+
+    if chunk:
+        yield b''.join(chunk)
+
+
+class StreamingRenderer(renderers.BaseRenderer):
+    """
+    Base class for renderers that can stream rows of values
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        if isinstance(data, dict):
+            data = [data]
+
+        fields = list(data[0]) if data else []
+        rows = ([item.get(field) for field in fields] for item in data)
+        return b''.join(self.stream(fields, rows))
+
+    def stream(self, fields, rows):
+        """
+        Yield the encoded document for rows of values ordered like fields
+        :param fields:
+        :param rows:
+        :return chunks:
+        """
+        raise NotImplementedError('stream() must be implemented.')
+
+
+class CSVRenderer(StreamingRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, fields, rows):
+        writer = csv.writer(_Echo())
+        # Send the header on its own so the first byte leaves immediately.
+        yield writer.writerow(fields).encode(self.charset)
+        yield from _buffered(
+            writer.writerow(row).encode(self.charset) for row in rows
+        )
+
+
+class NDJSONRenderer(StreamingRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def stream(self, fields, rows):
+        encoder = DjangoJSONEncoder(separators=(',', ':'), ensure_ascii=False)
+        yield from _buffered(
+            (encoder.encode(dict(zip(fields, row))) + '\n').encode(
+                self.charset
+            )
+            for row in rows
+        )
@@ -1,14 +1,136 @@
 """
 Serializers for Expense API
 """
-from datetime import date
+import copy
+from datetime import date, timedelta
 
-from rest_framework import serializers
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext as _
 
-from core.models import Expense
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
 
+from core.fieldsets import SparseFieldsetMixin
+from core.metrics import TimedSerializerMixin, timer
+from core.models import Category, Expense, ExpenseRollup, RecurringExpense
+from expense.cache import invalidate_user
+from expense.sync import decode_watermark
 
-class ExpenseSerializer(serializers.ModelSerializer):
+
+def _invalidate(expenses):
+    """
+    Invalidate cached responses of the owners of bulk written Expenses
+    """
+    for user_id in {expense.user_id for expense in expenses}:
+        invalidate_user(user_id)
+
+
+class ExpenseListSerializer(TimedSerializerMixin,
+                            serializers.ListSerializer):
+    """
+    Serializer for batches of Expenses
+
+    Writes the whole batch with a single bulk query inside one transaction.
+    """
+    max_batch_size = 1000
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('max_length', self.max_batch_size)
+        super().__init__(*args, **kwargs)
+
+    def create(self, validated_data):
+        """
+        Create and return Expenses
+        :param validated_data:
+        :return expenses:
+        """
+        expenses = []
+        for attrs in validated_data:
+            attrs.setdefault('date_created', date.today())
+            expenses.append(Expense(**attrs))
+
+        with transaction.atomic():
+            expenses = Expense.objects.bulk_create(expenses)
+            ExpenseRollup.objects.record_bulk(added=expenses)
+            Category.objects.record_bulk(added=expenses)
+            _invalidate(expenses)
+
+        return expenses
+
+    def update(self, instance, validated_data):
+        """
+        Update and return Expenses, matched to validated_data by position
+        :param instance:
+        :param validated_data:
+        :return expenses:
+        """
+        previous = [copy.copy(expense) for expense in instance]
+        fields = set()
+        for expense, attrs in zip(instance, validated_data):
+            for attr, value in attrs.items():
+                setattr(expense, attr, value)
+            fields.update(attrs)
+
+        if fields:
+            # bulk_update skips auto_now.
+            now = timezone.now()
+            for expense in instance:
+                expense.updated_at = now
+            fields.add('updated_at')
+
+            with transaction.atomic():
+                Expense.objects.bulk_update(instance, fields)
+                ExpenseRollup.objects.record_bulk(
+                    added=instance,
+                    removed=previous
+                )
+                Category.objects.record_bulk(
+                    added=instance,
+                    removed=previous
+                )
+                _invalidate(instance)
+
+        return instance
+
+
+class CategoryField(serializers.PrimaryKeyRelatedField):
+    """
+    Category chosen by id from the queryset, which is read once and shared
+    through the context so a batch of Expenses does not query per item
+    """
+
+    def to_internal_value(self, data):
+        if 'categories' not in self.context:
+            self.context['categories'] = self.get_queryset().in_bulk()
+
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            pk = int(data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+        category = self.context['categories'].get(pk)
+        if category is None:
+            self.fail('does_not_exist', pk_value=data)
+
+        return category
+
+
+class ExpenseSerializer(SparseFieldsetMixin, TimedSerializerMixin,
+                        serializers.ModelSerializer):
+    category = CategoryField(
+        queryset=Category.objects.all(),
+        required=False,
+        allow_null=True
+    )
+    category_name = serializers.CharField(
+        source='category.name',
+        read_only=True,
+        allow_null=True
+    )
 
     class Meta:
         model = Expense
@@ -16,14 +138,379 @@ class ExpenseSerializer(serializers.ModelSerializer):
             'id',
             'expense_name',
             'price',
-            'date_created'
+            'date_created',
+            'category',
+            'category_name'
         ]
         read_only_fields = ['id']
+        list_serializer_class = ExpenseListSerializer
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+
+        if request is not None and request.user.is_authenticated:
+            fields['category'].queryset = Category.objects.filter(
+                user=request.user
+            )
+
+        return fields
 
     def create(self, validated_data):
 
         if 'date_created' not in validated_data:
             validated_data['date_created'] = date.today()
 
-        expense = Expense.objects.create(**validated_data)
+        with transaction.atomic():
+            expense = Expense.objects.create(**validated_data)
+            ExpenseRollup.objects.record(added=[expense])
+            Category.objects.record(added=[expense])
+
         return expense
+
+    def update(self, instance, validated_data):
+        previous = copy.copy(instance)
+
+        with transaction.atomic():
+            expense = super().update(instance, validated_data)
+            ExpenseRollup.objects.record(added=[expense], removed=[previous])
+            Category.objects.record(added=[expense], removed=[previous])
+
+        return expense
+
+
+def _read_formatter(field):
+    """
+    Return a function producing field.to_representation(value) for values
+    read straight from the database, short-cutting the common field types
+    """
+    if isinstance(field, serializers.IntegerField):
+        convert = int
+    elif type(field) is serializers.CharField:
+        convert = str
+    elif type(field) is serializers.DateField \
+            and getattr(field, 'format', api_settings.DATE_FORMAT) \
+            == ISO_8601:
+        convert = date.isoformat
+    elif isinstance(field, serializers.PrimaryKeyRelatedField):
+        # values() returns the primary key rather than the related object.
+        convert = field.pk_field.to_representation if field.pk_field \
+            else int
+    elif type(field) is serializers.DecimalField \
+            and getattr(field, 'coerce_to_string',
+                        api_settings.COERCE_DECIMAL_TO_STRING) \
+            and not field.localize:
+        def convert(value):
+            return '{:f}'.format(field.quantize(value))
+    else:
+        convert = field.to_representation
+
+    def formatter(value):
+        return None if value is None else convert(value)
+
+    return formatter
+
+
+class ExpenseReadSerializer:
+    """
+    Read-only serializer for Expense listings and exports
+
+    Formats rows from `values(*sources)`/`values_list(*sources)` exactly
+    like ExpenseSerializer, without model instances or DRF's per-field
+    attribute lookups. ExpenseSerializer still handles all writes.
+    """
+
+    def __init__(self, fields=None):
+        declared = ExpenseSerializer().fields
+        self.fields = list(fields or declared)
+        # Dotted sources such as category.name become joins in values().
+        self.sources = [
+            declared[field].source.replace('.', '__') for field in self.fields
+        ]
+        self.formatters = [
+            _read_formatter(declared[field]) for field in self.fields
+        ]
+
+    def format_row(self, row):
+        """
+        Format a values_list() row ordered like self.sources
+        :param row:
+        :return values:
+        """
+        return [
+            format_value(value)
+            for format_value, value in zip(self.formatters, row)
+        ]
+
+    def to_representation(self, rows):
+        """
+        Format values() rows as ExpenseSerializer(many=True).data would
+        :param rows:
+        :return data:
+        """
+        columns = list(zip(self.fields, self.sources, self.formatters))
+        with timer('serializer'):
+            return [
+                {field: format_value(row[source]) for field, source,
+                 format_value in columns}
+                for row in rows
+            ]
+
+
+class CategorySerializer(serializers.ModelSerializer):
+    """
+    Serializer for Categories with their precomputed totals
+    """
+
+    class Meta:
+        model = Category
+        fields = ['id', 'name', 'total', 'count']
+        read_only_fields = ['id', 'total', 'count']
+
+    def validate_name(self, value):
+        user = self.context['request'].user
+        categories = Category.objects.filter(user=user, name=value)
+        if self.instance is not None:
+            categories = categories.exclude(pk=self.instance.pk)
+
+        if categories.exists():
+            msg = _('You already have a category with this name.')
+            raise serializers.ValidationError(msg)
+
+        return value
+
+
+class RecurringExpenseSerializer(serializers.ModelSerializer):
+    """
+    Serializer for RecurringExpense templates
+
+    The schedule (frequency, interval and start_date) is fixed once
+    created; other changes apply to occurrences not created yet.
+    """
+    category = CategoryField(
+        queryset=Category.objects.all(),
+        required=False,
+        allow_null=True
+    )
+
+    class Meta:
+        model = RecurringExpense
+        fields = [
+            'id',
+            'expense_name',
+            'price',
+            'category',
+            'frequency',
+            'interval',
+            'start_date',
+            'end_date',
+            'next_date'
+        ]
+        read_only_fields = ['id', 'next_date']
+        extra_kwargs = {'interval': {'min_value': 1}}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+
+        if request is not None and request.user.is_authenticated:
+            fields['category'].queryset = Category.objects.filter(
+                user=request.user
+            )
+
+        return fields
+
+    def validate(self, attrs):
+        if self.instance is not None:
+            for field in ('frequency', 'interval', 'start_date'):
+                if field in attrs \
+                        and attrs[field] != getattr(self.instance, field):
+                    msg = _('The schedule cannot be changed.')
+                    raise serializers.ValidationError({field: msg})
+
+        start_date = attrs.get(
+            'start_date',
+            getattr(self.instance, 'start_date', None)
+        )
+        end_date = attrs.get(
+            'end_date',
+            getattr(self.instance, 'end_date', None)
+        )
+        if end_date is not None and end_date < start_date:
+            msg = _('End date must not be before the start date.')
+            raise serializers.ValidationError({'end_date': msg})
+
+        return attrs
+
+    def create(self, validated_data):
+        validated_data['next_date'] = validated_data['start_date']
+        return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        if 'end_date' in validated_data:
+            instance.set_end_date(validated_data.pop('end_date'))
+        return super().update(instance, validated_data)
+
+
+class ExpenseIdSerializer(serializers.Serializer):
+    """
+    Serializer for identifying an Expense in a batch
+    """
+    id = serializers.IntegerField(min_value=1)
+
+
+class ExpenseFilterQuerySerializer(serializers.Serializer):
+    """
+    Serializer for Expense list filter query parameters
+    """
+    # Each ordering ends in the unique id and is served by an index on
+    # (user, ...) scanned in either direction.
+    ORDERINGS = {
+        'date_created': ('date_created', 'id'),
+        '-date_created': ('-date_created', '-id'),
+        'price': ('price', 'id'),
+        '-price': ('-price', '-id'),
+        'expense_name': ('expense_name', 'id'),
+        '-expense_name': ('-expense_name', '-id'),
+    }
+
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    price_min = serializers.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        required=False
+    )
+    price_max = serializers.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        required=False
+    )
+    category = serializers.IntegerField(min_value=1, required=False)
+    ordering = serializers.ChoiceField(choices=list(ORDERINGS), required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get('date_from')
+        date_to = attrs.get('date_to')
+        price_min = attrs.get('price_min')
+        price_max = attrs.get('price_max')
+
+        if date_from and date_to and date_from > date_to:
+            msg = _('date_from must not be after date_to.')
+            raise serializers.ValidationError(msg)
+
+        if price_min is not None and price_max is not None \
+                and price_min > price_max:
+            msg = _('price_min must not be greater than price_max.')
+            raise serializers.ValidationError(msg)
+
+        return attrs
+
+
+class ExpenseArchiveQuerySerializer(serializers.Serializer):
+    """
+    Serializer for the query parameter choosing archived Expenses
+    """
+    archived = serializers.BooleanField(required=False, default=False)
+
+
+class ExpenseSummaryQuerySerializer(serializers.Serializer):
+    """
+    Serializer for Expense summary query parameters
+    """
+    PERIODS = ['day', 'week', 'month', 'year']
+
+    period = serializers.ChoiceField(choices=PERIODS, default='month')
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        date_from = attrs.get('date_from')
+        date_to = attrs.get('date_to')
+
+        if date_from and date_to and date_from > date_to:
+            msg = _('date_from must not be after date_to.')
+            raise serializers.ValidationError(msg)
+
+        return attrs
+
+
+class ExpenseSyncQuerySerializer(serializers.Serializer):
+    """
+    Serializer for Expense sync query parameters
+    """
+    since = serializers.CharField(
+        required=False,
+        help_text='Watermark returned by the previous sync, omit to sync '
+                  'all Expenses.'
+    )
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=1000,
+        default=500,
+        help_text='Maximum number of changes returned.'
+    )
+
+    def validate_since(self, value):
+        try:
+            moment, pk = decode_watermark(value)
+        except ValueError:
+            raise serializers.ValidationError(_('Invalid watermark.'))
+
+        # Tombstones older than this are pruned, so deletions since would
+        # be missed.
+        horizon = timezone.now() - timedelta(
+            days=settings.EXPENSE_SYNC_TOMBSTONE_DAYS
+        )
+        if moment < horizon:
+            msg = _('Watermark expired, sync again without since.')
+            raise serializers.ValidationError(msg)
+
+        return moment, pk
+
+
+class ExpenseSyncSerializer(serializers.Serializer):
+    """
+    Serializer for a page of Expense changes
+    """
+    changed = ExpenseSerializer(many=True)
+    deleted = serializers.ListField(child=serializers.IntegerField())
+    watermark = serializers.CharField()
+    more = serializers.BooleanField()
+
+
+class ExpenseSummarySerializer(TimedSerializerMixin,
+                               serializers.Serializer):
+    """
+    Serializer for Expense totals of one period
+    """
+    period = serializers.DateField()
+    total = serializers.DecimalField(max_digits=None, decimal_places=2)
+    count = serializers.IntegerField()
+    average = serializers.DecimalField(max_digits=None, decimal_places=2)
+
+
+class ExpenseImportSerializer(serializers.Serializer):
+    """
+    Serializer for a CSV file of Expenses to import
+    """
+    file = serializers.FileField()
+
+
+class ExpenseImportErrorSerializer(serializers.Serializer):
+    """
+    Serializer for the errors of one rejected CSV row
+    """
+    line = serializers.IntegerField()
+    errors = serializers.DictField(
+        child=serializers.ListField(child=serializers.CharField())
+    )
+
+
+class ExpenseImportReportSerializer(serializers.Serializer):
+    """
+    Serializer for the outcome of a CSV import
+    """
+    imported = serializers.IntegerField()
+    error_count = serializers.IntegerField()
+    errors = ExpenseImportErrorSerializer(many=True)
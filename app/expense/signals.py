@@ -0,0 +1,25 @@
+"""
+Signal handlers for Expense API
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.models import Category, Expense
+from expense.cache import invalidate_user
+
+
+@receiver([post_save, post_delete], sender=Expense)
+def invalidate_cached_expenses(sender, instance, **kwargs):
+    """
+    Invalidate the owner's cached responses when an Expense changes
+    """
+    invalidate_user(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_cached_categories(sender, instance, **kwargs):
+    """
+    Invalidate the owner's cached responses when a Category changes, as
+    Expenses include its name
+    """
+    invalidate_user(instance.user_id)
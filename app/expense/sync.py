@@ -0,0 +1,174 @@
+"""
+Delta sync of a User's Expenses
+
+A sync returns the Expenses created or updated and the ids of those
+deleted after a watermark, oldest change first, with the watermark to
+sync from next. Changes are read from the (user, updated_at, id) index of
+Expenses and the (user, deleted_at, id) index of DeletedExpense
+tombstones, so a sync costs the number of changes, not the number of
+Expenses the User has.
+
+A change becomes visible when its transaction commits, which can be well
+after it set updated_at: batch writers such as materialize_recurring_expenses,
+CSV imports and archive_expenses stamp thousands of rows before committing.
+On PostgreSQL a sync never hands out a watermark past the start of the
+oldest transaction still open, so those rows land ahead of it whenever
+they commit. Changes younger than EXPENSE_SYNC_SETTLE_SECONDS are also
+left for the next sync, covering the moment between a row being stamped
+and its transaction starting, and clock skew between the app and the
+database. Other databases only have the settle time, which must then
+exceed the longest write transaction.
+"""
+import heapq
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models import DeletedExpense, Expense
+
+
+def encode_watermark(moment, pk=None):
+    """
+    Encode a sync position as an opaque token
+    :param moment: time of the last change synced
+    :param pk: id of the last change synced at that time, None when every
+        change at that time was synced
+    :return watermark:
+    """
+    tokens = {'t': moment.isoformat()}
+    if pk is not None:
+        tokens['i'] = pk
+
+    return urlsafe_b64encode(
+        json.dumps(tokens, separators=(',', ':')).encode('ascii')
+    ).decode('ascii')
+
+
+def decode_watermark(watermark):
+    """
+    Decode a token made by encode_watermark
+    :param watermark:
+    :return (moment, pk):
+    :raises ValueError: the token is not a watermark
+    """
+    try:
+        tokens = json.loads(urlsafe_b64decode(watermark.encode('ascii')))
+        moment = datetime.fromisoformat(tokens['t'])
+        pk = tokens.get('i')
+    except (TypeError, KeyError, AttributeError, UnicodeError) as exc:
+        raise ValueError(str(exc))
+
+    if timezone.is_naive(moment) or not isinstance(pk, (int, type(None))):
+        raise ValueError('Invalid watermark.')
+
+    return moment, pk
+
+
+def _after(field, moment, pk):
+    """
+    Build `(field, id) > (moment, pk)`, or `field > moment` without pk
+
+    The time is also bounded on its own so the database can turn it into
+    an index range condition.
+    """
+    if pk is None:
+        return Q(**{f'{field}__gt': moment})
+
+    return Q(**{f'{field}__gte': moment}) & (
+        Q(**{f'{field}__gt': moment}) | Q(**{field: moment, 'id__gt': pk})
+    )
+
+
+def oldest_open_transaction():
+    """
+    Return when the oldest transaction open on the database, other than
+    this connection's, started
+    :return moment: None when none is open or the database cannot tell
+    """
+    if connection.vendor != 'postgresql':
+        return None
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT min(xact_start) FROM pg_stat_activity "
+            "WHERE datname = current_database() "
+            "AND backend_type = 'client backend' "
+            "AND pid <> pg_backend_pid()"
+        )
+        return cursor.fetchone()[0]
+
+
+class ExpenseSync:
+    """
+    Read a User's Expense changes since a watermark, formatting changed
+    Expenses with an ExpenseReadSerializer
+    """
+
+    def __init__(self, user, reader):
+        self.user = user
+        self.reader = reader
+
+    def changes(self, since=None, limit=500):
+        """
+        Return up to limit changes after since, oldest first
+        :param since: (moment, pk) from decode_watermark, None for all
+            Expenses
+        :param limit:
+        :return changes: {'changed': Expenses, 'deleted': ids,
+            'watermark': watermark to sync from next, 'more': whether
+            changes are left past limit}
+        """
+        settle = timedelta(seconds=settings.EXPENSE_SYNC_SETTLE_SECONDS)
+        until = timezone.now()
+        oldest = oldest_open_transaction()
+        if oldest is not None:
+            until = min(until, oldest)
+        until -= settle
+        changed = Expense.objects.filter(
+            user=self.user,
+            updated_at__lte=until
+        )
+        deleted = DeletedExpense.objects.filter(
+            user=self.user,
+            deleted_at__lte=until
+        )
+        if since is not None:
+            changed = changed.filter(_after('updated_at', *since))
+            deleted = deleted.filter(_after('deleted_at', *since))
+
+        # Each query reads at most limit + 1 rows off its index; merged by
+        # time, the first limit changes are the oldest of both.
+        changed = changed \
+            .order_by('updated_at', 'id') \
+            .values(*self.reader.sources, 'updated_at')[:limit + 1]
+        deleted = deleted \
+            .order_by('deleted_at', 'id') \
+            .values_list('deleted_at', 'id')[:limit + 1]
+        events = list(islice(heapq.merge(
+            ((row['updated_at'], row['id'], row) for row in changed),
+            ((moment, pk, None) for moment, pk in deleted),
+            key=lambda event: event[:2]
+        ), limit + 1))
+
+        more = len(events) > limit
+        events = events[:limit]
+        if more:
+            moment, pk, _ = events[-1]
+            watermark = encode_watermark(moment, pk)
+        else:
+            watermark = encode_watermark(until)
+
+        return {
+            'changed': self.reader.to_representation(
+                [row for _, _, row in events if row is not None]
+            ),
+            'deleted': [pk for _, pk, row in events if row is None],
+            'watermark': watermark,
+            'more': more,
+        }
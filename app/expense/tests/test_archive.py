@@ -0,0 +1,208 @@
+"""
+Tests for archiving old Expenses
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import ArchivedExpense, Category, Expense, ExpenseRollup
+from core.testing import QueryBudgetMixin
+from expense.cache import get_generation
+
+
+EXPENSE_URL = reverse('expense:expense-list')
+EXPORT_URL = reverse('expense:expense-export')
+SUMMARY_URL = reverse('expense:expense-summary')
+
+QUERY_BUDGETS = {
+    'GET expense:expense-list': 1,
+    'GET expense:expense-detail': 1,
+    'expense:expense-export': 1,
+    'expense:expense-summary': 1,
+}
+
+
+def detail_url(expense_id):
+    return reverse('expense:expense-detail', args=[expense_id])
+
+
+class ArchiveTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Food')
+
+        payload = [
+            {'expense_name': 'Old', 'price': '10.00',
+             'date_created': '2020-01-05', 'category': self.category.id},
+            {'expense_name': 'Older', 'price': '5.00',
+             'date_created': '2019-06-01'},
+            {'expense_name': 'New', 'price': '7.00',
+             'date_created': '2023-01-05', 'category': self.category.id},
+        ]
+        self.client.post(reverse('expense:expense-bulk'), payload,
+                         format='json')
+        self.old = Expense.objects.get(expense_name='Old')
+
+    def archive(self, before=date(2021, 1, 1), batch_size=5000):
+        call_command('archive_expenses', before=before,
+                     batch_size=batch_size, stdout=StringIO())
+
+    def test_archive_moves_old_expenses(self):
+        self.archive(batch_size=1)
+
+        self.assertEqual(
+            list(Expense.objects.values_list('expense_name', flat=True)),
+            ['New']
+        )
+        archived = ArchivedExpense.objects.get(id=self.old.id)
+        self.assertEqual(archived.price, Decimal('10.00'))
+        self.assertEqual(archived.category, self.category)
+        self.assertEqual(ArchivedExpense.objects.count(), 2)
+
+    def test_archive_keeps_totals(self):
+        self.archive()
+
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+        self.assertEqual(Category.objects.drift(), [])
+        self.category.refresh_from_db()
+        self.assertEqual(self.category.total, Decimal('17.00'))
+
+        ExpenseRollup.objects.rebuild()
+        self.assertTrue(
+            ExpenseRollup.objects.filter(month=date(2020, 1, 1)).exists()
+        )
+
+    def test_archive_is_idempotent(self):
+        self.archive()
+        self.archive()
+
+        self.assertEqual(ArchivedExpense.objects.count(), 2)
+
+    @override_settings(EXPENSE_ARCHIVE_AFTER_DAYS=365)
+    def test_default_age_comes_from_settings(self):
+        call_command('archive_expenses', stdout=StringIO())
+
+        self.assertEqual(ArchivedExpense.objects.count(), 3)
+
+    def test_archive_invalidates_cached_lists(self):
+        generation = get_generation(self.user.id)
+
+        self.archive()
+
+        self.assertNotEqual(get_generation(self.user.id), generation)
+
+    def test_list_excludes_archived(self):
+        self.archive()
+
+        res = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(
+            [expense['expense_name'] for expense in res.data['results']],
+            ['New']
+        )
+
+    def test_list_archived(self):
+        self.archive()
+
+        res = self.client.get(EXPENSE_URL, {'archived': 'true'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {
+                'id': self.old.id,
+                'expense_name': 'Old',
+                'price': '10.00',
+                'date_created': '2020-01-05',
+                'category': self.category.id,
+                'category_name': 'Food',
+            },
+            {
+                'id': ArchivedExpense.objects.get(expense_name='Older').id,
+                'expense_name': 'Older',
+                'price': '5.00',
+                'date_created': '2019-06-01',
+                'category': None,
+                'category_name': None,
+            },
+        ])
+
+    def test_list_archived_filters(self):
+        self.archive()
+
+        res = self.client.get(EXPENSE_URL, {
+            'archived': 'true',
+            'date_from': '2020-01-01',
+        })
+
+        self.assertEqual(
+            [expense['expense_name'] for expense in res.data['results']],
+            ['Old']
+        )
+
+    def test_retrieve_archived(self):
+        self.archive()
+
+        res = self.client.get(detail_url(self.old.id))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        res = self.client.get(detail_url(self.old.id), {'archived': 'true'})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['expense_name'], 'Old')
+
+    def test_archived_expenses_are_read_only(self):
+        self.archive()
+
+        res = self.client.delete(
+            f'{detail_url(self.old.id)}?archived=true'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(ArchivedExpense.objects.filter(id=self.old.id)
+                        .exists())
+
+    def test_invalid_archived_flag(self):
+        res = self.client.get(EXPENSE_URL, {'archived': 'maybe'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_archived(self):
+        self.archive()
+
+        res = self.client.get(EXPORT_URL, {'archived': 'true'},
+                              HTTP_ACCEPT='text/csv')
+
+        content = b''.join(res.streaming_content).decode()
+        self.assertIn('Old', content)
+        self.assertNotIn('New', content)
+
+    def test_summary_includes_archived(self):
+        self.archive(before=date(2023, 1, 10))
+        Expense.objects.create(user=self.user, expense_name='Later',
+                               price=Decimal('3.00'),
+                               date_created=date(2023, 1, 20))
+
+        res = self.client.get(SUMMARY_URL, {'period': 'year'})
+
+        self.assertEqual(res.json(), [
+            {'period': '2019-01-01', 'total': '5.00', 'count': 1,
+             'average': '5.00'},
+            {'period': '2020-01-01', 'total': '10.00', 'count': 1,
+             'average': '10.00'},
+            {'period': '2023-01-01', 'total': '10.00', 'count': 2,
+             'average': '5.00'},
+        ])
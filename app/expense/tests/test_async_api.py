@@ -0,0 +1,153 @@
+"""
+Tests for async Expense API
+"""
+from datetime import date
+from decimal import Decimal
+
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.test import AsyncClient, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.models import Expense, ExpenseRollup
+
+
+ASYNC_EXPENSE_URL = reverse('expense:async-expense-list')
+EXPENSE_URL = reverse('expense:expense-list')
+
+
+def async_detail_url(expense_id):
+    return reverse('expense:async-expense-detail', args=[expense_id])
+
+
+def create_expense(user, **params):
+    defaults = {
+        'expense_name': 'Groceries',
+        'price': Decimal('1000.00'),
+        'date_created': date.today(),
+    }
+
+    defaults.update(params)
+
+    return Expense.objects.create(user=user, **defaults)
+
+
+class AsyncExpenseApiTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = AsyncClient()
+        self.auth = {'AUTHORIZATION': f'Token {self.token.key}'}
+
+    async def test_auth_required(self):
+        res = await self.client.get(ASYNC_EXPENSE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res['WWW-Authenticate'], 'Token')
+
+    async def test_invalid_token(self):
+        res = await self.client.get(
+            ASYNC_EXPENSE_URL,
+            AUTHORIZATION='Token invalid'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_list_matches_sync_view(self):
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test1234'
+        )
+        create_expense(user=other_user)
+        for day in range(1, 6):
+            create_expense(user=self.user, date_created=date(2023, 2, day))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        params = {'page_size': 2, 'price_min': '10'}
+        expected = client.get(EXPENSE_URL, params).json()
+
+        get = async_to_sync(self.client.get)
+        res = get(ASYNC_EXPENSE_URL, params, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json()['results'],
+            expected['results']
+        )
+        self.assertIn(f'{ASYNC_EXPENSE_URL}?', res.json()['next'])
+
+        res = get(res.json()['next'], **self.auth)
+
+        self.assertEqual(len(res.json()['results']), 2)
+
+    async def test_retrieve_expense(self):
+        expense = await Expense.objects.acreate(
+            user=self.user,
+            expense_name='Gas',
+            price=Decimal('5.00'),
+            date_created=date(2023, 2, 13)
+        )
+
+        res = await self.client.get(async_detail_url(expense.id), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()['expense_name'], 'Gas')
+        self.assertEqual(res.json()['price'], '5.00')
+
+    async def test_retrieve_other_users_expense_not_found(self):
+        other_user = await get_user_model().objects.acreate(
+            email='other@example.com'
+        )
+        expense = await Expense.objects.acreate(
+            user=other_user,
+            expense_name='Gas',
+            price=Decimal('5.00'),
+            date_created=date(2023, 2, 13)
+        )
+
+        res = await self.client.get(async_detail_url(expense.id), **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_create_expense(self):
+        payload = {'expense_name': 'Gas', 'price': '40.00'}
+
+        res = await self.client.post(
+            ASYNC_EXPENSE_URL,
+            payload,
+            content_type='application/json',
+            **self.auth
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        expense = await Expense.objects.aget(id=res.json()['id'])
+        self.assertEqual(expense.user_id, self.user.id)
+        rollup = await ExpenseRollup.objects.aget(user=self.user)
+        self.assertEqual(rollup.total, Decimal('40.00'))
+
+    async def test_create_expense_invalid(self):
+        res = await self.client.post(
+            ASYNC_EXPENSE_URL,
+            {'expense_name': 'Gas'},
+            content_type='application/json',
+            **self.auth
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('price', res.json())
+
+    async def test_queries_reported_in_server_timing(self):
+        res = await self.client.get(ASYNC_EXPENSE_URL, **self.auth)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # Token lookup and the page.
+        self.assertIn('desc="2 queries"', res['Server-Timing'])
@@ -2,22 +2,60 @@
 Tests for Expense API
 """
 import datetime
-from datetime import date
+import json
+import unittest
+from datetime import date, timedelta
 from decimal import Decimal
+from unittest import mock
 
+import msgpack
 from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 
-from core.models import Expense
+from core.models import Category, DeletedExpense, Expense, ExpenseRollup
+from core.testing import QueryBudgetMixin
 
-from expense.serializers import ExpenseSerializer
+from expense.cache import get_response_cache
+from expense.serializers import ExpenseReadSerializer, ExpenseSerializer
 
 
 EXPENSE_URL = reverse('expense:expense-list')
+BULK_URL = reverse('expense:expense-bulk')
+EXPORT_URL = reverse('expense:expense-export')
+SUMMARY_URL = reverse('expense:expense-summary')
+CATEGORY_URL = reverse('expense:category-list')
+
+QUERY_BUDGETS = {
+    'GET expense:expense-list': 1,
+    'POST expense:expense-list': 9,
+    'GET expense:expense-detail': 1,
+    'PATCH expense:expense-detail': 12,
+    'DELETE expense:expense-detail': 6,
+    # Rollups cost up to four queries per month touched by the batch and
+    # Category totals one per Category.
+    'expense:expense-bulk': 14,
+    'expense:expense-export': 1,
+    'expense:expense-summary': 1,
+    'GET expense:category-list': 1,
+    'POST expense:category-list': 2,
+}
+
+
+def detail_url(expense_id):
+    return reverse('expense:expense-detail', args=[expense_id])
+
+
+def category_detail_url(category_id):
+    return reverse('expense:category-detail', args=[category_id])
 
 
 def create_expense(user, **params):
@@ -56,9 +94,11 @@ class PublicExpenseApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateExpenseApiTests(TestCase):
+class PrivateExpenseApiTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
 
     def setUp(self):
+        get_response_cache().clear()
         self.client = APIClient()
         self.user = create_user(**create_user_payload())
         self.client.force_authenticate(self.user)
@@ -69,11 +109,11 @@ class PrivateExpenseApiTests(TestCase):
 
         res = self.client.get(EXPENSE_URL)
 
-        expenses = Expense.objects.all().order_by('-date_created')
+        expenses = Expense.objects.all().order_by('-date_created', '-id')
         serializer = ExpenseSerializer(expenses, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_expense_list_limited_to_user(self):
         other_user = create_user(
@@ -89,7 +129,7 @@ class PrivateExpenseApiTests(TestCase):
         serializer = ExpenseSerializer(expenses, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data['results'], serializer.data)
 
     def test_create_expense_blank_date(self):
         payload = {
@@ -135,17 +175,1011 @@ class PrivateExpenseApiTests(TestCase):
 
         res = self.client.get(EXPENSE_URL, {'expense_name': 'Gas'})
 
-        self.assertEqual(res.data[0]['expense_name'], payload['expense_name'])
-        self.assertEqual(len(res.data), 1)
+        results = res.data['results']
+        self.assertEqual(results[0]['expense_name'], payload['expense_name'])
+        self.assertEqual(len(results), 1)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_search_expenses_by_relevance(self):
+        other_user = create_user(email='other@example.com', password='pass')
+        create_expense(user=other_user, expense_name='Gas')
+        prefix = create_expense(user=self.user, expense_name='Gasoline')
+        exact = create_expense(user=self.user, expense_name='Gas')
+        create_expense(user=self.user, expense_name='Rent')
+
+        res = self.client.get(EXPENSE_URL, {'search': 'gas'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [expense['id'] for expense in res.data['results']],
+            [exact.id, prefix.id]
+        )
+
+    def test_search_paginated_by_rank(self):
+        for day in range(1, 4):
+            create_expense(
+                user=self.user,
+                expense_name='Coffee',
+                date_created=date(2023, 2, day)
+            )
+            create_expense(
+                user=self.user,
+                expense_name='Coffee beans',
+                date_created=date(2023, 2, day)
+            )
+        create_expense(user=self.user, expense_name='Rent')
+
+        seen = []
+        res = self.client.get(
+            EXPENSE_URL,
+            {'search': 'coffee', 'page_size': 2}
+        )
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(len({expense['id'] for expense in seen}), 6)
+        self.assertEqual(
+            [expense['expense_name'] for expense in seen[:3]],
+            ['Coffee'] * 3
+        )
+
+    def test_filter_by_date_and_price_range(self):
+        create_expense(
+            user=self.user,
+            price=Decimal('5.00'),
+            date_created=date(2023, 1, 10)
+        )
+        match = create_expense(
+            user=self.user,
+            price=Decimal('20.00'),
+            date_created=date(2023, 1, 15)
+        )
+        create_expense(
+            user=self.user,
+            price=Decimal('50.00'),
+            date_created=date(2023, 1, 20)
+        )
+        create_expense(
+            user=self.user,
+            price=Decimal('20.00'),
+            date_created=date(2023, 2, 1)
+        )
+
+        res = self.client.get(EXPENSE_URL, {
+            'date_from': '2023-01-01',
+            'date_to': '2023-01-31',
+            'price_min': '10',
+            'price_max': '30',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [expense['id'] for expense in res.data['results']],
+            [match.id]
+        )
+
+    def test_ordering_paginated_by_cursor(self):
+        for price in ['3.00', '1.00', '2.00', '2.00', '5.00']:
+            create_expense(user=self.user, price=Decimal(price))
+
+        expected = list(
+            Expense.objects.order_by('price', 'id')
+            .values_list('id', flat=True)
+        )
+
+        seen = []
+        res = self.client.get(
+            EXPENSE_URL,
+            {'ordering': 'price', 'page_size': 2}
+        )
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(expense['id'] for expense in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(seen, expected)
+
+    def test_invalid_filters(self):
+        for params in [
+            {'ordering': 'user'},
+            {'price_min': 'cheap'},
+            {'price_min': '10', 'price_max': '5'},
+            {'date_from': '2023-02-01', 'date_to': '2023-01-01'},
+        ]:
+            res = self.client.get(EXPENSE_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_paginated_by_cursor(self):
+        for day in range(1, 6):
+            create_expense(user=self.user, date_created=date(2023, 2, day))
+            create_expense(user=self.user, date_created=date(2023, 2, day))
+
+        expected = list(
+            Expense.objects.order_by('-date_created', '-id')
+            .values_list('id', flat=True)
+        )
+
+        seen = []
+        res = self.client.get(EXPENSE_URL, {'page_size': 3})
+        self.assertIsNone(res.data['previous'])
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            seen.extend(expense['id'] for expense in res.data['results'])
+            if not res.data['next']:
+                break
+            res = self.client.get(res.data['next'])
+
+        self.assertEqual(seen, expected)
+
+        res = self.client.get(res.data['previous'])
+        self.assertEqual(
+            [expense['id'] for expense in res.data['results']],
+            expected[6:9]
+        )
+
+    def test_cursor_stable_under_inserts(self):
+        for day in range(1, 5):
+            create_expense(user=self.user, date_created=date(2023, 2, day))
+
+        res = self.client.get(EXPENSE_URL, {'page_size': 2})
+        first_page = [expense['id'] for expense in res.data['results']]
+
+        create_expense(user=self.user, date_created=date(2023, 3, 1))
+        res = self.client.get(res.data['next'])
+        second_page = [expense['id'] for expense in res.data['results']]
+
+        expected = list(
+            Expense.objects.filter(date_created__lt=date(2023, 3, 1))
+            .order_by('-date_created', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(first_page + second_page, expected)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(EXPENSE_URL, {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_bulk_create_expenses(self):
+        payload = [
+            {'expense_name': 'Gas', 'price': '10.00'},
+            {
+                'expense_name': 'Rent',
+                'price': '500.00',
+                'date_created': '2023-02-13'
+            },
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 2)
+        expenses = Expense.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [expense.expense_name for expense in expenses],
+            ['Gas', 'Rent']
+        )
+        self.assertEqual(expenses[0].date_created, date.today())
+        self.assertEqual(expenses[1].date_created, date(2023, 2, 13))
+        self.assertEqual(res.data[0]['id'], expenses[0].id)
+
+    def test_bulk_create_query_count_independent_of_size(self):
+        def count_queries(size):
+            payload = [
+                {'expense_name': 'Gas', 'price': '10.00'}
+            ] * size
+            with CaptureQueriesContext(connection) as queries:
+                res = self.client.post(BULK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+            return len(queries)
+
+        # The first write of a month also creates its rollup row.
+        count_queries(1)
+        # 120 rows stay within SQLite's bulk_create batch limit.
+        self.assertEqual(count_queries(5), count_queries(120))
+        self.assertEqual(Expense.objects.count(), 126)
+
+    def test_bulk_create_reports_errors_per_item(self):
+        payload = [
+            {'expense_name': 'Gas', 'price': '10.00'},
+            {'expense_name': 'Rent'},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('price', res.data[1])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_bulk_update_expenses(self):
+        gas = create_expense(user=self.user, expense_name='Gas')
+        rent = create_expense(user=self.user, expense_name='Rent')
+        payload = [
+            {'id': rent.id, 'price': '700.00'},
+            {'id': gas.id, 'expense_name': 'Fuel'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+        gas.refresh_from_db()
+        rent.refresh_from_db()
+        self.assertEqual(gas.expense_name, 'Fuel')
+        self.assertEqual(rent.price, Decimal('700.00'))
+        self.assertEqual(res.data[0]['id'], rent.id)
+
+    def test_bulk_update_other_users_expense_not_found(self):
+        other_user = create_user(
+            email='other@example.com',
+            password='root1234'
+        )
+        mine = create_expense(user=self.user)
+        theirs = create_expense(user=other_user)
+        payload = [
+            {'id': mine.id, 'price': '1.00'},
+            {'id': theirs.id, 'price': '1.00'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        mine.refresh_from_db()
+        self.assertEqual(mine.price, Decimal('1000.00'))
+
+    def test_bulk_delete_expenses(self):
+        keep = create_expense(user=self.user)
+        ids = [create_expense(user=self.user).id for _ in range(3)]
+
+        res = self.client.delete(BULK_URL, ids, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            list(Expense.objects.values_list('id', flat=True)),
+            [keep.id]
+        )
+
+    def test_bulk_delete_queries_do_not_grow_with_batch(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        self.client.post(BULK_URL, [
+            {'expense_name': f'Expense {index}', 'price': '1.50',
+             'date_created': f'2023-0{index % 3 + 1}-05',
+             'category': category.id if index % 2 else None}
+            for index in range(24)
+        ], format='json')
+        january = list(
+            Expense.objects
+            .filter(date_created__month=1)
+            .values_list('id', flat=True)[:2]
+        )
+        rest = list(
+            Expense.objects
+            .exclude(id__in=january)
+            .values_list('id', flat=True)
+        )
+
+        # One month and Category, then every month and both Categories.
+        with CaptureQueriesContext(connection) as small, \
+                mock.patch('expense.signals.invalidate_user') as per_row:
+            self.client.delete(BULK_URL, january, format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.delete(BULK_URL, rest, format='json')
+
+        per_row.assert_not_called()
+        self.assertEqual(len(large), len(small))
+        self.assertFalse(Expense.objects.exists())
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+        self.assertEqual(Category.objects.drift(), [])
+        self.assertEqual(DeletedExpense.objects.count(), 24)
+
+    def test_writes_keep_rollups_in_sync(self):
+        res = self.client.post(EXPENSE_URL, {
+            'expense_name': 'Gas',
+            'price': '10.00',
+            'date_created': '2023-01-05'
+        })
+        url = reverse('expense:expense-detail', args=[res.data['id']])
+        self.client.patch(url, {'date_created': '2023-02-05'})
+        self.client.post(BULK_URL, [
+            {'expense_name': 'Rent', 'price': '5.00'},
+            {'expense_name': 'Food', 'price': '7.00'},
+        ], format='json')
+        rent = Expense.objects.get(expense_name='Rent')
+        food = Expense.objects.get(expense_name='Food')
+        self.client.patch(
+            BULK_URL,
+            [{'id': rent.id, 'price': '6.00'}],
+            format='json'
+        )
+        self.client.delete(
+            reverse('expense:expense-detail', args=[food.id])
+        )
+
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+
+    def test_bulk_delete_nothing(self):
+        expense = create_expense(user=self.user)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.delete(BULK_URL, [], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(any('DELETE' in query['sql']
+                             for query in queries.captured_queries))
+        self.assertTrue(Expense.objects.filter(id=expense.id).exists())
+
+    def test_bulk_delete_invalid_id(self):
+        expense = create_expense(user=self.user)
+
+        res = self.client.delete(BULK_URL, [expense.id, 'x'], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(Expense.objects.filter(id=expense.id).exists())
+
+    def test_export_csv(self):
+        other_user = create_user(
+            email='other@example.com',
+            password='root1234'
+        )
+        create_expense(user=other_user)
+        category = Category.objects.create(user=self.user, name='Car')
+        expense = create_expense(
+            user=self.user,
+            expense_name='Gas, premium',
+            date_created=date(2023, 2, 13),
+            category=category
+        )
+
+        res = self.client.get(EXPORT_URL, HTTP_ACCEPT='text/csv')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        self.assertEqual(
+            b''.join(res.streaming_content).decode(),
+            'id,expense_name,price,date_created,category,category_name\r\n'
+            f'{expense.id},"Gas, premium",1000.00,2023-02-13,'
+            f'{category.id},Car\r\n'
+        )
+
+    def test_export_ndjson(self):
+        create_expense(user=self.user, date_created=date(2023, 2, 13))
+        create_expense(user=self.user, date_created=date(2023, 2, 14))
+        expenses = Expense.objects.order_by('-date_created', '-id')
+
+        res = self.client.get(EXPORT_URL, {'format': 'ndjson'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res['Content-Type'],
+            'application/x-ndjson; charset=utf-8'
+        )
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            ExpenseSerializer(expenses, many=True).data
+        )
+
+    def test_summary_by_month(self):
+        other_user = create_user(
+            email='other@example.com',
+            password='root1234'
+        )
+        create_expense(user=other_user, date_created=date(2023, 1, 5))
+        create_expense(
+            user=self.user,
+            price=Decimal('10.00'),
+            date_created=date(2023, 1, 5)
+        )
+        create_expense(
+            user=self.user,
+            price=Decimal('25.50'),
+            date_created=date(2023, 1, 31)
+        )
+        create_expense(
+            user=self.user,
+            price=Decimal('4.00'),
+            date_created=date(2023, 3, 1)
+        )
+        ExpenseRollup.objects.rebuild()
+
+        res = self.client.get(SUMMARY_URL, {'period': 'month'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [
+            {
+                'period': '2023-01-01',
+                'total': '35.50',
+                'count': 2,
+                'average': '17.75'
+            },
+            {
+                'period': '2023-03-01',
+                'total': '4.00',
+                'count': 1,
+                'average': '4.00'
+            },
+        ])
+
+    def test_summary_by_month_reads_rollups(self):
+        payload = [
+            {
+                'expense_name': 'Gas',
+                'price': '10.00',
+                'date_created': '2023-01-05'
+            },
+            {
+                'expense_name': 'Rent',
+                'price': '30.00',
+                'date_created': '2023-01-20'
+            },
+        ]
+        self.client.post(BULK_URL, payload, format='json')
+        expense = Expense.objects.get(expense_name='Rent')
+
+        with self.assertNumQueries(1):
+            res = self.client.get(SUMMARY_URL, {
+                'period': 'month',
+                'date_from': '2023-01-01',
+                'date_to': '2023-01-31'
+            })
+
+        self.assertEqual(res.json(), [{
+            'period': '2023-01-01',
+            'total': '40.00',
+            'count': 2,
+            'average': '20.00'
+        }])
+
+        self.client.delete(BULK_URL, [expense.id], format='json')
+        res = self.client.get(SUMMARY_URL, {'period': 'month'})
+
+        self.assertEqual(res.json()[0]['total'], '10.00')
+
+    def test_summary_average_not_truncated(self):
+        payload = [
+            {'expense_name': 'Gas', 'price': price, 'date_created': day}
+            for price, day in (('1.00', '2023-01-05'),
+                               ('2.00', '2023-01-05'),
+                               ('2.00', '2023-01-06'))
+        ]
+        self.client.post(BULK_URL, payload, format='json')
+
+        from_rollups = self.client.get(SUMMARY_URL, {'period': 'month'})
+        aggregated = self.client.get(SUMMARY_URL, {
+            'period': 'month',
+            'date_from': '2023-01-02'
+        })
+
+        self.assertEqual(from_rollups.data[0]['average'], '1.67')
+        self.assertEqual(aggregated.data, from_rollups.data)
+
+    def test_summary_date_range(self):
+        create_expense(user=self.user, date_created=date(2023, 1, 5))
+        create_expense(user=self.user, date_created=date(2023, 1, 6))
+        create_expense(user=self.user, date_created=date(2023, 1, 7))
+
+        res = self.client.get(SUMMARY_URL, {
+            'period': 'day',
+            'date_from': '2023-01-06',
+            'date_to': '2023-01-07'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [bucket['period'] for bucket in res.data],
+            ['2023-01-06', '2023-01-07']
+        )
+
+    def test_summary_invalid_params(self):
+        res = self.client.get(SUMMARY_URL, {
+            'period': 'decade',
+            'date_from': '2023-02-01',
+            'date_to': '2023-01-01'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_get_all_expenses_per_category(self):
+        category = Category.objects.create(user=self.user, name='Wants')
+        create_expense(user=self.user)
+        create_expense(user=self.user)
+        expense = create_expense(user=self.user, category=category)
+
+        res = self.client.get(EXPENSE_URL, {'category': category.id})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['id'] for item in res.data['results']],
+            [expense.id]
+        )
+        self.assertEqual(res.data['results'][0]['category_name'], 'Wants')
+
+    def test_create_expense_with_category(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        payload = {
+            'expense_name': 'Gas',
+            'price': Decimal('40.00'),
+            'category': category.id
+        }
+
+        res = self.client.post(EXPENSE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['category'], category.id)
+        self.assertEqual(res.data['category_name'], 'Car')
+        category.refresh_from_db()
+        self.assertEqual(category.total, Decimal('40.00'))
+        self.assertEqual(category.count, 1)
+
+    def test_create_expense_other_users_category_rejected(self):
+        other_user = create_user(email='other@example.com', password='pass')
+        category = Category.objects.create(user=other_user, name='Car')
+        payload = {
+            'expense_name': 'Gas',
+            'price': Decimal('40.00'),
+            'category': category.id
+        }
+
+        res = self.client.post(EXPENSE_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Expense.objects.exists())
+
+    def test_writes_keep_category_totals_in_sync(self):
+        car = Category.objects.create(user=self.user, name='Car')
+        home = Category.objects.create(user=self.user, name='Home')
+        expense = create_expense(user=self.user)
+
+        self.client.patch(
+            detail_url(expense.id),
+            {'category': car.id, 'price': '10.00'}
+        )
+        self.client.post(
+            BULK_URL,
+            [
+                {'expense_name': 'Gas', 'price': '5.00', 'category': car.id},
+                {'expense_name': 'Rent', 'price': '7.00', 'category': home.id}
+            ],
+            format='json'
+        )
+        self.client.patch(
+            BULK_URL,
+            [{'id': expense.id, 'category': home.id}],
+            format='json'
+        )
+        self.client.delete(BULK_URL, [expense.id], format='json')
+
+        self.assertEqual(Category.objects.drift(), [])
+        car.refresh_from_db()
+        home.refresh_from_db()
+        self.assertEqual((car.total, car.count), (Decimal('5.00'), 1))
+        self.assertEqual((home.total, home.count), (Decimal('7.00'), 1))
+
+    def test_list_with_categories_single_query(self):
+        for name in ['Car', 'Home', 'Food']:
+            category = Category.objects.create(user=self.user, name=name)
+            create_expense(user=self.user, category=category)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            {item['category_name'] for item in res.data['results']},
+            {'Car', 'Home', 'Food'}
+        )
+
+
+class CategoryApiTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(**create_user_payload())
+        self.client.force_authenticate(self.user)
+
+    def test_create_category(self):
+        res = self.client.post(CATEGORY_URL, {'name': 'Car'})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        category = Category.objects.get(id=res.data['id'])
+        self.assertEqual(category.user, self.user)
+        self.assertEqual(res.data['total'], '0.00')
+        self.assertEqual(res.data['count'], 0)
+
+    def test_create_duplicate_category_name(self):
+        Category.objects.create(user=self.user, name='Car')
+
+        res = self.client.post(CATEGORY_URL, {'name': 'Car'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_spend_by_category(self):
+        other_user = create_user(email='other@example.com', password='pass')
+        Category.objects.create(user=other_user, name='Other')
+        car = Category.objects.create(user=self.user, name='Car')
+        Category.objects.create(user=self.user, name='Home')
+        for price in ['10.00', '15.50']:
+            self.client.post(EXPENSE_URL, {
+                'expense_name': 'Gas',
+                'price': price,
+                'category': car.id
+            })
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CATEGORY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            [(item['name'], item['total'], item['count'])
+             for item in res.data],
+            [('Car', '25.50', 2), ('Home', '0.00', 0)]
+        )
+
+    def test_rename_category_refreshes_cached_expenses(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        create_expense(user=self.user, category=category)
+        self.client.get(EXPENSE_URL)
+
+        self.client.patch(category_detail_url(category.id), {'name': 'Auto'})
+        res = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(res.data['results'][0]['category_name'], 'Auto')
+
+    def test_delete_category_keeps_expenses(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        expense = create_expense(user=self.user, category=category)
+
+        res = self.client.delete(category_detail_url(category.id))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        expense.refresh_from_db()
+        self.assertIsNone(expense.category)
+
+
+class ExpenseReadSerializerTests(TestCase):
+
+    def test_output_identical_to_expense_serializer(self):
+        user = create_user(**create_user_payload())
+        create_expense(user=user, expense_name='Café', price=Decimal('0.50'))
+        create_expense(user=user, price=Decimal('123456.78'))
+        create_expense(user=user, date_created=date(2020, 2, 29))
+        expenses = Expense.objects.order_by('id')
+        reader = ExpenseReadSerializer()
+
+        expected = JSONRenderer().render(
+            ExpenseSerializer(expenses, many=True).data
+        )
+        actual = JSONRenderer().render(
+            reader.to_representation(expenses.values(*reader.sources))
+        )
+
+        self.assertEqual(actual, expected)
+
+    def test_format_row(self):
+        reader = ExpenseReadSerializer(['price', 'date_created'])
+
+        row = reader.format_row((Decimal('5.00'), date(2023, 2, 13)))
+
+        self.assertEqual(row, ['5.00', '2023-02-13'])
+
+
+class ExpenseResponseCacheTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        get_response_cache().clear()
+        self.client = APIClient()
+        self.user = create_user(**create_user_payload())
+        self.client.force_authenticate(self.user)
+        self.expense = create_expense(user=self.user)
+
+    def test_list_served_from_cache(self):
+        res = self.client.get(EXPENSE_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(cached.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, res.data)
+        self.assertEqual(cached['ETag'], res['ETag'])
+
+    def test_retrieve_served_from_cache(self):
+        url = reverse('expense:expense-detail', args=[self.expense.id])
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(url)
+
+        self.assertEqual(res.data['id'], self.expense.id)
+
+    def test_if_none_match_not_modified(self):
+        res = self.client.get(EXPENSE_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(EXPENSE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_writes_invalidate_cache(self):
+        res = self.client.get(EXPENSE_URL)
+        etag = res['ETag']
+
+        self.client.post(EXPENSE_URL, {
+            'expense_name': 'Gas',
+            'price': '10.00'
+        })
+        res = self.client.get(EXPENSE_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 2)
+
+        self.client.patch(
+            BULK_URL,
+            [{'id': self.expense.id, 'expense_name': 'Fuel'}],
+            format='json'
+        )
+        res = self.client.get(EXPENSE_URL)
+
+        self.assertIn(
+            'Fuel',
+            [expense['expense_name'] for expense in res.data['results']]
+        )
+
+    def test_cache_is_per_user(self):
+        self.client.get(EXPENSE_URL)
+        other_user = create_user(
+            email='other@example.com',
+            password='root1234'
+        )
+        self.client.force_authenticate(other_user)
+
+        res = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(res.data['results'], [])
+
+    def test_retrieve_last_modified(self):
+        url = detail_url(self.expense.id)
+        res = self.client.get(url)
+
+        self.assertEqual(
+            parse_http_date(res['Last-Modified']),
+            int(self.expense.updated_at.timestamp())
+        )
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url)
+        self.assertEqual(cached['Last-Modified'], res['Last-Modified'])
+
+    def test_if_modified_since_not_modified(self):
+        url = detail_url(self.expense.id)
+        last_modified = http_date(self.expense.updated_at.timestamp())
+
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_modified_since(self):
+        url = detail_url(self.expense.id)
+        Expense.objects.filter(pk=self.expense.pk).update(
+            updated_at=timezone.now() + timedelta(minutes=1)
+        )
+
+        res = self.client.get(
+            url,
+            HTTP_IF_MODIFIED_SINCE=http_date(
+                self.expense.updated_at.timestamp()
+            )
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_bulk_update_sets_updated_at(self):
+        updated_at = self.expense.updated_at
+
+        self.client.patch(
+            BULK_URL,
+            [{'id': self.expense.id, 'expense_name': 'Fuel'}],
+            format='json'
+        )
+
+        self.expense.refresh_from_db()
+        self.assertGreater(self.expense.updated_at, updated_at)
+
+    def test_category_rename_sets_updated_at(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        self.expense.category = category
+        self.expense.save()
+        updated_at = self.expense.updated_at
+
+        self.client.patch(category_detail_url(category.id), {'name': 'Auto'})
+
+        self.expense.refresh_from_db()
+        self.assertGreater(self.expense.updated_at, updated_at)
+
+
+class ExpenseSparseFieldsetTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(**create_user_payload())
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Food')
+        self.expense = create_expense(user=self.user, category=self.category)
+
+    def test_list_fields(self):
+        res = self.client.get(EXPENSE_URL, {'fields': 'price,expense_name'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['results'], [
+            {'expense_name': 'Groceries', 'price': '1000.00'}
+        ])
+
+    def test_list_fields_skips_category_join(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(EXPENSE_URL, {'fields': 'id,price'})
+
+        self.assertNotIn('core_category', queries[-1]['sql'])
+
+    def test_list_fields_pages_on_ordering(self):
+        create_expense(user=self.user, price=Decimal('5.00'))
+
+        res = self.client.get(EXPENSE_URL, {
+            'fields': 'expense_name',
+            'ordering': 'price',
+            'page_size': 1,
+        })
+        res = self.client.get(res.data['next'])
+
+        self.assertEqual(res.data['results'], [{'expense_name': 'Groceries'}])
+
+    def test_retrieve_fields(self):
+        res = self.client.get(detail_url(self.expense.id),
+                              {'fields': 'category_name'})
+
+        self.assertEqual(res.data, {'category_name': 'Food'})
+
+    def test_retrieve_fields_defers_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(detail_url(self.expense.id),
+                                  {'fields': 'price'})
+
+        self.assertEqual(res.data, {'price': '1000.00'})
+        self.assertNotIn('expense_name', queries[-1]['sql'])
+        self.assertNotIn('core_category', queries[-1]['sql'])
+
+    def test_export_fields(self):
+        res = self.client.get(EXPORT_URL, {'fields': 'expense_name,price'},
+                              HTTP_ACCEPT='text/csv')
+
+        lines = b''.join(res.streaming_content).decode().splitlines()
+        self.assertEqual(lines, ['expense_name,price', 'Groceries,1000.00'])
+
+    def test_unknown_field(self):
+        res = self.client.get(EXPENSE_URL, {'fields': 'price,user'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', res.data)
+
+    def test_fields_ignored_on_create(self):
+        res = self.client.post(f'{EXPENSE_URL}?fields=id', {
+            'expense_name': 'Gas',
+            'price': '10.00'
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['expense_name'], 'Gas')
+
+
+class ExpenseMessagePackTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(**create_user_payload())
+        self.client.force_authenticate(self.user)
+
+    def test_list_as_msgpack(self):
+        create_expense(user=self.user, price=Decimal('10.10'))
+        json_res = self.client.get(EXPENSE_URL)
+
+        res = self.client.get(EXPENSE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(res.content), json_res.json())
+        self.assertNotEqual(res['ETag'], json_res['ETag'])
+
+    def test_create_from_msgpack(self):
+        body = msgpack.packb({
+            'expense_name': 'Gas',
+            'price': '10.10',
+            'date_created': '2023-01-05'
+        })
+
+        res = self.client.generic(
+            'POST',
+            EXPENSE_URL,
+            body,
+            content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(res.content)['price'], '10.10')
+        self.assertEqual(Expense.objects.get().price, Decimal('10.10'))
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    'Query plans are only checked on PostgreSQL'
+)
+class ExpenseQueryPlanTests(TestCase):
+
+    def setUp(self):
+        self.user = create_user(**create_user_payload())
+        for day in range(1, 21):
+            create_expense(user=self.user, date_created=date(2023, 1, day))
+
+        with connection.cursor() as cursor:
+            # The tables are tiny, make the planner prove an index applies.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE core_expense')
+
+    def test_list_uses_index_without_sort(self):
+        queryset = Expense.objects.filter(user=self.user) \
+            .order_by('-date_created', '-id')[:51]
+
+        plan = queryset.explain()
+
+        self.assertIn('expense_user_date_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_filter_by_name_uses_index(self):
+        queryset = Expense.objects.filter(
+            user=self.user,
+            expense_name='Groceries'
+        )
+
+        plan = queryset.explain()
+
+        self.assertIn('expense_user_name_idx', plan)
+
+    def test_price_ordering_uses_index_without_sort(self):
+        queryset = Expense.objects.filter(
+            user=self.user,
+            price__gte=Decimal('10.00')
+        ).order_by('-price', '-id')[:51]
+
+        plan = queryset.explain()
+
+        self.assertIn('expense_user_price_idx', plan)
+        self.assertNotIn('Sort', plan)
+
+    def test_search_uses_trigram_index(self):
+        queryset = Expense.objects.filter(
+            user=self.user,
+            expense_name__trigram_word_similar='Grocery'
+        )
+
+        plan = queryset.explain()
 
-    # def test_get_all_expenses_per_category(self):
-    #     create_expense(user=self.user)
-    #     create_expense(user=self.user)
-    #     create_expense(user=self.user, category='Wants')
-    #
-    #     res = self.client.get(EXPENSE_URL, {'category': 'Wants'})
-    #
-    #     print(res.data)
-    #
-    #     self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('expense_user_name_trgm_idx', plan)
@@ -0,0 +1,310 @@
+"""
+Tests for CSV import of Expenses
+"""
+import csv
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Category, Expense, ExpenseRollup
+from core.testing import QueryBudgetMixin
+from expense.cache import get_generation
+from expense.imports import ExpenseImporter
+
+
+IMPORT_URL = reverse('expense:expense-import-csv')
+EXPENSE_URL = reverse('expense:expense-list')
+EXPORT_URL = reverse('expense:expense-export')
+
+QUERY_BUDGETS = {
+    # Categories once, then per chunk: insert, rollups created, read and
+    # written in bulk, and Category totals read and written in bulk.
+    'expense:expense-import-csv': 9,
+}
+
+
+def upload(content, name='expenses.csv'):
+    return SimpleUploadedFile(name, content.encode(), 'text/csv')
+
+
+class ExpenseImportApiTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+        self.category = Category.objects.create(user=self.user, name='Food')
+
+    def test_import_valid_rows(self):
+        content = (
+            'expense_name,price,date_created,category_name\n'
+            'Bread,2.50,2023-01-05,Food\n'
+            'Rent,500.00,2023-01-01,\n'
+            'Milk,1.20,,\n'
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload(content)})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data,
+            {'imported': 3, 'error_count': 0, 'errors': []}
+        )
+        expenses = Expense.objects.filter(user=self.user).order_by('id')
+        self.assertEqual(
+            [(e.expense_name, e.price, e.date_created, e.category_id)
+             for e in expenses],
+            [('Bread', Decimal('2.50'), date(2023, 1, 5), self.category.id),
+             ('Rent', Decimal('500.00'), date(2023, 1, 1), None),
+             ('Milk', Decimal('1.20'), date.today(), None)]
+        )
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+        self.category.refresh_from_db()
+        self.assertEqual(
+            (self.category.total, self.category.count),
+            (Decimal('2.50'), 1)
+        )
+
+    def test_invalid_rows_reported(self):
+        other = Category.objects.create(
+            user=get_user_model().objects.create_user(
+                email='other@example.com',
+                password='test1234'
+            ),
+            name='Other'
+        )
+        content = (
+            'expense_name,price,date_created,category\n'
+            'Bread,2.50,2023-01-05,\n'
+            ',abc,2023-13-01,\n'
+            f'Stolen,1.00,2023-01-05,{other.id}\n'
+            'Extra,1.00,2023-01-05,,surplus\n'
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': upload(content)})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(res.data['error_count'], 3)
+        errors = {error['line']: error['errors']
+                  for error in res.data['errors']}
+        self.assertEqual(
+            set(errors[3]),
+            {'expense_name', 'price', 'date_created'}
+        )
+        self.assertEqual(list(errors[4]), ['category'])
+        self.assertEqual(list(errors[5]), ['non_field_errors'])
+        self.assertEqual(Expense.objects.count(), 1)
+
+    def test_unknown_category_name_reported(self):
+        content = 'expense_name,price,category_name\nBread,2.50,Nope\n'
+
+        res = self.client.post(IMPORT_URL, {'file': upload(content)})
+
+        self.assertEqual(res.data['errors'][0]['line'], 2)
+        self.assertIn('category_name', res.data['errors'][0]['errors'])
+
+    def test_missing_columns_rejected(self):
+        res = self.client.post(
+            IMPORT_URL,
+            {'file': upload('name,amount\nBread,2.50\n')}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('file', res.data)
+
+    def test_invalid_encoding_rejected(self):
+        content = SimpleUploadedFile(
+            'expenses.csv',
+            'expense_name,price\nCafé,2.50\n'.encode('latin-1'),
+            'text/csv'
+        )
+
+        res = self.client.post(IMPORT_URL, {'file': content})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_malformed_csv_stops_import(self):
+        content = 'expense_name,price\nBread,2.50\n' \
+            + 'x' * (csv.field_size_limit() + 1) + ',1.00\nMilk,1.20\n'
+
+        res = self.client.post(IMPORT_URL, {'file': upload(content)})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(res.data['errors'][0]['line'], 3)
+        self.assertIn('Line 3', res.data['errors'][0]['errors']['file'][0])
+        self.assertEqual(Expense.objects.get().expense_name, 'Bread')
+
+    def test_malformed_header_rejected(self):
+        content = 'x' * (csv.field_size_limit() + 1) + '\nBread,2.50\n'
+
+        res = self.client.post(IMPORT_URL, {'file': upload(content)})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Line 1', res.data['file'][0])
+
+    def test_export_round_trip(self):
+        Expense.objects.create(
+            user=self.user,
+            expense_name='Bread, white',
+            price=Decimal('2.50'),
+            category=self.category,
+            date_created=date(2023, 1, 5)
+        )
+        exported = b''.join(
+            self.client.get(EXPORT_URL, {'format': 'csv'}).streaming_content
+        )
+
+        res = self.client.post(
+            IMPORT_URL,
+            {'file': upload(exported.decode())}
+        )
+
+        self.assertEqual(res.data['imported'], 1)
+        self.assertEqual(
+            set(Expense.objects.values_list(
+                'expense_name', 'price', 'date_created', 'category'
+            )),
+            {('Bread, white', Decimal('2.50'), date(2023, 1, 5),
+              self.category.id)}
+        )
+
+    def test_import_refreshes_cached_list(self):
+        self.client.get(EXPENSE_URL)
+
+        self.client.post(
+            IMPORT_URL,
+            {'file': upload('expense_name,price\nBread,2.50\n')}
+        )
+        res = self.client.get(EXPENSE_URL)
+
+        self.assertEqual(len(res.data['results']), 1)
+
+
+class ExpenseImporterTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+
+    def test_chunks_and_error_cap(self):
+        lines = ['expense_name,price']
+        for index in range(25):
+            lines.append(f'Item {index},{"bad" if index % 5 == 0 else "1"}')
+        importer = ExpenseImporter(self.user, chunk_size=4, max_errors=2)
+
+        with tempfile.TemporaryFile() as file:
+            file.write('\n'.join(lines).encode())
+            file.seek(0)
+            report = importer.import_file(file)
+
+        self.assertEqual(report['imported'], 20)
+        self.assertEqual(report['error_count'], 5)
+        self.assertEqual([error['line'] for error in report['errors']],
+                         [2, 7])
+        self.assertEqual(ExpenseRollup.objects.get().count, 20)
+
+    def test_invalid_encoding_keeps_committed_chunks(self):
+        lines = [f'Item {index},1.00' for index in range(3000)]
+        content = '\n'.join(['expense_name,price', *lines, 'Café,2.50'])
+        importer = ExpenseImporter(self.user, chunk_size=100)
+        generation = get_generation(self.user.id)
+
+        with tempfile.TemporaryFile() as file:
+            file.write(content.encode('latin-1'))
+            file.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                report = importer.import_file(file)
+
+        # The bad line is decoded a block ahead of the reader, so rows up
+        # to the start of its block are imported.
+        imported = report['imported']
+        self.assertGreater(imported, 100)
+        self.assertEqual(Expense.objects.count(), imported)
+        self.assertEqual(ExpenseRollup.objects.get().count, imported)
+        self.assertIn('not valid UTF-8',
+                      report['errors'][-1]['errors']['file'][0])
+        self.assertNotEqual(get_generation(self.user.id), generation)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql',
+                         'COPY is PostgreSQL only')
+    def test_copy_inserts_rows(self):
+        category = Category.objects.create(user=self.user, name='Food')
+        importer = ExpenseImporter(self.user)
+
+        importer.copy([
+            Expense(user=self.user, expense_name='Bread', price='2.50',
+                    category=category, date_created=date(2023, 1, 5)),
+            Expense(user=self.user, expense_name='Say "hi", ok',
+                    price='1.00', date_created=date(2023, 1, 6)),
+        ])
+
+        self.assertEqual(
+            set(Expense.objects.values_list('expense_name', 'category')),
+            {('Bread', category.id), ('Say "hi", ok', None)}
+        )
+
+
+class ImportExpensesCommandTests(TestCase):
+
+    def test_import_file(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        out = StringIO()
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(b'expense_name,price\nBread,2.50\nMilk,x\n')
+            file.flush()
+            call_command(
+                'import_expenses',
+                file.name,
+                user=user.email,
+                stdout=out
+            )
+
+        self.assertIn('line 3: price:', out.getvalue())
+        self.assertIn('Imported 1 expenses', out.getvalue())
+        self.assertEqual(Expense.objects.get().expense_name, 'Bread')
+
+    def test_malformed_csv(self):
+        user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+
+        with tempfile.NamedTemporaryFile(suffix='.csv') as file:
+            file.write(b'expense_name,price\n'
+                       + b'x' * (csv.field_size_limit() + 1) + b',1\n')
+            file.flush()
+            out = StringIO()
+            call_command('import_expenses', file.name, user=user.email,
+                         stdout=out)
+
+        self.assertIn('line 2: file: Line 2', out.getvalue())
+        self.assertIn('Imported 0 expenses', out.getvalue())
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            call_command('import_expenses', 'x.csv', user='nobody@x.com')
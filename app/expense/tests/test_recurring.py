@@ -0,0 +1,167 @@
+"""
+Tests for recurring Expenses
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Category, Expense, ExpenseRollup, RecurringExpense
+from core.testing import QueryBudgetMixin
+from expense.cache import get_generation
+from expense.management.commands.materialize_recurring_expenses import split
+
+
+RECURRING_URL = reverse('expense:recurringexpense-list')
+
+QUERY_BUDGETS = {
+    'GET expense:recurringexpense-list': 1,
+    'POST expense:recurringexpense-list': 2,
+    'PATCH expense:recurringexpense-detail': 3,
+}
+
+
+def recurring_detail_url(recurring_id):
+    return reverse('expense:recurringexpense-detail', args=[recurring_id])
+
+
+def create_recurring(user, **params):
+    defaults = {
+        'expense_name': 'Rent',
+        'price': Decimal('500.00'),
+        'frequency': RecurringExpense.MONTHLY,
+        'start_date': date(2023, 1, 1),
+    }
+    defaults.update(params)
+    defaults.setdefault('next_date', defaults['start_date'])
+    return RecurringExpense.objects.create(user=user, **defaults)
+
+
+class RecurringExpenseApiTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_recurring_expense(self):
+        category = Category.objects.create(user=self.user, name='Home')
+
+        res = self.client.post(RECURRING_URL, {
+            'expense_name': 'Rent',
+            'price': '500.00',
+            'category': category.id,
+            'frequency': 'monthly',
+            'start_date': '2023-01-31',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['next_date'], '2023-01-31')
+        self.assertEqual(res.data['interval'], 1)
+        recurring = RecurringExpense.objects.get(id=res.data['id'])
+        self.assertEqual(recurring.user, self.user)
+        self.assertEqual(recurring.category, category)
+
+    def test_list_only_own_recurring_expenses(self):
+        other = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test1234'
+        )
+        create_recurring(other)
+        recurring = create_recurring(self.user)
+
+        res = self.client.get(RECURRING_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in res.data], [recurring.id])
+
+    def test_end_before_start_rejected(self):
+        res = self.client.post(RECURRING_URL, {
+            'expense_name': 'Rent',
+            'price': '500.00',
+            'frequency': 'weekly',
+            'start_date': '2023-01-31',
+            'end_date': '2023-01-01',
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('end_date', res.data)
+
+    def test_schedule_cannot_change(self):
+        recurring = create_recurring(self.user)
+
+        res = self.client.patch(
+            recurring_detail_url(recurring.id),
+            {'frequency': 'daily'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('frequency', res.data)
+
+    def test_set_end_date_ends_recurring_expense(self):
+        recurring = create_recurring(self.user, next_date=date(2023, 3, 1))
+
+        res = self.client.patch(
+            recurring_detail_url(recurring.id),
+            {'end_date': '2023-02-15', 'price': '550.00'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        recurring.refresh_from_db()
+        self.assertIsNone(recurring.next_date)
+        self.assertEqual(recurring.price, Decimal('550.00'))
+
+
+class MaterializeRecurringExpensesTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+
+    def test_materialize_due_occurrences(self):
+        create_recurring(self.user)
+        create_recurring(
+            self.user,
+            frequency=RecurringExpense.WEEKLY,
+            start_date=date(2023, 3, 1)
+        )
+        generation = get_generation(self.user.id)
+        out = StringIO()
+
+        call_command(
+            'materialize_recurring_expenses',
+            as_of=date(2023, 3, 15),
+            batch_size=2,
+            stdout=out
+        )
+
+        self.assertIn('Created 6 expenses from 2 recurring', out.getvalue())
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 6)
+        self.assertEqual(ExpenseRollup.objects.drift(), [])
+        self.assertNotEqual(get_generation(self.user.id), generation)
+
+        call_command(
+            'materialize_recurring_expenses',
+            as_of=date(2023, 3, 15),
+            stdout=out
+        )
+
+        self.assertIn('Nothing is due.', out.getvalue())
+        self.assertEqual(Expense.objects.count(), 6)
+
+    def test_split_user_ranges(self):
+        self.assertEqual(split(1, 10, 3), [(1, 4), (5, 8), (9, 10)])
+        self.assertEqual(split(5, 5, 4), [(5, 5)])
@@ -0,0 +1,319 @@
+"""
+Tests for delta sync of Expenses
+"""
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Category, DeletedExpense, Expense
+from core.testing import QueryBudgetMixin
+from expense.sync import decode_watermark, encode_watermark
+
+
+SYNC_URL = reverse('expense:expense-sync')
+BULK_URL = reverse('expense:expense-bulk')
+
+QUERY_BUDGETS = {
+    # Changes, tombstones and, on PostgreSQL, the oldest open transaction.
+    'expense:expense-sync': 3,
+}
+
+
+def detail_url(expense_id):
+    return reverse('expense:expense-detail', args=[expense_id])
+
+
+def create_expense(user, **params):
+    defaults = {
+        'expense_name': 'Gas',
+        'price': Decimal('10.00'),
+        'date_created': date(2023, 1, 5),
+    }
+    defaults.update(params)
+    return Expense.objects.create(user=user, **defaults)
+
+
+@override_settings(EXPENSE_SYNC_SETTLE_SECONDS=0)
+class ExpenseSyncTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def sync(self, **params):
+        res = self.client.get(SYNC_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def sync_all(self, since=None, limit=500):
+        """
+        Sync page by page until caught up
+        """
+        changed, deleted = [], []
+        while True:
+            params = {'limit': limit}
+            if since is not None:
+                params['since'] = since
+            data = self.sync(**params)
+
+            changed += data['changed']
+            deleted += data['deleted']
+            since = data['watermark']
+            if not data['more']:
+                return changed, deleted, since
+
+    def test_initial_sync_returns_all_expenses(self):
+        first = create_expense(self.user, expense_name='First')
+        second = create_expense(self.user, expense_name='Second')
+        other_user = get_user_model().objects.create_user(
+            email='other@example.com',
+            password='test1234'
+        )
+        create_expense(other_user)
+
+        data = self.sync()
+
+        self.assertEqual(data['changed'], [
+            {'id': first.id, 'expense_name': 'First', 'price': '10.00',
+             'date_created': '2023-01-05', 'category': None,
+             'category_name': None},
+            {'id': second.id, 'expense_name': 'Second', 'price': '10.00',
+             'date_created': '2023-01-05', 'category': None,
+             'category_name': None},
+        ])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['more'])
+
+    def test_sync_returns_changes_since_watermark(self):
+        unchanged = create_expense(self.user, expense_name='Unchanged')
+        updated = create_expense(self.user, expense_name='Updated')
+        deleted = create_expense(self.user, expense_name='Deleted')
+        watermark = self.sync()['watermark']
+
+        self.client.patch(detail_url(updated.id), {'price': '12.00'})
+        self.client.delete(detail_url(deleted.id))
+        created = create_expense(self.user, expense_name='Created')
+
+        data = self.sync(since=watermark)
+
+        self.assertEqual(
+            [expense['id'] for expense in data['changed']],
+            [updated.id, created.id]
+        )
+        self.assertEqual(data['changed'][0]['price'], '12.00')
+        self.assertEqual(data['deleted'], [deleted.id])
+        self.assertNotIn(unchanged.id,
+                         [expense['id'] for expense in data['changed']])
+
+        caught_up = self.sync(since=data['watermark'])
+
+        self.assertEqual(caught_up['changed'], [])
+        self.assertEqual(caught_up['deleted'], [])
+
+    def test_bulk_delete_leaves_tombstones(self):
+        expenses = [create_expense(self.user) for _ in range(3)]
+        watermark = self.sync()['watermark']
+
+        self.client.delete(
+            BULK_URL,
+            [expense.id for expense in expenses[:2]],
+            format='json'
+        )
+
+        data = self.sync(since=watermark)
+        self.assertEqual(sorted(data['deleted']),
+                         [expense.id for expense in expenses[:2]])
+
+    def test_pages_through_changes_sharing_a_time(self):
+        category = Category.objects.create(user=self.user, name='Car')
+        expenses = [create_expense(self.user, category=category)
+                    for _ in range(5)]
+        watermark = self.sync()['watermark']
+
+        # Renaming the Category moves every Expense to the same updated_at.
+        self.client.patch(
+            reverse('expense:category-detail', args=[category.id]),
+            {'name': 'Transport'}
+        )
+        self.client.delete(detail_url(expenses[0].id))
+
+        changed, deleted, _ = self.sync_all(since=watermark, limit=2)
+
+        self.assertEqual(
+            sorted(expense['id'] for expense in changed),
+            [expense.id for expense in expenses[1:]]
+        )
+        self.assertTrue(all(expense['category_name'] == 'Transport'
+                            for expense in changed))
+        self.assertEqual(deleted, [expenses[0].id])
+
+    def test_paged_sync_reaches_every_expense(self):
+        Expense.objects.bulk_create([
+            Expense(user=self.user, expense_name=f'Expense {index}',
+                    price=Decimal('1.00'), date_created=date(2023, 1, 5))
+            for index in range(25)
+        ])
+
+        changed, deleted, _ = self.sync_all(limit=7)
+
+        self.assertEqual(
+            sorted(expense['id'] for expense in changed),
+            sorted(Expense.objects.values_list('id', flat=True))
+        )
+        self.assertEqual(deleted, [])
+
+    def test_archived_expenses_are_deleted(self):
+        old = create_expense(self.user, date_created=date(2019, 1, 5))
+        create_expense(self.user)
+        watermark = self.sync()['watermark']
+
+        call_command('archive_expenses', before=date(2020, 1, 1),
+                     stdout=StringIO())
+
+        self.assertEqual(self.sync(since=watermark)['deleted'], [old.id])
+
+    @override_settings(EXPENSE_SYNC_SETTLE_SECONDS=60)
+    def test_recent_changes_wait_for_next_sync(self):
+        create_expense(self.user)
+
+        data = self.sync()
+
+        self.assertEqual(data['changed'], [])
+        moment, pk = decode_watermark(data['watermark'])
+        self.assertLess(moment, timezone.now() - timedelta(seconds=59))
+
+    def test_watermark_waits_for_open_transactions(self):
+        started = timezone.now() - timedelta(minutes=5)
+        late = create_expense(self.user)
+        # Stamped by a batch that started five minutes ago and is still
+        # running.
+        Expense.objects.filter(pk=late.pk).update(
+            updated_at=started + timedelta(seconds=1)
+        )
+
+        with mock.patch('expense.sync.oldest_open_transaction',
+                        return_value=started):
+            data = self.sync()
+
+        self.assertEqual(data['changed'], [])
+        self.assertLessEqual(decode_watermark(data['watermark'])[0], started)
+
+        # Once the batch commits, the next sync picks the Expense up.
+        changed, _, _ = self.sync_all(since=data['watermark'])
+
+        self.assertEqual([expense['id'] for expense in changed], [late.id])
+
+    def test_invalid_watermark(self):
+        for since in ('garbage', encode_watermark(timezone.now())[:-4],
+                      encode_watermark(timezone.now().replace(tzinfo=None))):
+            res = self.client.get(SYNC_URL, {'since': since})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn('since', res.data)
+
+    @override_settings(EXPENSE_SYNC_TOMBSTONE_DAYS=30)
+    def test_expired_watermark(self):
+        since = encode_watermark(timezone.now() - timedelta(days=31))
+
+        res = self.client.get(SYNC_URL, {'since': since})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('since', res.data)
+
+    def test_invalid_limit(self):
+        res = self.client.get(SYNC_URL, {'limit': 0})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_sync_reads_updated_at_index(self):
+        plan = Expense.objects \
+            .filter(user=self.user, updated_at__gt=timezone.now()) \
+            .order_by('updated_at', 'id') \
+            .explain()
+
+        self.assertIn('expense_user_updated_idx', plan)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql',
+                     'Open transactions are only tracked on PostgreSQL.')
+@override_settings(EXPENSE_SYNC_SETTLE_SECONDS=0)
+class LateCommitTests(TransactionTestCase):
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_expense_committed_after_sync(self):
+        writer = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            writer.set_autocommit(False)
+            with writer.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {Expense._meta.db_table} '
+                    '(user_id, expense_name, price, date_created, '
+                    'updated_at) '
+                    'VALUES (%s, %s, %s, %s, clock_timestamp()) '
+                    'RETURNING id',
+                    [self.user.pk, 'Late', Decimal('10.00'),
+                     date(2023, 1, 5)]
+                )
+                late_id, = cursor.fetchone()
+
+            watermark = self.client.get(SYNC_URL).data['watermark']
+            writer.commit()
+        finally:
+            writer.close()
+
+        res = self.client.get(SYNC_URL, {'since': watermark})
+
+        self.assertEqual([expense['id'] for expense in res.data['changed']],
+                         [late_id])
+
+
+class PruneTombstonesTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='test@example.com',
+            password='test1234'
+        )
+
+    @override_settings(EXPENSE_SYNC_TOMBSTONE_DAYS=30)
+    def test_prunes_old_tombstones(self):
+        now = timezone.now()
+        DeletedExpense.objects.bulk_create([
+            DeletedExpense(id=1, user=self.user,
+                           deleted_at=now - timedelta(days=31)),
+            DeletedExpense(id=2, user=self.user,
+                           deleted_at=now - timedelta(days=29)),
+        ])
+
+        call_command('prune_tombstones', stdout=StringIO())
+
+        self.assertEqual(
+            list(DeletedExpense.objects.values_list('id', flat=True)),
+            [2]
+        )
@@ -5,14 +5,27 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 
-from expense import views
+from expense import async_views, views
 
 
 router = DefaultRouter()
+# Registered first: the Expense detail route would match their prefixes.
+router.register('categories', views.CategoryViewSet)
+router.register('recurring', views.RecurringExpenseViewSet)
 router.register('', views.ExpenseViewSet)
 
 app_name = 'expense'
 
 urlpatterns = [
+    path(
+        'async/',
+        async_views.AsyncExpenseListView.as_view(),
+        name='async-expense-list'
+    ),
+    path(
+        'async/<int:pk>/',
+        async_views.AsyncExpenseDetailView.as_view(),
+        name='async-expense-detail'
+    ),
     path('', include(router.urls))
 ]
@@ -1,35 +1,312 @@
 """
 Views for Expense API
 """
-from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import (
+    TruncDay,
+    TruncMonth,
+    TruncWeek,
+    TruncYear
+)
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext as _
+
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+from core.conditional import (
+    is_not_modified,
+    not_modified_response,
+    validator_headers
+)
+from core.fieldsets import FIELDS_PARAM, requested_fields
+from core.models import (
+    ArchivedExpense,
+    Category,
+    DeletedExpense,
+    Expense,
+    ExpenseRollup,
+    RecurringExpense
+)
+from expense import renderers, serializers
+from expense.cache import CachedResponseMixin, invalidate_user
+from expense.filters import ExpenseFilter, ExpenseSearchFilter
+from expense.imports import ExpenseImporter
+from expense.pagination import KeysetPagination
+from expense.sync import ExpenseSync
+from user.authentication import CachedTokenAuthentication
+
+
+SUMMARY_PERIODS = {
+    'day': TruncDay,
+    'week': TruncWeek,
+    'month': TruncMonth,
+    'year': TruncYear
+}
+
+
+def _whole_months(date_from, date_to):
+    """
+    Whether the range starts and ends on month boundaries
+    """
+    starts = date_from is None or date_from.day == 1
+    ends = date_to is None or (date_to + timedelta(days=1)).day == 1
+    return starts and ends
+
 
-from core.models import Expense
-from expense import serializers
+archived_parameter = OpenApiParameter(
+    'archived',
+    bool,
+    description='Read archived Expenses instead of recent ones.'
+)
+fields_parameter = OpenApiParameter(
+    FIELDS_PARAM,
+    str,
+    description='Comma separated fields to include, defaults to all.'
+)
 
 
-class ExpenseViewSet(viewsets.ModelViewSet):
+class ExpenseViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     View for manage Expense APIs
     """
     serializer_class = serializers.ExpenseSerializer
     queryset = Expense.objects.all()
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [ExpenseSearchFilter, ExpenseFilter]
+    export_chunk_size = 2000
+    # Actions that read ArchivedExpenses instead with ?archived=true and
+    # return only the requested ?fields=.
+    read_actions = ['list', 'retrieve', 'export']
 
     def get_queryset(self):
         """
         Retrieve Expenses for authenticated User
         :return:
         """
-        queryset = self.queryset.filter(user=self.request.user)
+        queryset = self.queryset
+        if self.action in self.read_actions:
+            params = serializers.ExpenseArchiveQuerySerializer(
+                data=self.request.query_params
+            )
+            params.is_valid(raise_exception=True)
+            if params.validated_data['archived']:
+                queryset = ArchivedExpense.objects.all()
+
+        queryset = self.get_user_queryset(queryset)
+
+        fields = self.get_requested_fields()
+        if self.action == 'retrieve' and fields is not None:
+            # Reads only the requested columns, joining Category only
+            # for category_name.
+            columns = {*serializers.ExpenseReadSerializer(fields).sources,
+                       'updated_at'}
+            if 'category__name' in columns:
+                columns.add('category')
+            else:
+                queryset = queryset.select_related(None)
+            queryset = queryset.only(*columns)
+
+        return queryset
+
+    def get_requested_fields(self):
+        """
+        Return the fields requested with ?fields=, or None for all
+        :return fields:
+        """
+        if self.action not in self.read_actions:
+            return None
+
+        return requested_fields(
+            self.request,
+            serializers.ExpenseSerializer.readable_fields()
+        )
+
+    def get_user_queryset(self, queryset):
+        """
+        Filter Expenses or ArchivedExpenses to the authenticated User's
+        :param queryset:
+        :return:
+        """
+        queryset = queryset \
+            .filter(user=self.request.user) \
+            .select_related('category')
         expense_name = self.request.query_params.get('expense_name')
 
         if expense_name:
             queryset = queryset.filter(expense_name=expense_name)
 
-        return queryset.order_by('-date_created')
+        return queryset.order_by('-date_created', '-id')
+
+    @extend_schema(parameters=[archived_parameter, fields_parameter])
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.list_rows, request, *args, **kwargs
+        )
+
+    @extend_schema(parameters=[archived_parameter, fields_parameter])
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            self.retrieve_object, request, *args, **kwargs
+        )
+
+    def retrieve_object(self, request, *args, **kwargs):
+        """
+        Retrieve an Expense with Last-Modified from its updated_at,
+        answering If-Modified-Since without serializing it
+        :param request:
+        :return:
+        """
+        instance = self.get_object()
+        last_modified = instance.updated_at.timestamp()
+        headers = validator_headers(last_modified=last_modified)
+        if is_not_modified(request, last_modified=last_modified):
+            return not_modified_response(headers)
+
+        serializer = self.get_serializer(
+            instance,
+            fields=self.get_requested_fields()
+        )
+        return Response(serializer.data, headers=headers)
+
+    def list_rows(self, request, *args, **kwargs):
+        """
+        List Expenses from values() rows through ExpenseReadSerializer
+        :param request:
+        :return:
+        """
+        reader = serializers.ExpenseReadSerializer(
+            self.get_requested_fields()
+        )
+        queryset = self.filter_queryset(self.get_queryset())
+        # The cursor needs the ordering fields and annotations such as the
+        # search rank, whichever fields were requested.
+        ordering = [field.lstrip('-') for field in queryset.query.order_by]
+        queryset = queryset.values(*dict.fromkeys([
+            *reader.sources, *ordering, *queryset.query.annotations
+        ]))
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(reader.to_representation(page))
+
+        return Response(reader.to_representation(queryset))
+
+    def get_bulk_objects(self, items):
+        """
+        Retrieve the authenticated User's Expenses identified by items,
+        in the same order
+        :param items:
+        :return expenses:
+        """
+        serializer = serializers.ExpenseIdSerializer(
+            data=items,
+            many=True,
+            max_length=serializers.ExpenseListSerializer.max_batch_size
+        )
+        serializer.is_valid(raise_exception=True)
+
+        ids = [item['id'] for item in serializer.validated_data]
+        expenses = self.get_queryset().in_bulk(ids)
+
+        errors = []
+        seen = set()
+        for pk in ids:
+            if pk not in expenses:
+                errors.append({'id': [_('Not found.')]})
+            elif pk in seen:
+                errors.append({'id': [_('Duplicate id.')]})
+            else:
+                errors.append({})
+            seen.add(pk)
+
+        if any(errors):
+            raise ValidationError(errors)
+
+        return [expenses[pk] for pk in ids]
+
+    def get_expense_summary(self, period, date_from, date_to):
+        """
+        Aggregate the authenticated User's Expenses, archived ones
+        included, per period
+        :param period:
+        :param date_from:
+        :param date_to:
+        :return summary:
+        """
+        querysets = []
+        for queryset in (self.queryset, ArchivedExpense.objects.all()):
+            queryset = self.get_user_queryset(queryset)
+            if date_from:
+                queryset = queryset.filter(date_created__gte=date_from)
+            if date_to:
+                queryset = queryset.filter(date_created__lte=date_to)
+
+            querysets.append(
+                queryset
+                .annotate(period=SUMMARY_PERIODS[period]('date_created'))
+                .values('period')
+                .annotate(total=Sum('price'), count=Count('id'))
+                .order_by()
+            )
+
+        # One query; a period may come back once from each table.
+        totals = {}
+        for row in querysets[0].union(querysets[1], all=True):
+            total, count = totals.get(row['period'], (0, 0))
+            totals[row['period']] = (total + row['total'],
+                                     count + row['count'])
+
+        return [
+            {
+                'period': period,
+                'total': total,
+                'count': count,
+                'average': total / count
+            }
+            for period, (total, count) in sorted(totals.items())
+        ]
+
+    def get_rollup_summary(self, date_from, date_to):
+        """
+        Read the authenticated User's monthly totals from the rollups
+        :param date_from:
+        :param date_to:
+        :return summary:
+        """
+        queryset = ExpenseRollup.objects.filter(
+            user=self.request.user,
+            count__gt=0
+        )
+        if date_from:
+            queryset = queryset.filter(month__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(month__lte=date_to)
+
+        # The average is divided here, as for the aggregate path: SQLite
+        # divides a decimal by an integer with truncation.
+        return [
+            {
+                'period': month,
+                'total': total,
+                'count': count,
+                'average': total / count
+            }
+            for month, total, count in queryset
+            .order_by('month')
+            .values_list('month', 'total', 'count')
+        ]
 
     def perform_create(self, serializer):
         """
@@ -38,3 +315,284 @@ class ExpenseViewSet(viewsets.ModelViewSet):
         :return:
         """
         serializer.save(user=self.request.user)
+
+    def perform_destroy(self, instance):
+        """
+        Delete Expense
+        :param instance:
+        :return:
+        """
+        with transaction.atomic():
+            # delete() clears the id, the tombstone needs it.
+            DeletedExpense.objects.record([instance])
+            instance.delete()
+            ExpenseRollup.objects.record(removed=[instance])
+            Category.objects.record(removed=[instance])
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create Expenses from a list
+        :param request:
+        :return:
+        """
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_create(serializer)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @bulk.mapping.patch
+    def bulk_update(self, request):
+        """
+        Partially update Expenses from a list of objects with an id
+        :param request:
+        :return:
+        """
+        expenses = self.get_bulk_objects(request.data)
+        serializer = self.get_serializer(
+            expenses,
+            data=request.data,
+            many=True,
+            partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+
+        return Response(serializer.data)
+
+    @bulk.mapping.delete
+    def bulk_destroy(self, request):
+        """
+        Delete Expenses from a list of ids
+        :param request:
+        :return:
+        """
+        items = request.data
+        if isinstance(items, list):
+            items = [{'id': pk} for pk in items]
+
+        expenses = self.get_bulk_objects(items)
+        ids = [expense.id for expense in expenses]
+        if not ids:
+            # `id IN ()` is not valid SQL on every database.
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        quote = connection.ops.quote_name
+        with transaction.atomic():
+            # One statement instead of a post_delete per Expense: the
+            # signal's cache invalidation is done once below, like the
+            # totals and tombstones.
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {quote(Expense._meta.db_table)} '
+                    f'WHERE user_id = %s '
+                    f'AND id IN ({", ".join(["%s"] * len(ids))})',
+                    [request.user.pk, *ids]
+                )
+            ExpenseRollup.objects.record_bulk(removed=expenses)
+            Category.objects.record_bulk(removed=expenses)
+            DeletedExpense.objects.record(expenses)
+            invalidate_user(request.user.pk)
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(responses=serializers.ExpenseImportReportSerializer)
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='import',
+        parser_classes=[MultiPartParser],
+        serializer_class=serializers.ExpenseImportSerializer
+    )
+    def import_csv(self, request):
+        """
+        Create Expenses from an uploaded CSV file, in the format export
+        writes, and report the rows that were rejected
+        :param request:
+        :return:
+        """
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        importer = ExpenseImporter(request.user)
+        with serializer.validated_data['file'].open('rb') as file:
+            report = importer.import_file(file)
+
+        return Response(report)
+
+    @extend_schema(parameters=[archived_parameter, fields_parameter])
+    @action(
+        detail=False,
+        methods=['get'],
+        renderer_classes=[renderers.CSVRenderer, renderers.NDJSONRenderer]
+    )
+    def export(self, request):
+        """
+        Stream all Expenses as CSV or NDJSON, chosen by the Accept header
+        or the format query parameter
+        :param request:
+        :return:
+        """
+        reader = serializers.ExpenseReadSerializer(
+            self.get_requested_fields()
+        )
+        rows = self.filter_queryset(self.get_queryset()) \
+            .values_list(*reader.sources) \
+            .iterator(chunk_size=self.export_chunk_size)
+        renderer = request.accepted_renderer
+
+        response = StreamingHttpResponse(
+            renderer.stream(reader.fields, map(reader.format_row, rows)),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}'
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="expenses.{renderer.format}"'
+
+        return response
+
+    @extend_schema(
+        parameters=[serializers.ExpenseSyncQuerySerializer],
+        responses=serializers.ExpenseSyncSerializer
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def sync(self, request):
+        """
+        Expenses created, updated or deleted after the since watermark,
+        oldest first, with the watermark to sync from next
+        :param request:
+        :return:
+        """
+        params = serializers.ExpenseSyncQuerySerializer(
+            data=request.query_params
+        )
+        params.is_valid(raise_exception=True)
+
+        reader = serializers.ExpenseReadSerializer()
+        changes = ExpenseSync(request.user, reader).changes(
+            since=params.validated_data.get('since'),
+            limit=params.validated_data['limit']
+        )
+
+        return Response(changes)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        serializer_class=serializers.ExpenseSummarySerializer,
+        pagination_class=None
+    )
+    def summary(self, request):
+        """
+        Total, count and average price of Expenses per day, week, month
+        or year, aggregated by the database
+        :param request:
+        :return:
+        """
+        params = serializers.ExpenseSummaryQuerySerializer(
+            data=request.query_params
+        )
+        params.is_valid(raise_exception=True)
+        period = params.validated_data['period']
+        date_from = params.validated_data.get('date_from')
+        date_to = params.validated_data.get('date_to')
+
+        if period == 'month' and _whole_months(date_from, date_to) \
+                and not request.query_params.get('expense_name'):
+            summary = self.get_rollup_summary(date_from, date_to)
+        else:
+            summary = self.get_expense_summary(period, date_from, date_to)
+
+        serializer = self.get_serializer(summary, many=True)
+
+        return Response(serializer.data)
+
+
+class CategoryViewSet(viewsets.ModelViewSet):
+    """
+    View for manage Category APIs
+
+    Each Category carries the running total and count of its Expenses, so
+    spend by category is read without aggregating Expenses.
+    """
+    serializer_class = serializers.CategorySerializer
+    queryset = Category.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Retrieve Categories for authenticated User
+        :return:
+        """
+        return self.queryset.filter(user=self.request.user).order_by('name')
+
+    def perform_create(self, serializer):
+        """
+        Create new Category
+        :param serializer:
+        :return:
+        """
+        serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        """
+        Update Category, marking its Expenses modified when the name they
+        include changes
+        :param serializer:
+        :return:
+        """
+        name = serializer.instance.name
+        with transaction.atomic():
+            category = serializer.save()
+            if category.name != name:
+                self.touch_expenses(category)
+
+    def perform_destroy(self, instance):
+        """
+        Delete Category, marking its Expenses modified as they lose it
+        :param instance:
+        :return:
+        """
+        with transaction.atomic():
+            self.touch_expenses(instance)
+            instance.delete()
+
+    def touch_expenses(self, category):
+        """
+        Move the updated_at of the Category's Expenses, archived ones
+        included, to now so Last-Modified reflects the change
+        :param category:
+        :return:
+        """
+        now = timezone.now()
+        category.expenses.update(updated_at=now)
+        category.archived_expenses.update(updated_at=now)
+
+
+class RecurringExpenseViewSet(viewsets.ModelViewSet):
+    """
+    View for manage RecurringExpense APIs
+
+    Templates only describe the schedule; the
+    materialize_recurring_expenses command creates their Expenses.
+    """
+    serializer_class = serializers.RecurringExpenseSerializer
+    queryset = RecurringExpense.objects.all()
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """
+        Retrieve RecurringExpenses for authenticated User
+        :return:
+        """
+        return self.queryset.filter(user=self.request.user).order_by('id')
+
+    def perform_create(self, serializer):
+        """
+        Create new RecurringExpense
+        :param serializer:
+        :return:
+        """
+        serializer.save(user=self.request.user)
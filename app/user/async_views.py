@@ -0,0 +1,33 @@
+"""
+Async views for User API
+"""
+from rest_framework.authtoken.models import Token
+
+from core.async_views import AsyncAPIView
+from core.hashers import offload
+from user.serializers import AuthTokenSerializer
+
+
+class AsyncCreateTokenView(AsyncAPIView):
+    """
+    Create new Auth Token for User
+    """
+    authentication_required = False
+
+    async def post(self, request):
+        """
+        Return the User's Token, creating it on first login
+        :param request:
+        :return:
+        """
+        serializer = AuthTokenSerializer(
+            data=request.data,
+            context={'request': request}
+        )
+        # Checking the password hash is CPU bound, keep it off the loop.
+        await offload(serializer.is_valid, raise_exception=True)
+
+        token, created = await Token.objects.aget_or_create(
+            user=serializer.validated_data['user']
+        )
+        return self.respond({'token': token.key})
@@ -0,0 +1,151 @@
+"""
+Authentication for User API
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from django.utils.translation import gettext as _
+
+from rest_framework import authentication, exceptions
+from rest_framework.authentication import get_authorization_header
+
+
+def get_token_cache():
+    return caches[settings.AUTH_TOKEN_CACHE]
+
+
+def token_cache_key(key):
+    """
+    Cache key for a Token, without storing the Token itself in the key
+    :param key:
+    :return cache_key:
+    """
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return f'auth:token:{digest}'
+
+
+def invalidate_token(key):
+    """
+    Drop a cached Token so the next request reads it from the database
+    :param key:
+    :return:
+    """
+    get_token_cache().delete(token_cache_key(key))
+
+
+class CachedTokenAuthentication(authentication.TokenAuthentication):
+    """
+    Token authentication that caches which User a Token belongs to
+
+    Only the User's id and is_active are cached, never the User row and
+    its password hash. The User authenticated from the cache has its other
+    fields deferred: they are read from the database on first access, so
+    they are never stale. Views writing the User must read it afresh.
+
+    Entries expire after AUTH_TOKEN_CACHE_TIMEOUT seconds and are dropped
+    as soon as the Token or its User changes (see user.signals).
+    """
+
+    def authenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+
+        if cached is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(
+                cache_key,
+                (user.pk, user.is_active),
+                settings.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            return user, token
+
+        return self.from_cache(key, *cached)
+
+    def from_cache(self, key, user_id, is_active):
+        """
+        Build the Token and User of a cache entry without a query
+        :param key:
+        :param user_id:
+        :param is_active:
+        :return (user, token):
+        """
+        if not is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        User = get_user_model()
+        user = User.from_db(
+            router.db_for_read(User),
+            ['id', 'is_active'],
+            [user_id, is_active]
+        )
+        Token = self.get_model()
+        token = Token.from_db(
+            router.db_for_read(Token),
+            ['key', 'user_id'],
+            [key, user_id]
+        )
+        token.user = user
+
+        return user, token
+
+    async def aauthenticate(self, request):
+        """
+        Async version of authenticate() for plain Django async views
+        :param request:
+        :return (user, token): or None without a Token header
+        """
+        auth = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            msg = _('Invalid token header. No credentials provided.')
+            raise exceptions.AuthenticationFailed(msg)
+        elif len(auth) > 2:
+            msg = _('Invalid token header. '
+                    'Token string should not contain spaces.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            msg = _('Invalid token header. '
+                    'Token string should not contain invalid characters.')
+            raise exceptions.AuthenticationFailed(msg)
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key):
+        cache = get_token_cache()
+        cache_key = token_cache_key(key)
+        cached = await cache.aget(cache_key)
+
+        if cached is not None:
+            return self.from_cache(key, *cached)
+
+        try:
+            token = await self.get_model().objects \
+                .select_related('user') \
+                .aget(key=key)
+        except self.get_model().DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _('User inactive or deleted.')
+            )
+
+        await cache.aset(
+            cache_key,
+            (token.user.pk, token.user.is_active),
+            settings.AUTH_TOKEN_CACHE_TIMEOUT
+        )
+
+        return token.user, token
@@ -6,8 +6,12 @@ from django.utils.translation import gettext as _
 
 from rest_framework import serializers
 
+from core.fieldsets import SparseFieldsetMixin
+from core.metrics import TimedSerializerMixin
 
-class UserSerializer(serializers.ModelSerializer):
+
+class UserSerializer(SparseFieldsetMixin, TimedSerializerMixin,
+                     serializers.ModelSerializer):
     """
     Serializer for User object
     """
@@ -32,19 +36,24 @@ class UserSerializer(serializers.ModelSerializer):
 
     def update(self, instance, validated_data):
         """
-        Update and return User
+        Update and return User, writing only the changed columns so a
+        concurrent change to other fields, e.g. is_active, is kept
         :param instance:
         :param validated_data:
         :return user:
         """
         password = validated_data.pop('password', None)
-        user = super().update(instance, validated_data)
+        update_fields = [*validated_data, 'updated_at']
 
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
         if password:
-            user.set_password(password)
-            user.save()
+            instance.set_password(password)
+            update_fields.append('password')
+
+        instance.save(update_fields=update_fields)
 
-        return user
+        return instance
 
 
 class AuthTokenSerializer(serializers.Serializer):
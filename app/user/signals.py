@@ -0,0 +1,28 @@
+"""
+Signal handlers for User API
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rest_framework.authtoken.models import Token
+
+from user.authentication import invalidate_token
+
+
+@receiver([post_save, post_delete], sender=Token)
+def invalidate_cached_token(sender, instance, **kwargs):
+    """
+    Drop the cached Token when it is rotated or deleted
+    """
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_cached_user_tokens(sender, instance, **kwargs):
+    """
+    Drop the cached Tokens of a User that changed, e.g. was deactivated
+    """
+    keys = Token.objects.filter(user=instance).values_list('key', flat=True)
+    for key in keys:
+        invalidate_token(key)
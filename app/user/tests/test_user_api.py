@@ -1,18 +1,32 @@
 """
 Tests for User API
 """
-from django.test import TestCase
+from django.test import AsyncClient, TestCase, TransactionTestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import identify_hasher, make_password
 from django.urls import reverse
 
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.testing import QueryBudgetMixin
+from user.authentication import get_token_cache, token_cache_key
+
 
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
+ASYNC_TOKEN_URL = reverse('user:async-token')
 ME_URL = reverse('user:me')
 
+QUERY_BUDGETS = {
+    'user:create': 3,
+    'user:token': 5,
+    'user:async-token': 5,
+    'GET user:me': 1,
+    'PATCH user:me': 4,
+}
+
 
 def create_user(**params):
     return get_user_model().objects.create_user(**params)
@@ -26,10 +40,12 @@ def create_user_payload():
     }
 
 
-class PublicUserApiTests(TestCase):
+class PublicUserApiTests(QueryBudgetMixin, TestCase):
     """
     Test Public features of User API
     """
+    query_budgets = QUERY_BUDGETS
+
     def setUp(self):
         self.client = APIClient()
 
@@ -79,6 +95,25 @@ class PublicUserApiTests(TestCase):
         self.assertIn('token', res.data)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_create_token_upgrades_password_hash(self):
+        test_user = create_user_payload()
+        user = create_user(**test_user)
+        user.password = make_password(
+            test_user['password'],
+            hasher='pbkdf2_sha256'
+        )
+        user.save()
+        token = Token.objects.create(user=user)
+
+        res = self.client.post(TOKEN_URL, {
+            'email': test_user['email'],
+            'password': test_user['password']
+        })
+
+        self.assertEqual(res.data['token'], token.key)
+        user.refresh_from_db()
+        self.assertEqual(identify_hasher(user.password).algorithm, 'scrypt')
+
     def test_create_token_bad_credentials(self):
         test_user = create_user_payload()
         create_user(**test_user)
@@ -113,7 +148,8 @@ class PublicUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
-class PrivateUserApiTests(TestCase):
+class PrivateUserApiTests(QueryBudgetMixin, TestCase):
+    query_budgets = QUERY_BUDGETS
 
     def setUp(self):
         self.user = create_user(**create_user_payload())
@@ -146,3 +182,168 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_retrieve_sparse_fieldset(self):
+        res = self.client.get(ME_URL, {'fields': 'name'})
+
+        self.assertEqual(res.data, {'name': self.user.name})
+
+    def test_retrieve_unknown_field(self):
+        res = self.client.get(ME_URL, {'fields': 'name,password'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_if_none_match_not_modified(self):
+        res = self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertFalse(res.content)
+
+    def test_if_modified_since_not_modified(self):
+        res = self.client.get(ME_URL)
+
+        res = self.client.get(
+            ME_URL,
+            HTTP_IF_MODIFIED_SINCE=res['Last-Modified']
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_varies_with_fields(self):
+        res = self.client.get(ME_URL)
+
+        res = self.client.get(ME_URL, {'fields': 'email'},
+                              HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_update_changes_etag(self):
+        res = self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Updated'})
+        self.user.refresh_from_db()
+        res = self.client.get(ME_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['name'], 'Updated')
+
+
+class TokenAuthenticationCacheTests(TestCase):
+
+    def setUp(self):
+        get_token_cache().clear()
+        self.user = create_user(**create_user_payload())
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_lookup_cached(self):
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        # Only the User is read, the Token comes from the cache.
+        with self.assertNumQueries(1):
+            res = self.client.get(ME_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['email'], self.user.email)
+
+    def test_cache_holds_no_user_row(self):
+        self.client.get(ME_URL)
+
+        cached = get_token_cache().get(token_cache_key(self.token.key))
+
+        self.assertEqual(cached, (self.user.pk, True))
+
+    def test_write_keeps_concurrent_changes(self):
+        self.client.get(ME_URL)
+        # Changed by another process, without invalidating this cache.
+        get_user_model().objects.filter(pk=self.user.pk).update(
+            password=make_password('changed elsewhere')
+        )
+
+        res = self.client.patch(ME_URL, {'name': 'Updated'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.name, 'Updated')
+        self.assertTrue(self.user.check_password('changed elsewhere'))
+
+    def test_deleted_token_rejected(self):
+        self.client.get(ME_URL)
+
+        self.token.delete()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        self.client.get(ME_URL)
+
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_updated_user_not_stale(self):
+        self.client.get(ME_URL)
+
+        self.client.patch(ME_URL, {'name': 'Updated'})
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.data['name'], 'Updated')
+
+
+class AsyncTokenApiTests(QueryBudgetMixin, TransactionTestCase):
+    """
+    Passwords are checked in the hashing thread pool, on its own database
+    connection, so test data has to be committed
+    """
+    query_budgets = QUERY_BUDGETS
+
+    def setUp(self):
+        self.client = AsyncClient()
+        self.payload = create_user_payload()
+        self.user = create_user(**self.payload)
+
+    async def test_create_token(self):
+        res = await self.client.post(
+            ASYNC_TOKEN_URL,
+            {'email': self.payload['email'], 'password': 'test1234'},
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        token = await Token.objects.aget(user=self.user)
+        self.assertEqual(res.json(), {'token': token.key})
+
+        res = await self.client.post(
+            ASYNC_TOKEN_URL,
+            {'email': self.payload['email'], 'password': 'test1234'},
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.json(), {'token': token.key})
+
+    async def test_create_token_bad_credentials(self):
+        res = await self.client.post(
+            ASYNC_TOKEN_URL,
+            {'email': self.payload['email'], 'password': 'wrong'},
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('non_field_errors', res.json())
+
+    async def test_create_token_invalid_json(self):
+        res = await self.client.post(
+            ASYNC_TOKEN_URL,
+            '{',
+            content_type='application/json'
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
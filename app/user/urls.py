@@ -3,7 +3,7 @@ URL mappings for User API
 """
 from django.urls import path
 
-from user import views
+from user import async_views, views
 
 
 app_name = 'user'
@@ -11,5 +11,10 @@ app_name = 'user'
 urlpatterns = [
     path('create/', views.CreateUserView.as_view(), name='create'),
     path('token/', views.CreateTokenView.as_view(), name='token'),
+    path(
+        'token/async/',
+        async_views.AsyncCreateTokenView.as_view(),
+        name='async-token'
+    ),
     path('me/', views.ManageUserView.as_view(), name='me')
 ]
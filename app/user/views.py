@@ -1,10 +1,22 @@
 """
 Views for User API
 """
-from rest_framework import generics, authentication, permissions
+from django.contrib.auth import get_user_model
+
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import generics, permissions
 from rest_framework.authtoken.views import ObtainAuthToken
+from rest_framework.response import Response
 from rest_framework.settings import api_settings
 
+from core.conditional import (
+    is_not_modified,
+    make_etag,
+    not_modified_response,
+    validator_headers
+)
+from core.fieldsets import FIELDS_PARAM, requested_fields
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
 
 
@@ -26,14 +38,53 @@ class CreateTokenView(ObtainAuthToken):
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """
     Manage authenticated User
+
+    GET sends ETag and Last-Modified from the User's updated_at, so clients
+    polling with If-None-Match or If-Modified-Since get 304 Not Modified
+    without the User being serialized.
     """
     serializer_class = UserSerializer
-    authentication_classes = [authentication.TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
         """
         Retrieve and return authenticated User
+
+        Writes always read the User afresh, so saving it cannot write
+        back columns another process changed since authentication. Reads
+        reuse the authenticated User unless it came from the token cache,
+        which only holds its id and is_active.
         :return user:
         """
-        return self.request.user
+        user = self.request.user
+        if self.request.method in permissions.SAFE_METHODS \
+                and not user.get_deferred_fields():
+            return user
+
+        return get_user_model().objects.get(pk=user.pk)
+
+    @extend_schema(parameters=[OpenApiParameter(
+        FIELDS_PARAM,
+        str,
+        description='Comma separated fields to include, defaults to all.'
+    )])
+    def get(self, request, *args, **kwargs):
+        """
+        Retrieve authenticated User, honouring conditional headers
+        :param request:
+        :return:
+        """
+        user = self.get_object()
+        fields = requested_fields(request,
+                                  self.serializer_class.readable_fields())
+
+        last_modified = user.updated_at.timestamp()
+        etag = make_etag(user.pk, user.updated_at.isoformat(),
+                         request.accepted_renderer.format, fields)
+        headers = validator_headers(etag, last_modified)
+        if is_not_modified(request, etag, last_modified):
+            return not_modified_response(headers)
+
+        serializer = self.get_serializer(user, fields=fields)
+        return Response(serializer.data, headers=headers)
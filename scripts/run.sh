@@ -0,0 +1,10 @@
+#!/bin/sh
+
+set -e
+
+export DJANGO_SETTINGS_MODULE="${DJANGO_SETTINGS_MODULE:-app.settings_production}"
+
+python manage.py collectstatic --noinput
+python manage.py migrate
+
+exec gunicorn -c app/gunicorn.conf.py